@@ -0,0 +1,64 @@
+""" Compare load statistics from LoadTable against nested loops over the
+districts and companionships, at ward, stake and multi-stake scale
+
+Usage: python benchmarks/bench_analytics.py [--scales ward stake multi-stake]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import ministering
+from ministering import LoadTable, MinisteringAssignments
+from synthetic import SCALES, synthetic_data
+
+
+def best_of(fn, repeat=5):
+    """ Return the fastest of several timed calls to fn, in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def nested_loops(districts):
+    """ Per-district and per-supervisor mean, min, max and spread of the
+    companionship loads, the way reports were written before LoadTable """
+    def stats(loads):
+        if not loads:
+            return (0, 0, 0, 0)
+        mean = sum(loads) / len(loads)
+        return (mean, min(loads), max(loads),
+                (sum([(x - mean) ** 2 for x in loads]) / len(loads)) ** 0.5)
+    by_supervisor = {}
+    by_district = {}
+    for district in districts:
+        loads = [len(c.assignments) for c in district.companionships]
+        by_district[district.id] = stats(loads)
+        by_supervisor.setdefault(district.supervisor.id, []).extend(loads)
+    return by_district, dict((k, stats(v)) for k, v in by_supervisor.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['ward', 'stake', 'multi-stake'],
+            choices=sorted(SCALES))
+    args = parser.parse_args()
+
+    print('backend: %s' % ('numpy' if ministering.numpy is not None else 'lists'))
+    print('%-12s %12s %12s %12s' % ('scale', 'loops (ms)', 'build (ms)', 'query (ms)'))
+    for scale in args.scales:
+        districts = MinisteringAssignments(synthetic_data(*SCALES[scale])).districts
+        table = LoadTable(districts)
+        loops = best_of(lambda: nested_loops(districts))
+        build = best_of(lambda: LoadTable(districts))
+        query = best_of(lambda: (table.summary('district'), table.summary('supervisor')))
+        print('%-12s %12.2f %12.2f %12.2f' % (scale, loops * 1000, build * 1000,
+                query * 1000))
+
+
+if __name__ == '__main__':
+    main()
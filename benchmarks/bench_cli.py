@@ -0,0 +1,89 @@
+""" Hold the start-up time of the command line interface to a budget
+
+Times `python ministering_cli.py --help` and a JSON `report` from a cached
+snapshot against a bare interpreter start, checks that neither imports the
+network, async, process or database libraries, and exits with status 1 if
+any check fails.
+
+Usage: python benchmarks/bench_cli.py [ward|stake|multi-stake] [--repeat 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+sys.path.insert(0, ROOT)
+from ministering import MinisteringSession
+from synthetic import SCALES, synthetic_data
+
+# milliseconds allowed on top of a bare interpreter start
+BUDGETS = {'help': 50, 'report': 150}
+HEAVY_MODULES = ('requests', 'aiohttp', 'asyncio', 'multiprocessing', 'sqlite3')
+
+
+def best_of(command, env, repeat, cwd=None):
+    """ Return the fastest of several runs of command, in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, cwd=cwd, check=True,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scale', nargs='?', default='stake', choices=sorted(SCALES))
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    # measure the start-up users see, with cached bytecode
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [ROOT] + os.environ.get('PYTHONPATH', '').split(os.pathsep)))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, 'ministering_data.json')
+        snapshot = os.path.join(tmp, 'ministering_data.snapshot')
+        with open(json_file, 'w') as fp:
+            json.dump(synthetic_data(*SCALES[args.scale]), fp)
+        ms = MinisteringSession()
+        ms.load_data(json_file)
+        ms.save_snapshot(snapshot)
+        # as after a download, which also saves the login cookies
+        with open(os.path.join(tmp, 'ministering_session.json'), 'w') as fp:
+            json.dump({}, fp)
+
+        cli = [sys.executable, os.path.join(ROOT, 'ministering_cli.py'),
+                '--snapshot', snapshot, '--max-age', '1e9', '--json']
+        commands = {'help': cli + ['--help'], 'report': cli + ['report']}
+        subprocess.run(commands['help'], env=env, cwd=tmp, stdout=subprocess.DEVNULL)
+        bare = best_of([sys.executable, '-c', 'pass'], env, args.repeat)
+        print('%-10s %10s %10s %10s' % ('command', 'total (ms)', 'added (ms)', 'budget'))
+        print('%-10s %10.1f' % ('python', bare * 1000))
+        for name, command in commands.items():
+            added = (best_of(command, env, args.repeat, tmp) - bare) * 1000
+            ok = ok and added <= BUDGETS[name]
+            print('%-10s %10.1f %10.1f %10d%s' % (name, bare * 1000 + added, added,
+                    BUDGETS[name], '' if added <= BUDGETS[name] else '  OVER BUDGET'))
+
+        check = ('import json, sys, contextlib, io, ministering\n'
+                'with contextlib.redirect_stdout(io.StringIO()):\n'
+                '    ministering.main(%r)\n'
+                'print(json.dumps([x for x in %r if x in sys.modules]))'
+                % (commands['report'][2:], HEAVY_MODULES))
+        imported = json.loads(subprocess.run([sys.executable, '-c', check], env=env,
+                cwd=tmp, check=True, capture_output=True, text=True).stdout)
+        print('heavy modules imported by report: %s' % (', '.join(imported) or 'none'))
+        ok = ok and not imported
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
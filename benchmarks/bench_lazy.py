@@ -0,0 +1,65 @@
+""" Compare eager and lazy MinisteringAssignments: time and memory to load,
+to read one district, to find unassigned households, and to list every
+minister
+
+Memory is what the model adds on top of the decoded JSON, as measured by
+tracemalloc.
+
+Usage: python benchmarks/bench_lazy.py [ward|stake|multi-stake]
+"""
+import copy
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ministering import MinisteringAssignments
+from synthetic import SCALES, synthetic_data
+
+
+def one_district(assignments):
+    return [x.name for c in assignments.districts[0].companionships
+            for x in c.assignments]
+
+
+def unassigned(assignments, households):
+    return [x for x in households if not assignments.has_assignment(x['personUuid'])]
+
+
+def all_ministers(assignments):
+    return len(assignments.ministers)
+
+
+def measure(data, lazy, use):
+    """ Return (seconds, bytes) to load data and then call use on it """
+    data = copy.deepcopy(data)
+    tracemalloc.start()
+    start = time.perf_counter()
+    assignments = MinisteringAssignments(data, lazy=lazy)
+    use(assignments)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, size
+
+
+def main(scale='multi-stake'):
+    data = synthetic_data(*SCALES[scale])
+    households = data['eligibleMinistersAndAssignments']['eligibleAssignments']
+    cases = [
+        ('load only', lambda a: None),
+        ('one district', one_district),
+        ('unassigned households', lambda a: unassigned(a, households)),
+        ('all ministers', all_ministers)]
+    print('%-24s %12s %12s %12s %12s' % ('', 'eager (ms)', 'lazy (ms)',
+            'eager (kB)', 'lazy (kB)'))
+    for name, use in cases:
+        eager_time, eager_size = measure(data, False, use)
+        lazy_time, lazy_size = measure(data, True, use)
+        print('%-24s %12.1f %12.1f %12d %12d' % (name, eager_time * 1000,
+                lazy_time * 1000, eager_size // 1024, lazy_size // 1024))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
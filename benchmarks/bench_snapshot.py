@@ -0,0 +1,47 @@
+""" Compare cold-start time of load_data (JSON) against load_snapshot
+
+Usage: python benchmarks/bench_snapshot.py [ward|stake|multi-stake]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ministering import MinisteringSession
+from synthetic import SCALES, synthetic_data
+
+
+def best_of(fn, repeat=5):
+    """ Return the fastest of several timed calls to fn, in seconds """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(scale='stake'):
+    data = synthetic_data(*SCALES[scale])
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, 'ministering_data.json')
+        with open(json_file, 'w') as fp:
+            json.dump(data, fp)
+        ms = MinisteringSession()
+        ms.load_data(json_file)
+
+        print('%-24s %10s %12s' % ('format', 'size (kB)', 'load (ms)'))
+        t = best_of(lambda: MinisteringSession().load_data(json_file))
+        print('%-24s %10d %12.1f' % ('json', os.path.getsize(json_file) // 1024, t * 1000))
+        for level in (0, 1, 6):
+            snapshot_file = os.path.join(tmp, 'ministering_data_%d.snapshot' % level)
+            ms.save_snapshot(snapshot_file, compression=level)
+            t = best_of(lambda: MinisteringSession().load_snapshot(snapshot_file))
+            print('%-24s %10d %12.1f' % ('snapshot (level %d)' % level,
+                    os.path.getsize(snapshot_file) // 1024, t * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
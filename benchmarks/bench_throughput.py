@@ -0,0 +1,115 @@
+""" End-to-end throughput benchmarks against the local mock LCR server
+
+Times download_assignments, MinisteringAssignments.loads,
+unassigned_households, copy_companionships and distribute_assignments at
+ward, stake and multi-stake scale, and appends the results to
+benchmarks/results.jsonl so they can be compared over time.
+
+Usage: python benchmarks/bench_throughput.py [--scales ward stake]
+        [--latency 0.02] [--workers 8] [--error-rate 0.05] [--no-record]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+from ministering import MinisteringAssignments, MinisteringSession
+from mock_lcr import MockLCRServer
+from synthetic import SCALES, synthetic_data
+
+RESULTS = os.path.join(HERE, 'results.jsonl')
+
+
+def timed(fn):
+    """ Return (seconds, result) for a call to fn, with its output hidden """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        return time.perf_counter() - start, result
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=HERE, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale, latency, workers, error_rate=0.0):
+    """ Return a dict of timings, in seconds, for one scale """
+    data = synthetic_data(*SCALES[scale])
+    results = {}
+    with MockLCRServer(data, latency=latency, error_rate=error_rate) as server:
+        ms = MinisteringSession(lcr_url=server.url, login_url=server.login_url)
+        ms.login('benchmark', 'benchmark')
+
+        results['download_assignments'], _ = timed(ms.download_assignments)
+        results['loads'], _ = timed(lambda: MinisteringAssignments(ms._data))
+        results['unassigned_households'], households = timed(
+                lambda: ms.unassigned_households)
+
+        districts = ms.assignments.districts
+        requests_before = server.requests
+        results['copy_companionships'], _ = timed(lambda: ms.copy_companionships(
+                districts[0:1], districts[1], workers=workers))
+        copied = server.requests - requests_before
+
+        district = ms.assignments.districts[2]
+        requests_before = server.requests
+        results['distribute_assignments'], _ = timed(lambda: ms.distribute_assignments(
+                district, households, seed=0, workers=workers))
+        distributed = server.requests - requests_before
+
+    results['requests'] = {'copy_companionships': copied,
+            'distribute_assignments': distributed}
+    results['households'] = len(households)
+    results['retries'] = ms.metrics.snapshot()['retries']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', nargs='+', default=['ward', 'stake'],
+            choices=sorted(SCALES))
+    parser.add_argument('--latency', type=float, default=0.02,
+            help='seconds of server latency per request (default: 0.02)')
+    parser.add_argument('--workers', type=int, default=None,
+            help='concurrent writers for bulk operations (default: serial)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+            help='fraction of requests the server answers with 503 (default: 0)')
+    parser.add_argument('--no-record', action='store_true',
+            help='do not append results to %s' % os.path.basename(RESULTS))
+    args = parser.parse_args()
+
+    record = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': revision(),
+        'python': platform.python_version(),
+        'latency': args.latency,
+        'workers': args.workers,
+        'error_rate': args.error_rate,
+        'scales': {}}
+    for scale in args.scales:
+        results = run(scale, args.latency, args.workers, args.error_rate)
+        record['scales'][scale] = results
+        print(scale)
+        for key, value in results.items():
+            if isinstance(value, float):
+                print('  %-24s %10.1f ms' % (key, value * 1000))
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as fp:
+            fp.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+""" Compare loading several units serially against download_units with
+threads only and with threads plus a process pool
+
+Usage: python benchmarks/bench_units.py [ward|stake|multi-stake] [units] [latency]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ministering import MinisteringSession
+from mock_lcr import MockLCRServer
+from synthetic import SCALES, synthetic_data
+
+DATASETS = ('elders', 'reliefSociety')
+
+
+def main(scale='ward', units=8, latency=0.05):
+    units, latency = int(units), float(latency)
+    data = dict((1000 + n, synthetic_data(*SCALES[scale], seed=n, datasets=DATASETS))
+            for n in range(units))
+    with MockLCRServer(latency=latency, units=data) as server:
+        ms = MinisteringSession(lcr_url=server.url, login_url=server.login_url)
+        ms.login('benchmark', 'benchmark')
+        print('%d units x %d datasets, %s scale, %.0f ms latency' % (
+                units, len(DATASETS), scale, latency * 1000))
+        print('%-24s %12s' % ('mode', 'load (ms)'))
+        for name, workers, processes in (('serial', 1, 0), ('threads', 8, 0),
+                ('threads + processes', 8, None)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                collection = ms.download_units(data, DATASETS, workers=workers,
+                        processes=processes)
+                elapsed = time.perf_counter() - start
+            assert len(collection) == units * len(DATASETS)
+            print('%-24s %12.1f' % (name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
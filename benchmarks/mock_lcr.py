@@ -0,0 +1,253 @@
+""" A local stand-in for the parts of lcr.lds.org used by ministering.py
+
+Serves the proposed-assignments page with its __NEXT_DATA__ script, the
+sandbox-data-full service (GET or HEAD), the login form, and the
+sandbox-companionship PUT and DELETE endpoints, with configurable latency. Writes change the
+served data, so a later download reflects them.
+
+Usage: python benchmarks/mock_lcr.py [ward|stake|multi-stake] [port]
+
+Then point a session at it:
+>>> ms = MinisteringSession(lcr_url='http://127.0.0.1:8000',
+>>>         login_url='http://127.0.0.1:8000/login.html')
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import SCALES, synthetic_data
+
+COOKIE = 'mock-lcr-session'
+LOGIN_PAGE = b'<!DOCTYPE html><html><body><form action="/login.html"></form></body></html>'
+LOGGED_IN_PAGE = b'<html><head><meta http-equiv="refresh" content="0;url=/"></head></html>'
+COMPANIONSHIP_PATH = '/services/umlu/v1/ministering/sandbox-companionship'
+
+
+class MockLCRServer:
+    """ Threaded HTTP server holding one unit's ministering data """
+    def __init__(self, data=None, latency=0.0, jitter=0.0, require_login=True,
+            error_rate=0.0, port=0, units=None, allow_head=True):
+        """ Create a server; call start() to begin serving
+
+        Keyword parameters:
+        data -- ministeringData dict to serve (default: synthetic ward)
+        latency -- seconds to wait before answering each request (default: 0)
+        jitter -- extra random delay of up to this many seconds (default: 0)
+        require_login -- answer requests without the login cookie with the
+                HTML login page, as lcr.lds.org does (default: True)
+        error_rate -- fraction of requests answered with 503 and a
+                Retry-After header, to exercise retries (default: 0)
+        port -- port to listen on (default: 0, any free port)
+        units -- dict mapping other unit numbers to the ministeringData served
+                for them, read-only (default: none)
+        allow_head -- answer HEAD requests like GET without the body, rather
+                than with 405 (default: True)
+        """
+        self.data = data if data is not None else synthetic_data(*SCALES['ward'])
+        self.latency = latency
+        self.jitter = jitter
+        self.require_login = require_login
+        self.error_rate = error_rate
+        self.allow_head = allow_head
+        self.units = dict((str(k), v) for k, v in (units or {}).items())
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._people = {}
+        for key in ('eligibleMinisters', 'eligibleAssignments'):
+            for person in self.data['eligibleMinistersAndAssignments'].get(key, []):
+                self._people[person['personUuid']] = person
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    @property
+    def login_url(self):
+        return self.url + '/login.html'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def page(self, unit=None):
+        """ Return the proposed-assignments page as bytes, or None if the
+        unit is unknown """
+        if unit is not None and unit not in self.units:
+            return None
+        data = self.data if unit is None else self.units[unit]
+        with self.lock:
+            blob = json.dumps({'props': {'initialState': {'ministeringData': data}},
+                    'page': '/ministering-proposed-assignments'})
+        return ('<!DOCTYPE html>\n<html><head><title>Ministering</title></head>\n'
+                '<body><div id="root"></div><script>\n'
+                '__NEXT_DATA__ = %s\n'
+                '</script></body></html>\n' % blob).encode('utf-8')
+
+    def put_companionship(self, body):
+        """ Create or update a companionship; return (status, response) """
+        with self.lock:
+            district = [d for d in self.data['elders']
+                    if d['districtUuid'] == body.get('district', {}).get('uuid')]
+            if not district:
+                return 400, {'errors': ['District not found']}
+            people = body.get('ministeringPeople', []) + body.get('assignments', [])
+            unknown = [x['personUuid'] for x in people if x['personUuid'] not in self._people]
+            if unknown:
+                return 200 if body.get('uuid') else 201, {'assignmentErrors': unknown}
+            record = {
+                'id': body.get('uuid') or str(uuid.uuid4()),
+                'ministers': [self._people[x['personUuid']] for x in body['ministeringPeople']],
+                'assignments': [self._people[x['personUuid']] for x in body.get('assignments', [])]}
+            if body.get('uuid') is None:
+                status = 201
+            else:
+                status = 200
+                if not self._remove(body['uuid']):
+                    return 400, {'errors': ['Companionship not found']}
+            district[0].setdefault('companionships', []).append(record)
+            return status, {'uuid': record['id']}
+
+    def delete_companionship(self, id):
+        """ Delete a companionship; return the status code """
+        with self.lock:
+            return 204 if self._remove(id) else 400
+
+    def _remove(self, id):
+        for district in self.data['elders']:
+            companionships = district.get('companionships', [])
+            for i, companionship in enumerate(companionships):
+                if companionship['id'] == id:
+                    del companionships[i]
+                    return True
+        return False
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b'', content_type='application/json'):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _begin(self):
+                with server.lock:
+                    server.requests += 1
+                delay = server.latency + random.uniform(0, server.jitter)
+                if delay:
+                    time.sleep(delay)
+                if server.error_rate and random.random() < server.error_rate:
+                    self.send_response(503)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return False
+                if server.require_login and COOKIE not in self.headers.get('Cookie', ''):
+                    self._send(200, LOGIN_PAGE, 'text/html')
+                    return False
+                return True
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length)
+
+            def do_POST(self):
+                self._body()
+                if urlparse(self.path).path != '/login.html':
+                    return self._send(404)
+                self.send_response(200)
+                self.send_header('Set-Cookie', '%s=1; Path=/' % COOKIE)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(LOGGED_IN_PAGE)))
+                self.end_headers()
+                self.wfile.write(LOGGED_IN_PAGE)
+
+            def do_GET(self):
+                if not self._begin():
+                    return
+                url = urlparse(self.path)
+                path = url.path
+                if path == '/ministering-proposed-assignments':
+                    unit = parse_qs(url.query).get('unitNumber', [None])[0]
+                    page = server.page(unit)
+                    if page is None:
+                        return self._send(404)
+                    self._send(200, page, 'text/html; charset=utf-8')
+                elif path == '/services/umlu/v1/ministering/sandbox-data-full':
+                    with server.lock:
+                        body = json.dumps(server.data).encode('utf-8')
+                    self._send(200, body)
+                else:
+                    self._send(404)
+
+            def do_HEAD(self):
+                # the same headers as GET, without the body
+                if not server.allow_head:
+                    return self._send(405)
+                self.do_GET()
+
+            def do_PUT(self):
+                body = self._body()
+                if not self._begin():
+                    return
+                if urlparse(self.path).path != COMPANIONSHIP_PATH:
+                    return self._send(404)
+                try:
+                    status, response = server.put_companionship(json.loads(body))
+                except (ValueError, KeyError, TypeError):
+                    status, response = 400, {'errors': ['Malformed request']}
+                self._send(status, response)
+
+            def do_DELETE(self):
+                if not self._begin():
+                    return
+                m = re.match(COMPANIONSHIP_PATH + '/([^/?]+)$', urlparse(self.path).path)
+                if not m:
+                    return self._send(404)
+                self._send(server.delete_companionship(m.group(1)))
+
+        return Handler
+
+
+if __name__ == '__main__':
+    scale = sys.argv[1] if len(sys.argv) > 1 else 'ward'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    server = MockLCRServer(synthetic_data(*SCALES[scale]), port=port)
+    print('Serving synthetic %s data at %s' % (scale, server.url))
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
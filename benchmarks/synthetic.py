@@ -0,0 +1,66 @@
+""" Synthetic ministering data in the shape of the ministeringData object
+embedded in the lds.org proposed-assignments page, for benchmarks """
+import random
+
+# (districts, companionships per district, unassigned households)
+SCALES = {
+    'ward': (6, 12, 40),
+    'stake': (60, 12, 400),
+    'multi-stake': (600, 12, 4000),
+}
+
+
+def synthetic_data(districts=6, companionships=12, unassigned=40, seed=0,
+        datasets=('elders',)):
+    """ Return a synthetic ministeringData dict
+
+    Keyword parameters:
+    districts -- number of districts
+    companionships -- number of companionships per district
+    unassigned -- number of eligible households with no companionship
+    seed -- random seed (default: 0)
+    datasets -- datasets to fill with districts, e.g. 'reliefSociety'
+            (default: ('elders',))
+    """
+    rng = random.Random(seed)
+    counter = iter(range(1, 1 << 62))
+
+    def person(surname):
+        n = next(counter)
+        record = {
+            'name': '%s%d, %s' % (surname, n, rng.choice(['Peter', 'Mark', 'Les', 'Moe'])),
+            'personUuid': '00000000-0000-4000-8000-%012d' % n,
+            'legacyCmisId': 3000000000 + n}
+        if n % 3:
+            record['email'] = 'member%d@example.org' % n
+        return record
+
+    result = {}
+    ministers = []
+    households = []
+    for d in range(districts * len(datasets)):
+        companionship_list = []
+        for c in range(companionships):
+            minister_list = [person('Minister') for _ in range(2)]
+            assignment_list = [person('Household') for _ in range(rng.randrange(5))]
+            ministers += minister_list
+            households += assignment_list
+            companionship_list.append({
+                'id': '00000000-0000-4000-9000-%06d%06d' % (d, c),
+                'ministers': minister_list,
+                'assignments': assignment_list})
+        supervisor = person('Supervisor')
+        result.setdefault(datasets[d // districts], []).append({
+            'districtName': 'District %d' % (d % districts + 1),
+            'districtUuid': '00000000-0000-4000-a000-%012d' % d,
+            'supervisorName': supervisor['name'],
+            'supervisorPersonUuid': supervisor['personUuid'],
+            'supervisorLegacyCmisId': supervisor['legacyCmisId'],
+            'companionships': companionship_list})
+
+    ministers += [person('Minister') for _ in range(unassigned // 4)]
+    households += [person('Household') for _ in range(unassigned)]
+    result['eligibleMinistersAndAssignments'] = {
+        'eligibleMinisters': ministers,
+        'eligibleAssignments': households}
+    return result
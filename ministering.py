@@ -1,8 +1,206 @@
-import requests
 import json
 import getpass
 import re
 import random
+import heapq
+from collections import Counter
+import threading
+import time
+import os
+import gc
+import mmap
+import pickle
+import struct
+import zlib
+import datetime
+import math
+import contextlib
+import unicodedata
+import difflib
+import sys
+import importlib
+import importlib.util
+
+
+class _LazyModule:
+    """ Stand-in for a module that is imported on first use and then takes
+    the stand-in's place, so that commands working only on saved data do
+    not pay for importing network and database libraries """
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        importlib.import_module(self._name)
+        package = sys.modules[self._name.split('.')[0]]
+        globals()[package.__name__] = package
+        return getattr(package, attr)
+
+
+def _optional_module(name):
+    """ Return a _LazyModule for name, or None if it is not installed """
+    return _LazyModule(name) if importlib.util.find_spec(name) else None
+
+
+requests = _LazyModule('requests')
+asyncio = _LazyModule('asyncio')
+multiprocessing = _LazyModule('multiprocessing')
+email = _LazyModule('email.utils')
+concurrent = _LazyModule('concurrent.futures')
+hashlib = _LazyModule('hashlib')
+aiohttp = _optional_module('aiohttp')
+sqlite3 = _optional_module('sqlite3')
+numpy = _optional_module('numpy')
+
+
+def _build_index(records, key):
+    """ Return dict mapping key(record) to the list of matching records """
+    index = {}
+    for record in records:
+        index.setdefault(key(record), []).append(record)
+    return index
+
+
+def _name_tokens(name):
+    """ Return the lowercase, accent-free words of a name """
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join([c for c in name if not unicodedata.combining(c)])
+    return re.findall(r'[^\W_]+', name.casefold())
+
+
+def _trigrams(tokens):
+    """ Return the set of letter trigrams of a list of words, each padded
+    so that word beginnings and endings count """
+    grams = set()
+    for token in tokens:
+        token = '$' + token + '$'
+        grams.update([token[i:i + 3] for i in range(len(token) - 2)])
+    return grams
+
+
+def _word_similarity(word, other):
+    if word == other:
+        return 1.0
+    if len(word) > 1 and other.startswith(word):
+        return 0.9
+    return difflib.SequenceMatcher(None, word, other).ratio()
+
+
+class NameIndex:
+    """ Fuzzy search over the names of a list of records
+
+    Names are compared by their words, ignoring case, accents, punctuation
+    and word order, so 'john smith' finds "Smith, John". Candidates are
+    drawn from an index of letter trigrams and then ranked word by word,
+    which tolerates misspellings and initials.
+    """
+    __slots__ = ['_records', '_tokens', '_sizes', '_index', '_exact']
+    def __init__(self, records):
+        """ Keyword parameters:
+        records -- list of records with a name attribute
+        """
+        self._records = list(records)
+        self._tokens = [_name_tokens(x.name) for x in self._records]
+        self._sizes = []
+        self._index = {}
+        self._exact = {}
+        for i, tokens in enumerate(self._tokens):
+            self._exact.setdefault(tuple(sorted(tokens)), i)
+            grams = _trigrams(tokens)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._index.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self._records)
+
+    def search(self, query, limit=5, cutoff=0.6, candidates=20):
+        """ Return up to limit (record, score) pairs matching query, best
+        first; scores run from 0 to 1
+
+        Keyword parameters:
+        query -- name to look for
+        limit -- maximum number of matches (default: 5)
+        cutoff -- minimum score of a match (default: 0.6)
+        candidates -- number of records sharing the most trigrams with the
+                query that are ranked in full (default: 20)
+        """
+        tokens = _name_tokens(query)
+        if not tokens:
+            return []
+        grams = _trigrams(tokens)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._index.get(gram, ()))
+
+        results = []
+        for i, count in shared.most_common(candidates):
+            words = self._tokens[i]
+            word_score = sum([max([_word_similarity(q, w) for w in words])
+                    for q in tokens]) / len(tokens)
+            gram_score = 2.0 * count / (len(grams) + self._sizes[i])
+            score = 0.7 * word_score + 0.3 * gram_score
+            if score >= cutoff:
+                results.append((-score, i))
+        results.sort()
+        return [(self._records[i], -score) for score, i in results[:limit]]
+
+    def resolve(self, names, cutoff=0.6):
+        """ Return a list holding the best matching record for each of names,
+        or None where nothing scores at least cutoff """
+        resolved = {}
+        for name in names:
+            if name in resolved:
+                continue
+            # a name matching word for word needs no fuzzy search
+            i = self._exact.get(tuple(sorted(_name_tokens(name))))
+            if i is not None:
+                resolved[name] = self._records[i]
+            else:
+                matches = self.search(name, 1, cutoff)
+                resolved[name] = matches[0][0] if matches else None
+        return [resolved[name] for name in names]
+
+
+class _NameSearch:
+    """ search_names and resolve_names for record collections with get_*
+    methods for each kind in _NAME_KINDS """
+    __slots__ = ()
+
+    def _name_index(self, kind):
+        if kind not in self._NAME_KINDS:
+            raise ValueError("Unknown kind %r; expected one of %s" % (
+                    kind, ', '.join(self._NAME_KINDS)))
+        index = self._name_indexes.get(kind)
+        if index is None:
+            index = NameIndex(getattr(self, 'get_' + kind)())
+            self._name_indexes[kind] = index
+        return index
+
+    def search_names(self, query, kind='ministers', limit=5, cutoff=0.6):
+        """ Return up to limit (record, score) pairs whose names best match
+        query, best first; see NameIndex
+
+        Keyword parameters:
+        query -- name to look for, e.g. 'john smith'
+        kind -- 'ministers', 'assignments', or for MinisteringAssignments also
+                'companionships' or 'districts' (default: 'ministers')
+        limit -- maximum number of matches (default: 5)
+        cutoff -- minimum score, from 0 to 1 (default: 0.6)
+        """
+        return self._name_index(kind).search(query, limit, cutoff)
+
+    def resolve_names(self, names, kind='ministers', cutoff=0.6):
+        """ Return a list holding the record best matching each of names, or
+        None where there is no match, searching one prebuilt index
+
+        Keyword parameters:
+        names -- list of names to look for, e.g. a spreadsheet column
+        kind -- 'ministers', 'assignments', or for MinisteringAssignments also
+                'companionships' or 'districts' (default: 'ministers')
+        cutoff -- minimum score, from 0 to 1 (default: 0.6)
+        """
+        return self._name_index(kind).resolve(names, cutoff)
+
 
 class District:
     __slots__ = {'_id', '_name', '_supervisor', '_companionships'}
@@ -13,6 +211,9 @@ class District:
         self._companionships = companionships
     def __repr__(self):
         return '%s("%s")' % (self.__class__.__name__, self._name)
+    def __reduce__(self):
+        return (self.__class__, (self._id, self._name, self._supervisor,
+                self._companionships))
     @property
     def id(self): return self._id
     @property 
@@ -32,6 +233,9 @@ class Person:
         self._email = email
     def __repr__(self):
         return '%s("%s")' % (self.__class__.__name__, self._name)
+    def __reduce__(self):
+        return (self.__class__, (self._id, self._legacy_id, self._name,
+                self._email))
     @property
     def name(self): return self._name
     @property 
@@ -51,6 +255,9 @@ class Companionship:
         self._assignments = assignments
     def __repr__(self):
         return '%s("%s")' % (self.__class__.__name__, self._name)
+    def __reduce__(self):
+        return (self.__class__, (self._id, self._name, self._ministers,
+                self._assignments))
     @property
     def id(self): return self._id
     @property
@@ -61,27 +268,212 @@ class Companionship:
     def assignments(self): return self._assignments
 
 
-class MinisteringAssignments:
-    __slots__ = ['_minister_list', '_assignment_list', '_companionship_list',
-        '_district_list', '_data']
-    def __init__(self, data=None, dataset='elders'):
+class PersonRegistry:
+    """ Identity map of Person records keyed by uuid
+
+    Each member is one Person however many times they appear: as minister,
+    household or supervisor, and in both MinisteringAssignments and
+    MinisteringEligible when they share a registry. The first record seen
+    for a uuid is kept, and fields it lacks, such as the email of a member
+    first seen as a supervisor, are filled in from later ones.
+    """
+    __slots__ = ['_people']
+    def __init__(self):
+        self._people = {}
+    def __len__(self):
+        return len(self._people)
+    def __contains__(self, id):
+        return id in self._people
+
+    def get(self, id):
+        """ Return the Person with the given uuid, or None """
+        return self._people.get(id)
+
+    def person(self, id, legacy_id, name=None, email=None):
+        """ Return the Person with the given uuid, creating it from the
+        other arguments if it is not yet known """
+        person = self._people.get(id)
+        if person is None:
+            person = self._people.setdefault(id, Person(id, legacy_id, name, email))
+        return self._fill(person, name, email)
+
+    def record(self, record):
+        """ Return the Person for a decoded lds.org person record """
+        person = self._people.get(record['personUuid'])
+        if person is None:
+            person = self._people.setdefault(record['personUuid'],
+                    _person_from_dict(record))
+        return self._fill(person, record.get('name'), record.get('email'))
+
+    @staticmethod
+    def _fill(person, name, email):
+        """ Complete person with the name and email it is missing """
+        if person._name is None:
+            person._name = name
+        if person._email is None:
+            person._email = email
+        return person
+
+    def add(self, person):
+        """ Return the registered Person with the uuid of person, registering
+        person itself if the uuid is not yet known """
+        return self._fill(self._people.setdefault(person.id, person),
+                person.name, person.email)
+
+
+class _CompanionshipView(Companionship):
+    """ Companionship creating its ministers and households from a decoded
+    lds.org record on first access """
+    __slots__ = {'_record', '_registry'}
+    def __init__(self, record, registry):
+        self._record = record
+        self._registry = registry
+        self._id = record['id']
+        self._name = " and ".join([x['name'] for x in record['ministers']])
+        self._ministers = None
+        self._assignments = None
+    def __repr__(self):
+        return 'Companionship("%s")' % self._name
+    def __reduce__(self):
+        return (Companionship, (self.id, self.name, self.ministers,
+                self.assignments))
+    @property
+    def ministers(self):
+        if self._ministers is None:
+            self._ministers = [self._registry.record(x)
+                    for x in self._record['ministers']]
+        return self._ministers
+    @property
+    def assignments(self):
+        if self._assignments is None:
+            self._assignments = [self._registry.record(x)
+                    for x in self._record.get('assignments', [])]
+        return self._assignments
+
+
+class _DistrictView(District):
+    """ District creating its supervisor and companionships from a decoded
+    lds.org record on first access """
+    __slots__ = {'_record', '_registry'}
+    def __init__(self, record, registry):
+        self._record = record
+        self._registry = registry
+        self._id = record['districtUuid']
+        self._name = record['districtName']
+        self._supervisor = None
+        self._companionships = None
+    def __repr__(self):
+        return 'District("%s")' % self._name
+    def __reduce__(self):
+        return (District, (self.id, self.name, self.supervisor,
+                self.companionships))
+    @property
+    def supervisor(self):
+        if self._supervisor is None:
+            record = self._record
+            self._supervisor = self._registry.person(
+                id = record['supervisorPersonUuid'],
+                legacy_id = record['supervisorLegacyCmisId'],
+                name = record['supervisorName'])
+        return self._supervisor
+    @property
+    def companionships(self):
+        if self._companionships is None:
+            self._companionships = [_CompanionshipView(x, self._registry)
+                    for x in self._record.get('companionships', [])]
+        return self._companionships
+
+
+class MinisteringAssignments(_NameSearch):
+    _NAME_KINDS = ('ministers', 'assignments', 'companionships', 'districts')
+    __slots__ = ['_name_indexes', '_minister_list', '_assignment_list', '_companionship_list',
+        '_district_list', '_data', '_district_index', '_companionship_index',
+        '_minister_index', '_minister_legacy_index', '_assignment_index',
+        '_assignment_legacy_index', '_companionship_district', '_raw_index',
+        '_registry', '_supervisor_index', '_minister_companionships',
+        '_assignment_companionships']
+    def __init__(self, data=None, dataset='elders', lazy=False, registry=None):
+        """ Keyword parameters:
+        data -- JSON data from lds.org to load (default: empty)
+        dataset -- subset of JSON data to use (default: 'elders')
+        lazy -- create records only when they are first used; see loads
+                (default: False)
+        registry -- PersonRegistry to take Person records from, e.g. one
+                shared with a MinisteringEligible (default: a new one)
+        """
+        self._raw_index = None
+        self._registry = registry if registry is not None else PersonRegistry()
         if data:
-            self.loads(data, dataset)
+            self.loads(data, dataset, lazy)
         else:
             self._district_list = []
             self._companionship_list = []
             self._minister_list = []
             self._assignment_list = []
+            self._data = None
+            self._reindex()
+
+    def __getstate__(self):
+        # pickle a fully built model, never views of the raw data
+        self._materialize()
+        return (None, dict((k, getattr(self, k)) for k in self.__slots__))
+
+    def _materialize(self):
+        """ Build the flattened record lists and indexes of a lazily loaded
+        model, creating every record """
+        if self._minister_list is None:
+            self._rebuild()
+
+    def _raw_ids(self):
+        """ Return (minister uuids, household uuids, companionship uuid ->
+        District) read straight from the decoded data of a lazily loaded
+        model, without creating any Person records """
+        if self._raw_index is None:
+            ministers, assignments, districts = set(), set(), {}
+            for district in self._district_list:
+                for c in district._record.get('companionships', []):
+                    districts[c['id']] = district
+                    ministers.update([x['personUuid'] for x in c['ministers']])
+                    assignments.update([x['personUuid']
+                            for x in c.get('assignments', [])])
+            self._raw_index = ministers, assignments, districts
+        return self._raw_index
+
+    def _reindex(self):
+        """ Rebuild the uuid and legacy_id lookup tables from the record lists """
+        self._name_indexes = {}
+        self._district_index = _build_index(self._district_list, lambda x: x.id)
+        self._companionship_index = _build_index(self._companionship_list, lambda x: x.id)
+        self._minister_index = _build_index(self._minister_list, lambda x: x.id)
+        self._minister_legacy_index = _build_index(self._minister_list, lambda x: x.legacy_id)
+        self._assignment_index = _build_index(self._assignment_list, lambda x: x.id)
+        self._assignment_legacy_index = _build_index(self._assignment_list, lambda x: x.legacy_id)
+        self._supervisor_index = _build_index(self._district_list, lambda x: x.supervisor.id)
+        self._companionship_district = {}
+        self._minister_companionships = {}
+        self._assignment_companionships = {}
+        for district in self._district_list:
+            for companionship in district.companionships:
+                self._companionship_district[companionship.id] = district
+                for person in companionship.ministers:
+                    self._minister_companionships.setdefault(person.id, []).append(companionship)
+                for person in companionship.assignments:
+                    self._assignment_companionships.setdefault(person.id, []).append(companionship)
     
-    def get_districts(self, id=None, name=None):
-        """ Return list of districts optionally matched by id or name
+    def get_districts(self, id=None, name=None, supervisor=None):
+        """ Return list of districts optionally matched by id, name or
+        supervisor
 
         Keyword parameters:
         id -- unique ID (uuid) of district
         name -- name of district
+        supervisor -- unique ID (uuid) of the district supervisor
         """
         if id:
-            return [x for x in self._district_list if id == x.id]
+            return list(self._district_index.get(id, []))
+        if supervisor:
+            self._materialize()
+            return list(self._supervisor_index.get(supervisor, []))
         if name:
             return [x for x in self._district_list if name in x.name]
         else:
@@ -90,15 +482,26 @@ class MinisteringAssignments:
     def districts(self):
         return self.get_districts()
     
-    def get_ministers(self, id=None, name=None):
-        """ Return list of assigned minister optionally matched by id or name
+    def get_ministers(self, id=None, name=None, legacy_id=None,
+            ministering_to=None):
+        """ Return list of assigned minister optionally matched by id,
+        legacy_id or name, or the ministers of a household
 
         Keyword parameters:
         id -- unique ID (uuid) of minister
         name -- name of minister
+        legacy_id -- legacy CMIS ID of minister
+        ministering_to -- unique ID (uuid) of a head of household whose
+                ministers to return
         """
+        self._materialize()
         if id:
-            return [x for x in self._minister_list if id == x.id]
+            return list(self._minister_index.get(id, []))
+        if ministering_to:
+            return [x for c in self._assignment_companionships.get(ministering_to, [])
+                    for x in c.ministers]
+        if legacy_id:
+            return list(self._minister_legacy_index.get(legacy_id, []))
         if name:
             return [x for x in self._minister_list if name in x.name]
         else:
@@ -107,15 +510,26 @@ class MinisteringAssignments:
     def ministers(self):
         return self.get_ministers()
 
-    def get_assignments(self, id=None, name=None):
-        """ Return list of assigned households optionally matched by id or name
+    def get_assignments(self, id=None, name=None, legacy_id=None,
+            ministered_by=None):
+        """ Return list of assigned households optionally matched by id,
+        legacy_id or name, or the households of a minister
 
         Keyword parameters:
         id -- unique ID (uuid) of head of household
         name -- name of household
+        legacy_id -- legacy CMIS ID of head of household
+        ministered_by -- unique ID (uuid) of a minister whose households to
+                return
         """
+        self._materialize()
         if id:
-            return [x for x in self._assignment_list if id == x.id]
+            return list(self._assignment_index.get(id, []))
+        if ministered_by:
+            return [x for c in self._minister_companionships.get(ministered_by, [])
+                    for x in c.assignments]
+        if legacy_id:
+            return list(self._assignment_legacy_index.get(legacy_id, []))
         if name:
             return [x for x in self._assignment_list if name in x.name]
         else:
@@ -124,15 +538,45 @@ class MinisteringAssignments:
     def assignments(self):
         return self.get_assignments()
 
-    def get_companionships(self, id=None, name=None):
-        """ Return list of companionships optionally matched by id or name
+    def has_minister(self, id):
+        """ Return True if the minister with the given uuid is assigned to a
+        companionship """
+        if self._minister_list is None:
+            return id in self._raw_ids()[0]
+        return id in self._minister_index
+
+    def has_assignment(self, id):
+        """ Return True if the household with the given uuid is assigned to a
+        companionship """
+        if self._minister_list is None:
+            return id in self._raw_ids()[1]
+        return id in self._assignment_index
+
+    def get_district_of(self, id):
+        """ Return the District holding the companionship with the given uuid,
+        or None if there is no such companionship """
+        if self._minister_list is None:
+            return self._raw_ids()[2].get(id)
+        return self._companionship_district.get(id)
+
+    def get_companionships(self, id=None, name=None, minister=None,
+            assignment=None):
+        """ Return list of companionships optionally matched by id or name,
+        or by a member who ministers in them or is assigned to them
 
         Keyword parameters:
         id -- unique ID (uuid) of companionship
         name -- name of companionship
+        minister -- unique ID (uuid) of a minister
+        assignment -- unique ID (uuid) of a head of household
         """
+        self._materialize()
         if id:
-            return [x for x in self._companionship_list if id == x.id]
+            return list(self._companionship_index.get(id, []))
+        if minister:
+            return list(self._minister_companionships.get(minister, []))
+        if assignment:
+            return list(self._assignment_companionships.get(assignment, []))
         if name:
             return [x for x in self._companionship_list if name in x.name]
         else:
@@ -141,21 +585,38 @@ class MinisteringAssignments:
     def companionships(self):
         return self.get_companionships()
 
-    def loads(self, data, dataset='elders'):
+    def loads(self, data, dataset='elders', lazy=False):
         """ Parse JSON data from lds.org and populate the current 
         MinisteringAssignments record
 
+        In lazy mode, districts are views over the decoded data, and their
+        companionships and people are created only when first used, so a
+        script that looks at one district never builds the rest. Listing or
+        searching ministers, households or companionships across the unit,
+        or patching the model, creates every record.
+
         Keyword parameters:
         data -- JSON data from https://lcr.lds.org/ministering-proposed-assignments
         dataset -- subset of JSON data to use for ministering data (default: 'elders')
+        lazy -- create records only when they are first used (default: False)
         """
         self._data = data[dataset]
+        self._raw_index = None
+        if lazy:
+            self._district_list = [_DistrictView(x, self._registry) for x in self._data]
+            self._companionship_list = None
+            self._minister_list = None
+            self._assignment_list = None
+            self._district_index = _build_index(self._district_list, lambda x: x.id)
+            self._name_indexes = {}
+            return self
         self._district_list = []
         self._companionship_list = []
         self._minister_list = []
         self._assignment_list = []
 
         # process districts
+        registry = self._registry
         district_list = []
         for district in data[dataset]:
             companionship_list = []
@@ -165,15 +626,7 @@ class MinisteringAssignments:
                     # process ministers
                     minister_list = []
                     for person in companionship['ministers']:
-                        if 'email' in person:
-                            email = person['email']
-                        else:
-                            email = None
-                        personObj = Person(
-                            name = person['name'],
-                            email = email,
-                            id = person['personUuid'],
-                            legacy_id = person['legacyCmisId'])
+                        personObj = registry.record(person)
                         minister_list.append(personObj)
                         self._minister_list.append(personObj)
 
@@ -181,15 +634,7 @@ class MinisteringAssignments:
                     assignment_list = []
                     if 'assignments' in companionship:
                         for person in companionship['assignments']:
-                            if 'email' in person:
-                                email = person['email']
-                            else:
-                                email = None
-                            personObj = Person(
-                                name = person['name'],
-                                email = email,
-                                id = person['personUuid'],
-                                legacy_id = person['legacyCmisId'])
+                            personObj = registry.record(person)
                             assignment_list.append(personObj)
                             self._assignment_list.append(personObj)
 
@@ -203,11 +648,10 @@ class MinisteringAssignments:
                     self._companionship_list.append(companionshipObj)
 
             # add supervisor record
-            supervisorObj = Person(
+            supervisorObj = registry.person(
                 id = district['supervisorPersonUuid'],
                 legacy_id = district['supervisorLegacyCmisId'],
-                name = district['supervisorName'],
-                email = None)
+                name = district['supervisorName'])
 
             # add district record
             districtObj = District(
@@ -216,29 +660,167 @@ class MinisteringAssignments:
                 supervisor = supervisorObj,
                 companionships = companionship_list)
             self._district_list.append(districtObj)
- 
+
+        self._reindex()
         return self
 
+    def _rebuild(self):
+        """ Rebuild the flattened record lists and indexes from the districts """
+        self._companionship_list = [c for d in self._district_list
+                for c in d.companionships]
+        self._minister_list = [p for c in self._companionship_list
+                for p in c.ministers]
+        self._assignment_list = [p for c in self._companionship_list
+                for p in c.assignments]
+        self._raw_index = None
+        self._reindex()
+
+    def patch_companionship(self, district_id, id, ministers, assignments=[]):
+        """ Apply a companionship create or update to the local model (and
+        its raw JSON data) without downloading it again; return the
+        Companionship record; raise ValueError if the district is unknown
+
+        Keyword parameters:
+        district_id -- unique ID (uuid) of the district holding the companionship
+        id -- unique ID (uuid) of the new or updated companionship
+        ministers -- list of ministers, each given by a Person record
+        assignments -- list of households, each given by a Person record
+        """
+        self._materialize()
+        districts = self._district_index.get(district_id)
+        if not districts:
+            raise ValueError("District not found")
+        district = districts[0]
+
+        ministers = [self._registry.add(x) for x in ministers]
+        assignments = [self._registry.add(x) for x in assignments]
+        name = " and ".join([x.name for x in ministers])
+        existing = self._companionship_index.get(id)
+        if existing:
+            companionshipObj = existing[0]
+            companionshipObj._name = name
+            companionshipObj._ministers = list(ministers)
+            companionshipObj._assignments = list(assignments)
+            for d in self._district_list:
+                if d is not district and companionshipObj in d.companionships:
+                    d.companionships.remove(companionshipObj)
+            if companionshipObj not in district.companionships:
+                district.companionships.append(companionshipObj)
+        else:
+            companionshipObj = Companionship(
+                id = id,
+                name = name,
+                ministers = list(ministers),
+                assignments = list(assignments))
+            district.companionships.append(companionshipObj)
+
+        # keep the raw data in step so save_data writes the patched state
+        if self._data is not None:
+            record = {
+                'id': id,
+                'ministers': [_person_dict(x) for x in ministers],
+                'assignments': [_person_dict(x) for x in assignments]}
+            placed = False
+            for d in self._data:
+                companionships = d.setdefault('companionships', [])
+                for i, c in enumerate(companionships):
+                    if c['id'] == id:
+                        if d['districtUuid'] == district_id:
+                            companionships[i] = record
+                            placed = True
+                        else:
+                            del companionships[i]
+                        break
+            if not placed:
+                for d in self._data:
+                    if d['districtUuid'] == district_id:
+                        d['companionships'].append(record)
+
+        self._rebuild()
+        return companionshipObj
+
+    def remove_companionship(self, id):
+        """ Remove a deleted companionship from the local model (and its raw
+        JSON data) without downloading it again
+
+        Keyword parameters:
+        id -- unique ID (uuid) of the deleted companionship
+        """
+        self._materialize()
+        for district in self._district_list:
+            district._companionships = [x for x in district.companionships
+                    if x.id != id]
+        if self._data is not None:
+            for d in self._data:
+                if 'companionships' in d:
+                    d['companionships'] = [x for x in d['companionships']
+                            if x['id'] != id]
+        self._rebuild()
+
+
+def _person_dict(person):
+    """ Return the lds.org JSON representation of a Person record """
+    record = {
+        'name': person.name,
+        'personUuid': person.id,
+        'legacyCmisId': person.legacy_id}
+    if person.email is not None:
+        record['email'] = person.email
+    return record
+
+
+def _person_from_dict(record):
+    """ Return a Person record from its lds.org JSON representation """
+    return Person(
+        name = record['name'],
+        email = record.get('email'),
+        id = record['personUuid'],
+        legacy_id = record['legacyCmisId'])
 
-class MinisteringEligible:
-    __slots__ = ['_minister_list', '_assignment_list', '_data']
-    def __init__(self, data=None, dataset='eligibleMinistersAndAssignments'):
+
+class MinisteringEligible(_NameSearch):
+    _NAME_KINDS = ('ministers', 'assignments')
+    __slots__ = ['_name_indexes', '_minister_list', '_assignment_list', '_data',
+        '_minister_index', '_minister_legacy_index', '_assignment_index',
+        '_assignment_legacy_index', '_registry']
+    def __init__(self, data=None, dataset='eligibleMinistersAndAssignments',
+            registry=None):
+        """ Keyword parameters:
+        data -- JSON data from lds.org to load (default: empty)
+        dataset -- subset of JSON data to use
+                (default: 'eligibleMinistersAndAssignments')
+        registry -- PersonRegistry to take Person records from, e.g. one
+                shared with a MinisteringAssignments (default: a new one)
+        """
+        self._registry = registry if registry is not None else PersonRegistry()
         if data:
             self.loads(data, dataset)
         else:
             self._minister_list = []
             self._assignment_list = []
             self._data = None
+            self._reindex()
+
+    def _reindex(self):
+        """ Rebuild the uuid and legacy_id lookup tables from the record lists """
+        self._name_indexes = {}
+        self._minister_index = _build_index(self._minister_list, lambda x: x.id)
+        self._minister_legacy_index = _build_index(self._minister_list, lambda x: x.legacy_id)
+        self._assignment_index = _build_index(self._assignment_list, lambda x: x.id)
+        self._assignment_legacy_index = _build_index(self._assignment_list, lambda x: x.legacy_id)
     
-    def get_ministers(self, id=None, name=None):
-        """ Return list of eligible minister(s) matched by id or name
+    def get_ministers(self, id=None, name=None, legacy_id=None):
+        """ Return list of eligible minister(s) matched by id, legacy_id or name
 
         Keyword parameters:
         id -- unique ID (uuid) of minister
         name -- name of minister
+        legacy_id -- legacy CMIS ID of minister
         """
         if id:
-            return [x for x in self._minister_list if id == x.id]
+            return list(self._minister_index.get(id, []))
+        if legacy_id:
+            return list(self._minister_legacy_index.get(legacy_id, []))
         if name:
             return [x for x in self._minister_list if name in x.name]
         else:
@@ -247,15 +829,19 @@ class MinisteringEligible:
     def ministers(self):
         return self.get_ministers()
 
-    def get_assignments(self, id=None, name=None):
-        """ Return list of eligible households optionally matched by id or name
+    def get_assignments(self, id=None, name=None, legacy_id=None):
+        """ Return list of eligible households optionally matched by id,
+        legacy_id or name
 
         Keyword parameters:
         id -- unique ID (uuid) of head of household
         name -- name of household
+        legacy_id -- legacy CMIS ID of head of household
         """
         if id:
-            return [x for x in self._assignment_list if id == x.id]
+            return list(self._assignment_index.get(id, []))
+        if legacy_id:
+            return list(self._assignment_legacy_index.get(legacy_id, []))
         if name:
             return [x for x in self._assignment_list if name in x.name]
         else:
@@ -283,15 +869,7 @@ class MinisteringEligible:
         minister_list = []
         if 'eligibleMinisters' in data:
             for person in data['eligibleMinisters']:
-                if 'email' in person:
-                    email = person['email']
-                else:
-                    email = None
-                personObj = Person(
-                    name = person['name'],
-                    email = email,
-                    id = person['personUuid'],
-                    legacy_id = person['legacyCmisId'])
+                personObj = self._registry.record(person)
                 minister_list.append(personObj)
                 self._minister_list.append(personObj)
 
@@ -299,289 +877,3157 @@ class MinisteringEligible:
             assignment_list = []
             if 'eligibleAssignments' in data:
                 for person in data['eligibleAssignments']:
-                    if 'email' in person:
-                        email = person['email']
-                    else:
-                        email = None
-                    personObj = Person(
-                        name = person['name'],
-                        email = email,
-                        id = person['personUuid'],
-                        legacy_id = person['legacyCmisId'])
+                    personObj = self._registry.record(person)
                     assignment_list.append(personObj)
                     self._assignment_list.append(personObj)
 
+        self._reindex()
         return self
         
         
 
-class MinisteringSession:
+_NEXT_DATA_MARKER = b'__NEXT_DATA__ = '
+_MINISTERING_DATA_KEY = '"ministeringData":'
+
+
+class _NextDataScanner:
+    """ Incremental search for the __NEXT_DATA__ line of a proposed-assignments
+    page, fed one chunk of bytes at a time """
     def __init__(self):
-        self._session = None
-        self._data = None
-        self._assignments = None
-        self._eligibles = None
-        self._dataset = None
-        self._stale = True
+        self._buffer = bytearray()
+        self._start = -1
+        self._end = -1
 
-    def login(self, username=None, password=None):
-        """ Login to lds.org and raise PermissionError if failed
+    def feed(self, chunk):
+        """ Add a chunk; return True once the __NEXT_DATA__ line is complete """
+        searched = len(self._buffer)
+        self._buffer += chunk
+        if self._end >= 0:
+            return True
+        if self._start < 0:
+            self._start = self._buffer.find(_NEXT_DATA_MARKER,
+                    max(0, searched - len(_NEXT_DATA_MARKER)))
+            if self._start < 0:
+                return False
+            self._start += len(_NEXT_DATA_MARKER)
+            searched = self._start
+        self._end = self._buffer.find(b'\n', searched)
+        return self._end >= 0
 
-        Keyword arguments:
-        username -- lds.org username (default: prompt)
-        password -- lds.org password (default: prompt)
-        """
-        if username==None:
-            username = input('Username: ')
-        if password==None:
-            password = getpass.getpass('Password: ')
+    def decode(self):
+        """ Return the ministeringData found so far, or None """
+        if self._start < 0:
+            return None
+        end = self._end if self._end >= 0 else len(self._buffer)
+        blob = bytes(self._buffer[self._start:end]).decode('utf-8').rstrip()
+        if not (blob.startswith('{') and blob.endswith('}')):
+            return None
+        # decode just the ministeringData value, starting at its offset
+        offset = blob.find(_MINISTERING_DATA_KEY)
+        if offset >= 0:
+            offset += len(_MINISTERING_DATA_KEY)
+            offset = len(blob) - len(blob[offset:].lstrip())
+            try:
+                data, _ = json.JSONDecoder().raw_decode(blob, offset)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and ('elders' in data or
+                    'eligibleMinistersAndAssignments' in data):
+                return data
+        try:
+            return json.loads(blob)['props']['initialState']['ministeringData']
+        except (ValueError, KeyError, TypeError):
+            return None
 
-        payload = {'username': username, 'password': password}
-        self._session = requests.session()
-        r = self._session.post('https://signin.lds.org/login.html', data=payload)
+    def digest(self):
+        """ Return a SHA-256 digest of the complete __NEXT_DATA__ line, or
+        None if it has not been found """
+        if self._end < 0:
+            return None
+        return hashlib.sha256(self._buffer[self._start:self._end]).hexdigest()
 
-        if not '<meta http-equiv="refresh"' in r.text:
-            raise PermissionError("Login failed")
+    def fallback(self):
+        """ Search the whole page fed so far the original way, for when the
+        page layout has changed; return the ministeringData or None """
+        m = re.search(r'__NEXT_DATA__ = ({.*})$', self._buffer.decode('utf-8'),
+                re.MULTILINE)
+        if m:
+            try:
+                return json.loads(m.group(1))['props']['initialState']['ministeringData']
+            except (ValueError, KeyError, TypeError):
+                return None
+        return None
 
-    def check_login(self):
-        """ Check if currently logged in with access to the ministering section """
-        if self._session is None:
-            return False
-        url = "https://lcr.lds.org/services/umlu/v1/ministering/sandbox-data-full?lang=eng&type=EQ"
-        r = self._session.get(url)
-        if "<!DOCTYPE" in r.text:
-            return False
-        else:
-            return True
 
-    def download_assignments(self, dataset='elders'):
-        """ Download ministering assignments from lds.org and populate
-        the structure from the selected dataset; raise ValueError if failed
+def extract_ministering_data(chunks):
+    """ Return the ministeringData object embedded in the __NEXT_DATA__ script
+    of a proposed-assignments page, or None if it cannot be found
 
-        Keyword arguments:
-        dataset -- dataset to populate (default: 'elders')
-        """
-        if not self.check_login():
-            self.login()
+    The page is read from an iterable of byte chunks, and reading stops at the
+    end of the __NEXT_DATA__ line. Only the ministeringData subtree is decoded;
+    if it cannot be located directly, the whole page is parsed the original
+    way instead.
 
-        if dataset in ['elders', 'currentElders']:
-            url = 'https://lcr.lds.org/ministering-proposed-assignments?lang=eng&type=EQ'
-        else:
-            raise ValueError("Currently only the 'elders' dataset is supported")
+    Keyword parameters:
+    chunks -- iterable of bytes, e.g. response.iter_content(65536)
+    """
+    return _scan_page(chunks)[1]
 
-        print("Downloading ministering assignments from", url)
-        r = self._session.get(url)
 
-        # parse response to get json encoded sandbox assignments
-        m = re.search(r'__NEXT_DATA__ = ({.*})$', r.text, re.MULTILINE)
-        if m:
-            json_string = m.group(1)
-            all_data = json.loads(json_string)
-            self._data = all_data['props']['initialState']['ministeringData']
-            self._assignments = MinisteringAssignments(self._data, dataset)
-            self._eligibles = MinisteringEligible(self._data)
-            self._dataset = dataset
-            self._stale = False
-        else:
-            raise ValueError("Could not parse response from lds.org")
+def _scan_page(chunks, digest=None):
+    """ Return (digest, ministeringData) for a proposed-assignments page read
+    from chunks, where digest hashes its __NEXT_DATA__ line (None if the
+    line is not found); if it equals the given digest, the data is left
+    undecoded and None is returned in its place """
+    chunks = iter(chunks)
+    scanner = _NextDataScanner()
+    for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    found = scanner.digest()
+    if found is not None and found == digest:
+        return found, None
+    data = scanner.decode()
+    if data is None:
+        # page layout changed; fall back to searching the whole page
+        for chunk in chunks:
+            scanner.feed(chunk)
+        data = scanner.fallback()
+    return found, data
 
-    def create_companionship(self, district, ministers, assignments=[]):
-        """ Create a new companionship in the given district, with the given
-        list of ministers and optional list of households; raise ValueError
-        if failed; attempt to log in if not currently logged in
 
-        Keyword arguments:
-        district -- District object of the district in which to place the
-                new companionship
-        ministers -- list of ministers for the companionship, each given by
-                a Person record
-        assignments -- optional list of households for the companionship, each 
-                given by a Person record
-        """
-        self.update_companionship(district, None, ministers, assignments)
+SNAPSHOT_MAGIC = b'LDSMIN'
+SNAPSHOT_VERSION = 4
+_SNAPSHOT_HEADER = struct.Struct('<6sBBIQ')
 
-    def update_companionship(self, district, companionship, ministers, assignments=[]):
-        """ Update an existing companionship in the given district, with the
-        given list of ministers and optional list of households; raise
-        ValueError if failed
 
-        Keyword arguments:
-        district -- District object of the district holding the companionship
-        companionship -- Companionship record of the existing companionship
-        ministers -- list of ministers for the companionship, each given by
-                a Person record
-        assignments -- optional list of households for the companionship, each 
-                given by a Person record
-        """
-        minister_string = [{'personUuid': x.id, 'legacyCmisId': x.legacy_id, 'overrideWarnings': True} for x in ministers]
-        assignment_string = [{'personUuid': x.id, 'legacyCmisId': x.legacy_id, 'overrideWarnings': True} for x in assignments]
-        if companionship is None:
-            uuid = None
-        else:
-            uuid = companionship.id
-        data = {
-            'district': {'uuid': district.id},
-            'ministeringPeople': minister_string,
-            'assignments': assignment_string,
-            'uuid': uuid}
-        url = 'https://lcr.lds.org/services/umlu/v1/ministering/sandbox-companionship?lang=eng'
-        headers = {'content-type': 'application/json;charset=UTF-8'}
-        r = self._session.put(url, json=data)
-        self._stale = True
-        
-        if uuid == None:
-            good_code = 201
-        else:
-            good_code = 200
-        if r.status_code != good_code or 'assignmentErrors' in json.loads(r.text):
-            raise ValueError((r.status_code, r.text))
+def dump_snapshot(obj, filename, compression=0):
+    """ Write obj to a binary snapshot file: a header carrying the format
+    version, compression level, CRC-32 and length of the payload, followed by
+    the pickled (and optionally zlib-compressed) payload
 
-    def delete_companionship(self, companionship):
-        """ Delete an existing companionship; raise PermissionError or
-        ValueError if failed
+    Keyword parameters:
+    obj -- object to store
+    filename -- name of file to write
+    compression -- zlib compression level, 0 (none) to 9 (default: 0)
+    """
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if compression:
+        payload = zlib.compress(payload, compression)
+    header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+            compression, zlib.crc32(payload), len(payload))
+    with open(filename, 'wb') as fp:
+        fp.write(header)
+        fp.write(payload)
 
-        Keyword arguments:
-        companionship -- Companionship record of the companionship to be deleted
-        """
-        url = "https://lcr.lds.org/services/umlu/v1/ministering/sandbox-companionship/%s?lang=eng" % (
-                companionship.id)
-        r = self._session.delete(url)
-        good_code = 204
-        notfound_code = 400
-        notloggedin_code = 200
-        if r.status_code == notloggedin_code:
-            raise PermissionError("Access denied (may need to log in again)")
-        elif r.status_code == notfound_code:
-            raise ValueError("Companionship not found")
-        elif r.status_code != good_code:
-            raise ValueError((r.status_code, r.text))
-        self._stale = True
 
-    def delete_companionships(self, district, preview=False):
-        """ Delete all companionships in district; raise PermissionError or
-        ValueError if failed; attempt to log in if not currently logged in
+def load_snapshot(filename):
+    """ Read an object written by dump_snapshot, memory-mapping the file
+    rather than copying it; raise ValueError if the file is not a snapshot,
+    was written by a different format version, or is corrupt
 
-        Keyword arguments:
-        district -- District record of the district to be purged
-        preview -- preview output before committing chanages (default: False)
-        """
-        for companionship in district.companionships:
-            print("Deleting", companionship, "from", district)
-            if not preview:
-                self.delete_companionship(companionship)
+    NOTE: snapshots are pickles; only load files you wrote yourself.
 
-    def copy_companionships(self, from_districts, to_district, preview=False):
-        """Copy companionships from from_districts to to_district, optionally
-        previewing the result before committing
+    Keyword parameters:
+    filename -- name of file to read
+    """
+    with open(filename, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < _SNAPSHOT_HEADER.size:
+                raise ValueError("Not a ministering snapshot")
+            magic, version, compression, checksum, length = \
+                    _SNAPSHOT_HEADER.unpack_from(mm)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("Not a ministering snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError("Unsupported snapshot version %d" % version)
+            with memoryview(mm)[_SNAPSHOT_HEADER.size:] as payload:
+                if len(payload) != length or zlib.crc32(payload) != checksum:
+                    raise ValueError("Snapshot is corrupt")
+                if compression:
+                    payload = zlib.decompress(payload)
+                try:
+                    return _unpickle(payload)
+                except (pickle.UnpicklingError, AttributeError, ImportError,
+                        EOFError) as e:
+                    # e.g. written by a script run as __main__, or naming a
+                    # class this version no longer has
+                    raise ValueError("Snapshot does not match this version "
+                            "of ministering: %s" % e)
 
-        Keyword arguments:
-        from_districts -- districts to copy companionships from
-        to_district -- district to copy companionships to
-        preview -- preview output before committing changes (default: False)
 
-        Example:
-        Copy companionships from first three districts to the sixth
-        >>> ms.copy_companionships(ms.assignments.districts[0:3], 
-        >>>         ms.assignments.districts[5], preview=False)
-        """
-        for district in from_districts:
-            for companionship in district.companionships:
-                print('Copying %s from %s to %s' % (companionship, district, to_district))
-                if not preview:
-                    self.create_companionship(to_district, companionship.ministers)
-        
-    def distribute_assignments(self, to_district, eligible_assignments=None, 
-            preview=False):
-        """Distribute eligible assignees among companionships in to_district
+def _unpickle(payload):
+    """ Unpickle a large object graph with the garbage collector paused, as
+    it would otherwise rescan the growing graph many times over """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(payload)
+    finally:
+        if enabled:
+            gc.enable()
 
-        Keyword arguments:
-        to_district -- district with companionships to distribute assignments 
-                       among
-        eligibles -- list of eligible assignments to distribute 
-                     (default: None, loads list of eligible assignments
-                     from database)
-        preview -- preview output before committing changes (default: False)
 
-        Example:
-        Distribute unassigned households to the companionships in district 6
-        >>> ms.distribute_assignments(ms.assignments.districts[5])
-        """
-        if eligible_assignments is None:
-            eligible_assignments = self.unassigned_households
-        
-        # initialize new_assignments with current assignments
-        new_assignments = {}
-        companionships_by_id = {}
-        for companionship in to_district.companionships:
-            new_assignments[companionship.id] = companionship.assignments.copy()
-            companionships_by_id[companionship.id] = companionship
-
-        # populate new_assignments in levels, assigning each eligible to 
-        # an existing companionship at random, if that companionship does not
-        # already have a number of assignments equal to the current level
-        level = 1
-        while len(eligible_assignments)>0:
-            for key,val in new_assignments.items():
-                if len(eligible_assignments)<=0:
-                    continue
-                if len(val) < level:
-                    # pick an eligible assignee at random
-                    assignment = eligible_assignments.pop(
-                            random.randrange(len(eligible_assignments)))
-                    # make sure member is not assigned to minister self, else
-                    # put them back on the list for the next companionship
-                    mids = [x.id for x in companionships_by_id[key].ministers]
-                    if assignment.id not in mids:
-                        new_assignments[key].append(assignment)
-                    else:
-                        eligible_assignments.append(assignment)
-            level = level+1
-
-        # iterate over new assignemnts and add to database 
-        for key,val in new_assignments.items():
-            companionship = companionships_by_id[key]
-            if len(companionship.assignments) != len(val):
-                print('Updating %s with %s' % (companionship,val))
-                if not preview:
-                    self.update_companionship(to_district, companionship,
-                            companionship.ministers, val)
+# ministering datasets and the organization type of the page holding each
+DATASET_TYPES = {
+    'elders': 'EQ',
+    'currentElders': 'EQ',
+    'reliefSociety': 'RS',
+    'currentReliefSociety': 'RS'}
 
-        
-    def save_data(self, filename='ministering_data.json'):
-        """Save downloaded ministering data to file
 
-        NOTE: this feature is for debug purposes only. It is not intended to
-        be used for long-term storage of membership records, exporting data to
-        third-party applications, or for any purpose other than to perform the
-        official duties of Elders Quorum or Relief Society Presidencies.
-        See https://www.lds.org/legal/privacy-notice?lang=eng&country=go.
+def _assignments_url(lcr_url, dataset, unit=None):
+    """ Return the proposed-assignments page URL for a dataset and unit;
+    raise ValueError if the dataset is unknown """
+    if dataset not in DATASET_TYPES:
+        raise ValueError("Unknown dataset %r; expected one of %s" % (
+                dataset, ', '.join(sorted(DATASET_TYPES))))
+    url = lcr_url + '/ministering-proposed-assignments?lang=eng&type=' + DATASET_TYPES[dataset]
+    if unit is not None:
+        url += '&unitNumber=%s' % unit
+    return url
 
-        Keyword arguments:
-        filename -- name of file to save (default: 'ministering_data.json')
-        """
-        if self._data is None or self._stale:
-            self.download_assignments()
-        with open(filename, 'w') as fp:
-            json.dump(self._data, fp)
 
-    def load_data(self, filename='ministering_data.json', dataset='elders'):
-        """Load ministering data from a file
+def _load_records(data, dataset='elders', lazy=False):
+    """ Return (assignments, eligibles) parsed from ministeringData, sharing
+    one PersonRegistry so each member is a single Person record """
+    registry = PersonRegistry()
+    eligibles = MinisteringEligible(data, registry=registry)
+    return MinisteringAssignments(data, dataset, lazy, registry), eligibles
 
-        NOTE: this feature is for debug purposes only. It is not intended to
-        be used for long-term storage of membership records, exporting data to
-        third-party applications, or for any purpose other than to perform the
-        official duties of Elders Quorum or Relief Society Presidencies.
-        See https://www.lds.org/legal/privacy-notice?lang=eng&country=go.
 
-        Keyword arguments:
-        filename -- name of file to load (default: 'ministering_data.json')
-        """
+def _parse_page(page, dataset, pickled=False):
+    """ Parse a downloaded proposed-assignments page; return (assignments,
+    eligibles), or None if the page holds no ministering data for dataset
+
+    In a worker process, set pickled to return the records as a pickle,
+    which the caller can load with _unpickle several times faster than it
+    could parse the page itself.
+    """
+    data = extract_ministering_data([page])
+    if data is None or dataset not in data:
+        return None
+    records = _load_records(data, dataset)
+    if pickled:
+        return pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+    return records
+
+
+class MinisteringCollection:
+    """ MinisteringAssignments and MinisteringEligible records for several
+    units and datasets, keyed by (unit, dataset)
+
+    Indexing returns the MinisteringAssignments for a key, and the get_*
+    methods search every unit at once, returning (key, record) pairs.
+
+    Example:
+    >>> units = ms.download_units([123456, 234567], ['elders', 'reliefSociety'])
+    >>> units[123456, 'elders'].districts
+    >>> units.get_ministers(name='Smith')
+    """
+    __slots__ = ['_assignments', '_eligibles']
+    def __init__(self):
+        self._assignments = {}
+        self._eligibles = {}
+
+    def __repr__(self):
+        return 'MinisteringCollection(%s)' % ', '.join(
+                '%s/%s' % key for key in self._assignments)
+
+    def add(self, unit, dataset, assignments, eligibles=None):
+        """ Add or replace the records for a unit and dataset """
+        self._assignments[unit, dataset] = assignments
+        self._eligibles[unit, dataset] = eligibles
+
+    def __getitem__(self, key):
+        return self._assignments[key]
+
+    def __contains__(self, key):
+        return key in self._assignments
+
+    def __iter__(self):
+        return iter(self._assignments)
+
+    def __len__(self):
+        return len(self._assignments)
+
+    def keys(self):
+        return self._assignments.keys()
+
+    def items(self):
+        return self._assignments.items()
+
+    @property
+    def units(self):
+        return list(dict.fromkeys(unit for unit, _ in self._assignments))
+
+    @property
+    def datasets(self):
+        return list(dict.fromkeys(dataset for _, dataset in self._assignments))
+
+    def get_eligibles(self, unit, dataset):
+        """ Return the MinisteringEligible for a unit and dataset """
+        return self._eligibles[unit, dataset]
+
+    def _search(self, method, **kwargs):
+        return [(key, record) for key, assignments in self._assignments.items()
+                for record in getattr(assignments, method)(**kwargs)]
+
+    def get_districts(self, id=None, name=None):
+        """ Return list of (key, district) across all units, optionally
+        matched by id or name as in MinisteringAssignments """
+        return self._search('get_districts', id=id, name=name)
+
+    def get_companionships(self, id=None, name=None):
+        """ Return list of (key, companionship) across all units, optionally
+        matched by id or name as in MinisteringAssignments """
+        return self._search('get_companionships', id=id, name=name)
+
+    def get_ministers(self, id=None, name=None, legacy_id=None):
+        """ Return list of (key, minister) across all units, optionally
+        matched by id, legacy_id or name as in MinisteringAssignments """
+        return self._search('get_ministers', id=id, name=name, legacy_id=legacy_id)
+
+    def get_assignments(self, id=None, name=None, legacy_id=None):
+        """ Return list of (key, household) across all units, optionally
+        matched by id, legacy_id or name as in MinisteringAssignments """
+        return self._search('get_assignments', id=id, name=name, legacy_id=legacy_id)
+
+    def find(self, id):
+        """ Return the keys of every unit and dataset in which the person with
+        the given uuid ministers or is assigned """
+        return [key for key, assignments in self._assignments.items()
+                if assignments.has_minister(id) or assignments.has_assignment(id)]
+
+    def unassigned_households(self):
+        """ Return a dict mapping each key to its eligible households that
+        have no companionship """
+        return dict((key, [x for x in self._eligibles[key].assignments
+                if not assignments.has_assignment(x.id)])
+                for key, assignments in self._assignments.items()
+                if self._eligibles[key] is not None)
+
+
+class BulkResult:
+    """ Summary of a bulk operation: the items that were written successfully
+    and the (item, exception) pairs for those that failed """
+    __slots__ = {'_succeeded', '_failed'}
+    def __init__(self):
+        self._succeeded = []
+        self._failed = []
+    def __repr__(self):
+        return '%s(succeeded=%d, failed=%d)' % (self.__class__.__name__,
+                len(self._succeeded), len(self._failed))
+    @property
+    def succeeded(self): return self._succeeded
+    @property
+    def failed(self): return self._failed
+    @property
+    def ok(self): return len(self._failed) == 0
+
+
+class ValidationError(ValueError):
+    """ Raised when changes fail local validation, before any request is
+    sent; problems is the list of (item, message) pairs found, with items
+    reported as in BulkResult.failed """
+    def __init__(self, problems):
+        messages = [x[1] for x in problems]
+        if len(messages) > 5:
+            messages = messages[:5] + ['and %d more' % (len(messages) - 5)]
+        ValueError.__init__(self, '; '.join(messages))
+        self.problems = problems
+
+
+class ChangePlan:
+    """ The set of companionship creates, updates and deletes needed to turn
+    the current MinisteringAssignments into a desired state
+
+    Changes are keyed by companionship uuid, so a later change to the same
+    companionship replaces an earlier one, an update followed by a delete
+    becomes just the delete, and updates that would leave a companionship as
+    it is are dropped. Apply a plan with MinisteringSession.apply_plan.
+    """
+    __slots__ = {'_current', '_creates', '_updates', '_deletes'}
+    def __init__(self, current):
+        """ Start an empty plan against current, a MinisteringAssignments """
+        self._current = current
+        self._creates = []
+        self._updates = {}
+        self._deletes = {}
+    def __repr__(self):
+        return '%s(creates=%d, updates=%d, deletes=%d)' % (
+                self.__class__.__name__, len(self._creates),
+                len(self._updates), len(self._deletes))
+    def __len__(self):
+        return len(self._creates) + len(self._updates) + len(self._deletes)
+    @property
+    def creates(self):
+        """ List of (district, ministers, assignments) tuples """
+        return self._creates
+    @property
+    def updates(self):
+        """ List of (district, companionship, ministers, assignments) tuples """
+        return [(d, self._current.get_companionships(id=k)[0], m, a)
+                for k, (d, m, a) in self._updates.items()]
+    @property
+    def deletes(self):
+        """ List of Companionship records """
+        return list(self._deletes.values())
+
+    def create(self, district, ministers, assignments=[]):
+        """ Plan a new companionship
+
+        Keyword parameters:
+        district -- District record of the district to hold the companionship
+        ministers -- list of ministers, each given by a Person record
+        assignments -- optional list of households, each given by a Person record
+        """
+        self._creates.append((district, list(ministers), list(assignments)))
+        return self
+
+    def update(self, companionship, ministers=None, assignments=None,
+            district=None):
+        """ Plan a change to an existing companionship; any argument left as
+        None keeps the companionship's current value (or planned value, if
+        it already has a planned update); raise ValueError if the
+        companionship is not in the current assignments
+
+        Keyword parameters:
+        companionship -- Companionship record to change
+        ministers -- new list of ministers, each given by a Person record
+        assignments -- new list of households, each given by a Person record
+        district -- District record to move the companionship to
+        """
+        current_district = self._current.get_district_of(companionship.id)
+        if current_district is None:
+            raise ValueError("Companionship not found")
+        self._deletes.pop(companionship.id, None)
+        planned = self._updates.get(companionship.id, (current_district,
+                companionship.ministers, companionship.assignments))
+        desired = (
+            planned[0] if district is None else district,
+            list(planned[1] if ministers is None else ministers),
+            list(planned[2] if assignments is None else assignments))
+        if _same_companionship(desired, current_district, companionship):
+            self._updates.pop(companionship.id, None)
+        else:
+            self._updates[companionship.id] = desired
+        return self
+
+    def delete(self, companionship):
+        """ Plan the deletion of a companionship, replacing any planned update
+
+        Keyword parameters:
+        companionship -- Companionship record to delete
+        """
+        self._updates.pop(companionship.id, None)
+        self._deletes[companionship.id] = companionship
+        return self
+
+    @classmethod
+    def from_assignments(cls, current, new_assignments):
+        """ Return a plan giving each companionship the households in
+        new_assignments, a dict of household lists keyed by companionship
+        uuid, as returned by balance_assignments or optimize_assignments
+
+        Keyword parameters:
+        current -- MinisteringAssignments holding the companionships
+        new_assignments -- dict mapping companionship uuid to households
+        """
+        plan = cls(current)
+        for id, assignments in new_assignments.items():
+            plan.update(current.get_companionships(id=id)[0],
+                    assignments=assignments)
+        return plan
+
+    def phases(self):
+        """ Return the planned changes as a list of phases, each a list of
+        (action, arguments) steps that may be sent concurrently: deletes
+        first, then updates that take households or ministers away from a
+        companionship, then the remaining updates, then creates """
+        losing = []
+        gaining = []
+        for district, companionship, ministers, assignments in self.updates:
+            old_ids = set([x.id for x in companionship.ministers + companionship.assignments])
+            new_ids = set([x.id for x in ministers + assignments])
+            step = ('update', (district, companionship, ministers, assignments))
+            if old_ids - new_ids:
+                losing.append(step)
+            else:
+                gaining.append(step)
+        phases = [[('delete', (x,)) for x in self.deletes], losing, gaining,
+                [('create', x) for x in self._creates]]
+        return [x for x in phases if x]
+
+    def validate(self, eligibles=None):
+        """ Return a list of (item, message) pairs for every problem the plan
+        would cause, checked in one pass against the current assignments and
+        against each other, without sending anything: companionships without
+        ministers, members listed twice or not eligible, ministers assigned
+        to their own household, households that would also be in another
+        companionship, and ministers that would also be in another
+        companionship of the same district. Items are reported as in
+        BulkResult.failed: Companionship records for updates and
+        (district, ministers, assignments) tuples for creates.
+
+        Keyword parameters:
+        eligibles -- MinisteringEligible to check eligibility against
+                (default: None, not checked)
+        """
+        current = self._current
+        changed = set(self._updates) | set(self._deletes)
+        desired = [(c, (d, m, a)) for d, c, m, a in self.updates] + \
+                [(x, x) for x in self._creates]
+        eligible_ministers = eligibles is not None and len(eligibles.ministers) > 0
+        eligible_households = eligibles is not None and len(eligibles.assignments) > 0
+        claimed = {'minister': {}, 'household': {}}
+
+        def elsewhere(kind, person, name, district):
+            # companionships left untouched by the plan, then earlier changes;
+            # ministers may also serve in other districts, as when copying
+            # companionships into a district of routes
+            if kind == 'minister':
+                found = current.get_companionships(minister=person.id)
+            else:
+                found = current.get_companionships(assignment=person.id)
+            found = [(x, current.get_district_of(x.id).id) for x in found
+                    if x.id not in changed]
+            found += claimed[kind].get(person.id, [])
+            claimed[kind].setdefault(person.id, []).append((name, district.id))
+            return [x for x, d in found if kind == 'household' or d == district.id]
+
+        problems = []
+        for item, (district, ministers, assignments) in desired:
+            name = item if isinstance(item, Companionship) else \
+                    'new companionship in %s' % district
+            if not current.get_districts(id=district.id):
+                problems.append((item, '%s not found' % district))
+            if not ministers:
+                problems.append((item, '%s has no ministers' % name))
+            minister_ids = set()
+            for person in ministers:
+                if person.id in minister_ids:
+                    problems.append((item, '%s is listed twice in %s' % (person, name)))
+                    continue
+                minister_ids.add(person.id)
+                if eligible_ministers and not eligibles.get_ministers(id=person.id):
+                    problems.append((item, '%s is not an eligible minister' % person))
+                for other in elsewhere('minister', person, name, district):
+                    problems.append((item, '%s already ministers in %s' % (person, other)))
+            household_ids = set()
+            for person in assignments:
+                if person.id in household_ids:
+                    problems.append((item, '%s is listed twice in %s' % (person, name)))
+                    continue
+                household_ids.add(person.id)
+                if person.id in minister_ids:
+                    problems.append((item, '%s would minister to their own household' % person))
+                if eligible_households and not eligibles.get_assignments(id=person.id):
+                    problems.append((item, '%s is not an eligible household' % person))
+                for other in elsewhere('household', person, name, district):
+                    problems.append((item, '%s is already assigned to %s' % (person, other)))
+        return problems
+
+    def describe(self):
+        """ Return a list of lines describing the planned changes """
+        lines = []
+        for action, args in [x for phase in self.phases() for x in phase]:
+            if action == 'delete':
+                lines.append('Deleting %s from %s' % (args[0],
+                        self._current.get_district_of(args[0].id)))
+            elif action == 'update':
+                lines.append('Updating %s in %s with %s and %s' % (args[1],
+                        args[0], args[2], args[3]))
+            else:
+                lines.append('Creating companionship in %s with %s and %s' % args)
+        return lines
+
+    def to_dict(self):
+        """ Return a JSON-serializable representation of the plan, for review
+        or to be restored later with from_dict """
+        def people(records):
+            return [_person_dict(x) for x in records]
+        return {
+            'creates': [{'district': d.id, 'ministers': people(m),
+                    'assignments': people(a)} for d, m, a in self._creates],
+            'updates': [{'id': c.id, 'name': c.name, 'district': d.id,
+                    'ministers': people(m), 'assignments': people(a)}
+                    for d, c, m, a in self.updates],
+            'deletes': [{'id': c.id, 'name': c.name} for c in self.deletes]}
+
+    @classmethod
+    def from_dict(cls, current, data):
+        """ Return the plan represented by data, as returned by to_dict,
+        against current, a MinisteringAssignments; raise ValueError if it
+        refers to districts or companionships that no longer exist """
+        def district(id):
+            found = current.get_districts(id=id)
+            if not found:
+                raise ValueError("District not found")
+            return found[0]
+        def companionship(id):
+            found = current.get_companionships(id=id)
+            if not found:
+                raise ValueError("Companionship not found")
+            return found[0]
+        def people(records):
+            return [_person_from_dict(x) for x in records]
+        plan = cls(current)
+        for x in data.get('deletes', []):
+            plan.delete(companionship(x['id']))
+        for x in data.get('updates', []):
+            plan.update(companionship(x['id']), people(x['ministers']),
+                    people(x['assignments']), district(x['district']))
+        for x in data.get('creates', []):
+            plan.create(district(x['district']), people(x['ministers']),
+                    people(x['assignments']))
+        return plan
+
+
+def _same_companionship(desired, district, companionship):
+    """ Return True if the desired (district, ministers, assignments) state
+    matches the companionship as it is now """
+    return desired[0].id == district.id and \
+        set([x.id for x in desired[1]]) == set([x.id for x in companionship.ministers]) and \
+        set([x.id for x in desired[2]]) == set([x.id for x in companionship.assignments])
+
+
+class BulkJournal:
+    """ Append-only record of a bulk operation, for resuming it after a
+    failure with MinisteringSession.resume_plan
+
+    The journal is a file of JSON lines: first the plan, as a numbered list
+    of steps in the order they are sent, then a 'start' entry before each
+    step is sent and a 'done' (with the companionship uuid) or 'failed'
+    entry after. Each entry is flushed to disk before the request goes out,
+    so a step that was started but never finished is known to be uncertain.
+    Create steps also list the companionships that already had the same
+    ministers in their district when the plan was written.
+    """
+    __slots__ = ['_filename', '_lock', '_steps', '_started', '_done', '_failed']
+    VERSION = 1
+
+    def __init__(self, filename):
+        """ Read an existing journal; raise ValueError if filename is not a
+        bulk journal
+
+        Keyword parameters:
+        filename -- name of the journal file
+        """
+        self._filename = filename
+        self._lock = threading.Lock()
+        self._steps = None
+        self._started = set()
+        self._done = {}
+        self._failed = {}
+        with open(filename, 'rb') as fp:
+            content = fp.read()
+        lines = content.split(b'\n')
+        if lines[-1]:
+            # a write torn by a crash; drop it so new entries start cleanly
+            with open(filename, 'r+b') as fp:
+                fp.truncate(len(content) - len(lines[-1]))
+        for line in lines[:-1]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                raise ValueError("Bulk journal is corrupt")
+            event = entry.get('event')
+            if event == 'plan':
+                if entry.get('version') != self.VERSION:
+                    raise ValueError("Unsupported bulk journal version")
+                self._steps = entry['steps']
+            elif event == 'start':
+                self._started.add(entry['step'])
+            elif event == 'done':
+                self._done[entry['step']] = entry.get('uuid')
+                self._failed.pop(entry['step'], None)
+            elif event == 'failed':
+                self._failed[entry['step']] = entry.get('error')
+        if self._steps is None:
+            raise ValueError("Not a bulk journal")
+
+    def __repr__(self):
+        return '%s("%s", steps=%d, done=%d)' % (self.__class__.__name__,
+                self._filename, len(self._steps), len(self._done))
+
+    @classmethod
+    def create(cls, filename, plan):
+        """ Write a new journal for a ChangePlan and return it; raise
+        FileExistsError rather than overwrite an existing journal """
+        def people(records):
+            return [_person_dict(x) for x in records]
+        steps = []
+        for phase, actions in enumerate(plan.phases()):
+            for action, args in actions:
+                step = {'step': len(steps), 'phase': phase, 'action': action}
+                if action == 'delete':
+                    step.update(id=args[0].id, name=args[0].name)
+                elif action == 'update':
+                    step.update(id=args[1].id, name=args[1].name,
+                            district=args[0].id, ministers=people(args[2]),
+                            assignments=people(args[3]))
+                else:
+                    step.update(district=args[0].id, ministers=people(args[1]),
+                            assignments=people(args[2]),
+                            existing=[c.id for c in args[0].companionships
+                                if _ids(c.ministers) == _ids(args[1])])
+                steps.append(step)
+        with open(filename, 'x') as fp:
+            fp.write(json.dumps({'event': 'plan', 'version': cls.VERSION,
+                    'created': time.time(), 'steps': steps}) + '\n')
+        return cls(filename)
+
+    @property
+    def filename(self): return self._filename
+    @property
+    def steps(self): return self._steps
+    @property
+    def remaining(self):
+        """ Steps not yet done, including failed and uncertain ones """
+        return [x for x in self._steps if x['step'] not in self._done]
+    @property
+    def complete(self): return len(self._done) == len(self._steps)
+
+    def uuid(self, step):
+        """ Return the uuid of the companionship step was done with, or of
+        the one it changes; None for a create that is not done """
+        return self._done.get(step) or self._steps[step].get('id')
+
+    def sent(self, step):
+        """ Return True if step was started, so it may have reached the
+        server """
+        return step in self._started
+
+    def uncertain(self, step):
+        """ Return True if step was started but neither finished nor failed,
+        so it may or may not have reached the server """
+        return step in self._started and step not in self._done and \
+                step not in self._failed
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self._filename, 'a') as fp:
+                fp.write(json.dumps(entry) + '\n')
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    def mark_started(self, step):
+        self._append({'event': 'start', 'step': step})
+        self._started.add(step)
+
+    def mark_done(self, step, uuid=None):
+        self._append({'event': 'done', 'step': step, 'uuid': uuid})
+        self._done[step] = uuid
+        self._failed.pop(step, None)
+
+    def mark_failed(self, step, error):
+        self._append({'event': 'failed', 'step': step, 'error': repr(error)})
+        self._failed[step] = repr(error)
+
+    def track(self, step, fn):
+        """ Return a function calling fn, recording step as started before
+        and as done or failed after; fn may return the companionship uuid """
+        def run():
+            self.mark_started(step)
+            try:
+                uuid = fn()
+            except Exception as e:
+                self.mark_failed(step, e)
+                raise
+            self.mark_done(step, uuid or self._steps[step].get('id'))
+        return run
+
+
+# kinds of Change, with what their before and after values hold
+CHANGE_KINDS = (
+    'district_added',           # None, District
+    'district_removed',         # District, None
+    'supervisor_changed',       # old supervisor, new supervisor
+    'companionship_added',      # None, District
+    'companionship_removed',    # District, None
+    'companionship_moved',      # old District, new District
+    'ministers_changed',        # old ministers, new ministers
+    'household_assigned',       # None, companionships
+    'household_unassigned',     # companionships, None
+    'household_moved')          # old companionships, new companionships
+
+
+class Change:
+    """ One difference between two MinisteringAssignments: its kind (one of
+    CHANGE_KINDS), the District, Companionship or Person it concerns (as
+    in the new data, or the old data if removed), and its before and after
+    values """
+    __slots__ = {'_kind', '_record', '_before', '_after'}
+    def __init__(self, kind, record, before=None, after=None):
+        self._kind = kind
+        self._record = record
+        self._before = before
+        self._after = after
+    def __repr__(self):
+        return '%s(%s, %r)' % (self.__class__.__name__, self._kind, self._record)
+    @property
+    def kind(self): return self._kind
+    @property
+    def record(self): return self._record
+    @property
+    def before(self): return self._before
+    @property
+    def after(self): return self._after
+
+    def to_dict(self):
+        """ Return a JSON-serializable representation, giving records by id
+        and name """
+        def ref(value):
+            if value is None:
+                return None
+            if isinstance(value, list):
+                return [ref(x) for x in value]
+            return {'id': value.id, 'name': value.name}
+        return {'kind': self._kind, 'record': ref(self._record),
+                'before': ref(self._before), 'after': ref(self._after)}
+
+
+def _ids(records):
+    return set([x.id for x in records])
+
+
+def diff_assignments(old, new):
+    """ Generate the Change records that turn old into new, two
+    MinisteringAssignments, in time linear in their size: districts first,
+    then companionships, then households
+
+    Keyword parameters:
+    old -- MinisteringAssignments before
+    new -- MinisteringAssignments after
+    """
+    old_districts = dict([(x.id, x) for x in old.districts])
+    new_districts = dict([(x.id, x) for x in new.districts])
+    for id, district in new_districts.items():
+        before = old_districts.get(id)
+        if before is None:
+            yield Change('district_added', district, None, district)
+        elif before.supervisor.id != district.supervisor.id:
+            yield Change('supervisor_changed', district, before.supervisor,
+                    district.supervisor)
+    for id, district in old_districts.items():
+        if id not in new_districts:
+            yield Change('district_removed', district, district, None)
+
+    old_companionships = dict([(x.id, x) for x in old.companionships])
+    for companionship in new.companionships:
+        district = new.get_district_of(companionship.id)
+        before = old_companionships.get(companionship.id)
+        if before is None:
+            yield Change('companionship_added', companionship, None, district)
+            continue
+        old_district = old.get_district_of(companionship.id)
+        if old_district.id != district.id:
+            yield Change('companionship_moved', companionship, old_district,
+                    district)
+        if _ids(before.ministers) != _ids(companionship.ministers):
+            yield Change('ministers_changed', companionship, before.ministers,
+                    companionship.ministers)
+    for companionship in old.companionships:
+        if not new.get_companionships(id=companionship.id):
+            yield Change('companionship_removed', companionship,
+                    old.get_district_of(companionship.id), None)
+
+    seen = set()
+    for household in new.assignments:
+        if household.id in seen:
+            continue
+        seen.add(household.id)
+        after = new.get_companionships(assignment=household.id)
+        before = old.get_companionships(assignment=household.id)
+        if not before:
+            yield Change('household_assigned', household, None, after)
+        elif _ids(before) != _ids(after):
+            yield Change('household_moved', household, before, after)
+    for household in old.assignments:
+        if household.id not in seen and not new.has_assignment(household.id):
+            seen.add(household.id)
+            yield Change('household_unassigned', household,
+                    old.get_companionships(assignment=household.id), None)
+
+
+def summarize_changes(changes):
+    """ Return a dict counting changes by kind, with every kind present """
+    counts = dict([(x, 0) for x in CHANGE_KINDS])
+    for change in changes:
+        counts[change.kind] += 1
+    return counts
+
+
+def _load_assignments(filename, dataset='elders'):
+    """ Return the MinisteringAssignments in a file written by save_data or
+    save_snapshot """
+    with open(filename, 'rb') as fp:
+        magic = fp.read(len(SNAPSHOT_MAGIC))
+    if magic == SNAPSHOT_MAGIC:
+        return load_snapshot(filename)[2]
+    with open(filename, 'r') as fp:
+        return MinisteringAssignments(json.load(fp), dataset)
+
+
+def diff_snapshots(old_filename, new_filename, dataset='elders'):
+    """ Generate the Change records between two files written by save_data or
+    save_snapshot; see diff_assignments
+
+    Keyword parameters:
+    old_filename -- name of the earlier file
+    new_filename -- name of the later file
+    dataset -- dataset to compare in JSON files (default: 'elders')
+    """
+    return diff_assignments(_load_assignments(old_filename, dataset),
+            _load_assignments(new_filename, dataset))
+
+
+LOAD_GROUPS = ('companionship', 'district', 'supervisor')
+
+
+def _bincount(codes, count, weights=None):
+    """ Return the number (or the sum of weights) of each code below count """
+    if numpy is not None:
+        if weights is None:
+            return numpy.bincount(codes, minlength=count)
+        return numpy.bincount(codes, weights=weights, minlength=count)
+    sums = [0] * count
+    if weights is None:
+        for code in codes:
+            sums[code] += 1
+    else:
+        for code, weight in zip(codes, weights):
+            sums[code] += weight
+    return sums
+
+
+def _group_stats(groups, values, count):
+    """ Return lists (size, total, minimum, maximum, std, gini), one entry
+    per group code below count, of the values with the given group codes """
+    if numpy is None:
+        members = [[] for _ in range(count)]
+        for group, value in zip(groups, values):
+            members[group].append(value)
+        stats = ([], [], [], [], [], [])
+        for x in members:
+            x.sort()
+            n, total = len(x), sum(x)
+            mean = total / n if n else 0
+            terms = sum([(2 * i - n + 1) * v for i, v in enumerate(x)])
+            for column, value in zip(stats, (n, total, x[0] if x else 0,
+                    x[-1] if x else 0,
+                    (sum([(v - mean) ** 2 for v in x]) / n) ** 0.5 if n else 0,
+                    terms / (n * total) if total else 0)):
+                column.append(value)
+        return stats
+
+    groups = numpy.asarray(groups, dtype=numpy.intp)
+    values = numpy.asarray(values)
+    integral = numpy.issubdtype(values.dtype, numpy.integer)
+    values = values.astype(float)
+    zeros = numpy.zeros(count)
+    size = numpy.bincount(groups, minlength=count)
+    total = numpy.bincount(groups, weights=values, minlength=count)
+    mean = numpy.divide(total, size, out=zeros.copy(), where=size > 0)
+    deviation = values - mean[groups]
+    std = numpy.sqrt(numpy.divide(numpy.bincount(groups,
+            weights=deviation * deviation, minlength=count), size,
+            out=zeros.copy(), where=size > 0))
+    # sort by group, then value: each group's minimum comes first, its
+    # maximum last, and the ranks within a group give its Gini coefficient
+    order = numpy.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    start = numpy.searchsorted(groups, numpy.arange(count))
+    full = size > 0
+    minimum, maximum = zeros.copy(), zeros.copy()
+    minimum[full] = values[start[full]]
+    maximum[full] = values[start[full] + size[full] - 1]
+    rank = numpy.arange(len(values)) - start[groups]
+    terms = numpy.bincount(groups, weights=(2 * rank - size[groups] + 1) * values,
+            minlength=count)
+    gini = numpy.divide(terms, size * total, out=zeros.copy(), where=total > 0)
+    if integral:
+        total, minimum, maximum = [x.astype(int) for x in (total, minimum, maximum)]
+    return (size.tolist(), total.tolist(), minimum.tolist(), maximum.tolist(),
+            std.tolist(), gini.tolist())
+
+
+class LoadSummary:
+    """ Load statistics of a group of companionships: one companionship, a
+    district, the districts of a supervisor, or all of them """
+    __slots__ = {'_record', '_companionships', '_households', '_total',
+            '_min', '_max', '_std', '_gini'}
+    def __init__(self, record, companionships, households, total, min, max,
+            std, gini):
+        self._record = record
+        self._companionships = companionships
+        self._households = households
+        self._total = total
+        self._min = min
+        self._max = max
+        self._std = std
+        self._gini = gini
+    def __repr__(self):
+        return '%s(%s, companionships=%d, households=%d)' % (
+                self.__class__.__name__, self._record, self._companionships,
+                self._households)
+    @property
+    def record(self): return self._record
+    @property
+    def companionships(self): return self._companionships
+    @property
+    def households(self): return self._households
+    @property
+    def total(self): return self._total
+    @property
+    def mean(self):
+        return self._total / self._companionships if self._companionships else 0
+    @property
+    def min(self): return self._min
+    @property
+    def max(self): return self._max
+    @property
+    def spread(self): return self._max - self._min
+    @property
+    def std(self): return self._std
+    @property
+    def cv(self):
+        """ Coefficient of variation: std relative to the mean load """
+        return self._std / self.mean if self.mean else 0
+    @property
+    def gini(self):
+        """ Gini coefficient of the loads: 0 when all are equal, nearing 1
+        when a few companionships carry all the households """
+        return self._gini
+
+    def to_dict(self):
+        """ Return a JSON-serializable representation of the summary """
+        return {
+            'id': getattr(self._record, 'id', None),
+            'name': getattr(self._record, 'name', None),
+            'companionships': self._companionships,
+            'households': self._households,
+            'total': self._total,
+            'mean': self.mean,
+            'min': self._min,
+            'max': self._max,
+            'std': self._std,
+            'cv': self.cv,
+            'gini': self._gini}
+
+
+class LoadTable:
+    """ Array-backed tables of the companionships and household assignments
+    of a list of districts, for load statistics at any scale
+
+    Districts, companionships, supervisors and households are coded as
+    integers by their position in the districts, companionships, supervisors
+    and households lists; the columns hold those codes. Columns are NumPy
+    arrays when numpy is installed and lists otherwise, and group-bys work on
+    whole columns at once.
+
+    Example:
+    >>> table = LoadTable(ms.assignments.districts)
+    >>> for x in table.summary('supervisor'):
+    >>>     print(x.record, x.mean, x.spread)
+    >>> table.uncovered(ms.eligibles)
+    """
+    __slots__ = {'_districts', '_companionships', '_supervisors', '_households',
+            '_companionship_district', '_district_supervisor',
+            '_assignment_companionship', '_assignment_household',
+            '_household_weight', '_companionship_households', '_companionship_load',
+            '_household_codes'}
+    def __init__(self, districts, weight=None):
+        """ Keyword parameters:
+        districts -- list of District records, e.g. assignments.districts
+        weight -- function returning the load of a household, e.g. household
+                size, called once per household (default: None, each
+                household counts as 1)
+        """
+        self._districts = list(districts)
+        self._companionships = []
+        self._supervisors = []
+        self._households = []
+        supervisor_codes = {}
+        household_codes = self._household_codes = {}
+        companionship_district = []
+        district_supervisor = []
+        assignment_companionship = []
+        assignment_household = []
+        for d, district in enumerate(self._districts):
+            supervisor = district.supervisor
+            code = supervisor_codes.get(supervisor.id)
+            if code is None:
+                code = supervisor_codes[supervisor.id] = len(self._supervisors)
+                self._supervisors.append(supervisor)
+            district_supervisor.append(code)
+            for companionship in district.companionships:
+                c = len(self._companionships)
+                self._companionships.append(companionship)
+                companionship_district.append(d)
+                for household in companionship.assignments:
+                    code = household_codes.get(household.id)
+                    if code is None:
+                        code = household_codes[household.id] = len(self._households)
+                        self._households.append(household)
+                    assignment_companionship.append(c)
+                    assignment_household.append(code)
+
+        if numpy is not None:
+            companionship_district = numpy.array(companionship_district, dtype=numpy.intp)
+            district_supervisor = numpy.array(district_supervisor, dtype=numpy.intp)
+            assignment_companionship = numpy.array(assignment_companionship, dtype=numpy.intp)
+            assignment_household = numpy.array(assignment_household, dtype=numpy.intp)
+        self._companionship_district = companionship_district
+        self._district_supervisor = district_supervisor
+        self._assignment_companionship = assignment_companionship
+        self._assignment_household = assignment_household
+        self._companionship_households = _bincount(assignment_companionship,
+                len(self._companionships))
+        if weight is None:
+            self._household_weight = None
+            self._companionship_load = self._companionship_households
+        else:
+            self._household_weight = [weight(x) for x in self._households]
+            if numpy is not None:
+                self._household_weight = numpy.array(self._household_weight, dtype=float)
+                weights = self._household_weight[assignment_household]
+            else:
+                weights = [self._household_weight[x] for x in assignment_household]
+            self._companionship_load = _bincount(assignment_companionship,
+                    len(self._companionships), weights)
+
+    def __repr__(self):
+        return '%s(districts=%d, companionships=%d, households=%d)' % (
+                self.__class__.__name__, len(self._districts),
+                len(self._companionships), len(self._households))
+
+    @property
+    def districts(self): return self._districts
+    @property
+    def companionships(self): return self._companionships
+    @property
+    def supervisors(self): return self._supervisors
+    @property
+    def households(self): return self._households
+    @property
+    def companionship_district(self):
+        """ District code of each companionship """
+        return self._companionship_district
+    @property
+    def companionship_supervisor(self):
+        """ Supervisor code of each companionship """
+        if numpy is not None:
+            return self._district_supervisor[self._companionship_district]
+        return [self._district_supervisor[x] for x in self._companionship_district]
+    @property
+    def companionship_load(self):
+        """ Load of each companionship: its number of households, or the
+        sum of their weights """
+        return self._companionship_load
+    @property
+    def assignment_companionship(self):
+        """ Companionship code of each household assignment """
+        return self._assignment_companionship
+    @property
+    def assignment_household(self):
+        """ Household code of each household assignment """
+        return self._assignment_household
+
+    def _groups(self, by):
+        """ Return (group code of each companionship, group records) """
+        if by == 'companionship':
+            return range(len(self._companionships)), self._companionships
+        if by == 'district':
+            return self._companionship_district, self._districts
+        if by == 'supervisor':
+            return self.companionship_supervisor, self._supervisors
+        raise ValueError("Unknown grouping %r; expected one of %s" % (by,
+                ', '.join(LOAD_GROUPS)))
+
+    def loads(self, by='companionship'):
+        """ Return a dict mapping the uuid of each companionship, district or
+        supervisor to its total load
+
+        Keyword parameters:
+        by -- 'companionship', 'district' or 'supervisor'
+                (default: 'companionship')
+        """
+        groups, records = self._groups(by)
+        totals = self._companionship_load if by == 'companionship' else \
+                _bincount(groups, len(records), self._companionship_load)
+        if numpy is not None:
+            if self._household_weight is None:
+                totals = totals.astype(int)
+            totals = totals.tolist()
+        return dict(zip([x.id for x in records], totals))
+
+    def summary(self, by='district'):
+        """ Return a LoadSummary of the companionships of each district,
+        supervisor or companionship, in code order
+
+        Keyword parameters:
+        by -- 'companionship', 'district' or 'supervisor' (default: 'district')
+        """
+        groups, records = self._groups(by)
+        households = _bincount(groups, len(records), self._companionship_households)
+        if numpy is not None:
+            households = households.astype(int).tolist()
+        stats = _group_stats(groups, self._companionship_load, len(records))
+        return [LoadSummary(record, *x) for record, x in zip(records,
+                zip(stats[0], households, *stats[1:]))]
+
+    def overall(self):
+        """ Return a LoadSummary of all the companionships """
+        loads = self._companionship_load
+        stats = _group_stats([0] * len(loads), loads, 1)
+        return LoadSummary(None, stats[0][0], len(self._assignment_household),
+                *[x[0] for x in stats[1:]])
+
+    def distribution(self):
+        """ Return a dict mapping each load to the number of companionships
+        carrying it, lightest first """
+        if numpy is not None:
+            loads, counts = numpy.unique(self._companionship_load, return_counts=True)
+            return dict(zip(loads.tolist(), counts.tolist()))
+        return dict(sorted(Counter(self._companionship_load).items()))
+
+    def uncovered(self, eligibles):
+        """ Return list of the eligible households that no companionship in
+        the table ministers to
+
+        Keyword parameters:
+        eligibles -- MinisteringEligible, or a list of Person records
+        """
+        households = getattr(eligibles, 'assignments', eligibles)
+        return [x for x in households if x.id not in self._household_codes]
+
+
+_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY, taken_at REAL NOT NULL, label TEXT,
+    dataset TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS persons (
+    uuid TEXT PRIMARY KEY, legacy_id INTEGER, name TEXT, email TEXT);
+CREATE TABLE IF NOT EXISTS districts (
+    snapshot_id INTEGER NOT NULL, uuid TEXT NOT NULL, name TEXT,
+    supervisor_uuid TEXT, PRIMARY KEY (snapshot_id, uuid));
+CREATE TABLE IF NOT EXISTS companionships (
+    snapshot_id INTEGER NOT NULL, uuid TEXT NOT NULL,
+    district_uuid TEXT NOT NULL, position INTEGER,
+    PRIMARY KEY (snapshot_id, uuid));
+CREATE TABLE IF NOT EXISTS ministers (
+    snapshot_id INTEGER NOT NULL, companionship_uuid TEXT NOT NULL,
+    person_uuid TEXT NOT NULL, position INTEGER);
+CREATE TABLE IF NOT EXISTS assignments (
+    snapshot_id INTEGER NOT NULL, companionship_uuid TEXT NOT NULL,
+    person_uuid TEXT NOT NULL, position INTEGER);
+CREATE TABLE IF NOT EXISTS eligibles (
+    snapshot_id INTEGER NOT NULL, person_uuid TEXT NOT NULL,
+    role TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS companionships_district
+    ON companionships (snapshot_id, district_uuid);
+CREATE INDEX IF NOT EXISTS ministers_companionship
+    ON ministers (snapshot_id, companionship_uuid);
+CREATE INDEX IF NOT EXISTS ministers_person ON ministers (person_uuid, snapshot_id);
+CREATE INDEX IF NOT EXISTS assignments_companionship
+    ON assignments (snapshot_id, companionship_uuid);
+CREATE INDEX IF NOT EXISTS assignments_person ON assignments (person_uuid, snapshot_id);
+CREATE INDEX IF NOT EXISTS eligibles_snapshot ON eligibles (snapshot_id, role);
+"""
+
+
+class MinisteringStore:
+    """ Local SQLite store of many ministering snapshots, for questions
+    across time without parsing every saved file again
+
+    Each ingested snapshot is kept in normalized, indexed tables (districts,
+    companionships, ministers, assignments and eligibles, keyed by snapshot
+    id) with one persons table shared by all. Query helpers return the same
+    District, Companionship and Person records as MinisteringAssignments.
+
+    NOTE: the store holds membership records; the same restrictions apply
+    as for save_data.
+
+    Example:
+    >>> store = MinisteringStore('ministering.db')
+    >>> store.ingest_file('ministering_data.json')
+    >>> store.unassigned_for(3)
+    """
+    def __init__(self, filename='ministering.db'):
+        """ Open or create a store; raise ImportError if Python was built
+        without sqlite3
+
+        Keyword parameters:
+        filename -- database file, or ':memory:' (default: 'ministering.db')
+        """
+        if sqlite3 is None:
+            raise ImportError("MinisteringStore requires the sqlite3 module")
+        self._db = sqlite3.connect(filename)
+        self._db.executescript(_STORE_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ingest(self, data, taken_at=None, label=None, dataset='elders'):
+        """ Add a snapshot of ministeringData, as downloaded or saved by
+        save_data, in one transaction; return its snapshot id
+
+        Keyword parameters:
+        data -- ministeringData dict
+        taken_at -- time of the snapshot in seconds since the epoch
+                (default: now)
+        label -- optional description of the snapshot
+        dataset -- subset of data holding the districts (default: 'elders')
+        """
+        persons = {}
+        def person(record):
+            persons[record['personUuid']] = (record['personUuid'],
+                    record['legacyCmisId'], record['name'], record.get('email'))
+            return record['personUuid']
+
+        with self._db:
+            snapshot = self._db.execute(
+                    'INSERT INTO snapshots (taken_at, label, dataset) VALUES (?, ?, ?)',
+                    (time.time() if taken_at is None else taken_at, label,
+                    dataset)).lastrowid
+            districts, companionships, ministers, assignments = [], [], [], []
+            for district in data[dataset]:
+                supervisor = district['supervisorPersonUuid']
+                persons.setdefault(supervisor, (supervisor,
+                        district['supervisorLegacyCmisId'],
+                        district['supervisorName'], None))
+                districts.append((snapshot, district['districtUuid'],
+                        district['districtName'], supervisor))
+                for i, c in enumerate(district.get('companionships', [])):
+                    companionships.append((snapshot, c['id'],
+                            district['districtUuid'], i))
+                    ministers.extend([(snapshot, c['id'], person(x), j)
+                            for j, x in enumerate(c['ministers'])])
+                    assignments.extend([(snapshot, c['id'], person(x), j)
+                            for j, x in enumerate(c.get('assignments', []))])
+            eligible = data.get('eligibleMinistersAndAssignments', {})
+            eligibles = [(snapshot, person(x), 'minister')
+                    for x in eligible.get('eligibleMinisters', [])]
+            eligibles += [(snapshot, person(x), 'assignment')
+                    for x in eligible.get('eligibleAssignments', [])]
+
+            # supervisor records carry no email, so keep the one last seen
+            self._db.executemany('INSERT INTO persons VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (uuid) DO UPDATE SET legacy_id = excluded.legacy_id, '
+                    'name = excluded.name, '
+                    'email = COALESCE(excluded.email, persons.email)',
+                    persons.values())
+            self._db.executemany('INSERT INTO districts VALUES (?, ?, ?, ?)', districts)
+            self._db.executemany('INSERT INTO companionships VALUES (?, ?, ?, ?)',
+                    companionships)
+            self._db.executemany('INSERT INTO ministers VALUES (?, ?, ?, ?)', ministers)
+            self._db.executemany('INSERT INTO assignments VALUES (?, ?, ?, ?)',
+                    assignments)
+            self._db.executemany('INSERT INTO eligibles VALUES (?, ?, ?)', eligibles)
+        return snapshot
+
+    def ingest_file(self, filename='ministering_data.json', label=None,
+            dataset='elders'):
+        """ Add a snapshot from a file written by save_data, dated by the
+        file's modification time; return its snapshot id """
+        with open(filename, 'r') as fp:
+            data = json.load(fp)
+        return self.ingest(data, os.path.getmtime(filename),
+                label if label is not None else os.path.basename(filename),
+                dataset)
+
+    def snapshots(self, dataset='elders'):
+        """ Return list of (snapshot id, taken_at, label) of one dataset,
+        oldest first """
+        return self._db.execute('SELECT id, taken_at, label FROM snapshots '
+                'WHERE dataset = ? ORDER BY taken_at, id', (dataset,)).fetchall()
+
+    def _latest(self, snapshot, dataset):
+        if snapshot is not None:
+            return snapshot
+        row = self._db.execute('SELECT id FROM snapshots WHERE dataset = ? '
+                'ORDER BY taken_at DESC, id DESC LIMIT 1', (dataset,)).fetchone()
+        if row is None:
+            raise ValueError("The store holds no %s snapshots" % dataset)
+        return row[0]
+
+    def _people(self, query, args):
+        return [Person(id, legacy_id, name, email) for id, legacy_id, name, email
+                in self._db.execute(query, args)]
+
+    def get_person(self, id):
+        """ Return the Person with the given uuid, as last seen, or None """
+        people = self._people('SELECT uuid, legacy_id, name, email FROM persons '
+                'WHERE uuid = ?', (id,))
+        return people[0] if people else None
+
+    def get_districts(self, snapshot=None, id=None, dataset='elders'):
+        """ Return list of districts in a snapshot, with their supervisors,
+        companionships, ministers and households
+
+        Keyword parameters:
+        snapshot -- snapshot id (default: None, the latest of dataset)
+        id -- unique ID (uuid) of a single district (default: None, all)
+        dataset -- dataset whose latest snapshot is used if snapshot is None
+                (default: 'elders')
+        """
+        snapshot = self._latest(snapshot, dataset)
+        people = {}
+        def person(row):
+            if row[0] not in people:
+                people[row[0]] = Person(*row)
+            return people[row[0]]
+
+        members = {'ministers': {}, 'assignments': {}}
+        for table, found in members.items():
+            for row in self._db.execute('SELECT t.companionship_uuid, p.uuid, '
+                    'p.legacy_id, p.name, p.email FROM %s t JOIN persons p '
+                    'ON p.uuid = t.person_uuid WHERE t.snapshot_id = ? '
+                    'ORDER BY t.companionship_uuid, t.position' % table, (snapshot,)):
+                found.setdefault(row[0], []).append(person(row[1:]))
+
+        companionships = {}
+        for id_, district_uuid in self._db.execute('SELECT uuid, district_uuid '
+                'FROM companionships WHERE snapshot_id = ? ORDER BY position',
+                (snapshot,)):
+            ministers = members['ministers'].get(id_, [])
+            companionships.setdefault(district_uuid, []).append(Companionship(
+                id = id_,
+                name = " and ".join([x.name for x in ministers]),
+                ministers = ministers,
+                assignments = members['assignments'].get(id_, [])))
+
+        query = 'SELECT d.uuid, d.name, p.uuid, p.legacy_id, p.name FROM districts d ' \
+                'LEFT JOIN persons p ON p.uuid = d.supervisor_uuid WHERE d.snapshot_id = ?'
+        args = (snapshot,)
+        if id:
+            query += ' AND d.uuid = ?'
+            args += (id,)
+        return [District(
+                    id = row[0],
+                    name = row[1],
+                    supervisor = person((row[2], row[3], row[4], None)),
+                    companionships = companionships.get(row[0], []))
+                for row in self._db.execute(query + ' ORDER BY d.rowid', args)]
+
+    def load(self, snapshot=None, dataset='elders'):
+        """ Return the MinisteringAssignments of a snapshot (default: the
+        latest of dataset), e.g. for diff_assignments """
+        assignments = MinisteringAssignments()
+        assignments._district_list = self.get_districts(snapshot, dataset=dataset)
+        assignments._rebuild()
+        return assignments
+
+    def unassigned_households(self, snapshot=None, dataset='elders'):
+        """ Return list of eligible households without a companionship in a
+        snapshot (default: the latest of dataset) """
+        return self._people('SELECT p.uuid, p.legacy_id, p.name, p.email '
+                'FROM eligibles e JOIN persons p ON p.uuid = e.person_uuid '
+                'WHERE e.snapshot_id = ? AND e.role = \'assignment\' AND NOT EXISTS '
+                '(SELECT 1 FROM assignments a WHERE a.person_uuid = e.person_uuid '
+                'AND a.snapshot_id = e.snapshot_id)', (self._latest(snapshot, dataset),))
+
+    def unassigned_for(self, count, dataset='elders'):
+        """ Return list of households that were eligible but had no
+        companionship in each of the latest count snapshots of dataset
+        (default: 'elders') """
+        ids = [x[0] for x in self.snapshots(dataset)[-count:]]
+        if len(ids) < count:
+            return []
+        marks = ', '.join('?' * len(ids))
+        return self._people('SELECT p.uuid, p.legacy_id, p.name, p.email '
+                'FROM eligibles e JOIN persons p ON p.uuid = e.person_uuid '
+                'WHERE e.role = \'assignment\' AND e.snapshot_id IN (%s) AND NOT EXISTS '
+                '(SELECT 1 FROM assignments a WHERE a.person_uuid = e.person_uuid '
+                'AND a.snapshot_id = e.snapshot_id) GROUP BY p.uuid '
+                'HAVING COUNT(DISTINCT e.snapshot_id) = ? ORDER BY p.name' % marks,
+                ids + [len(ids)])
+
+    def assignment_history(self, id, dataset='elders'):
+        """ Return list of (snapshot id, Companionship or None) for a
+        household, oldest first, giving the companionship it was assigned
+        to in each snapshot of dataset (default: 'elders') """
+        history = []
+        for snapshot, companionship in self._db.execute('SELECT s.id, '
+                '(SELECT a.companionship_uuid FROM assignments a WHERE '
+                'a.snapshot_id = s.id AND a.person_uuid = ?) FROM snapshots s '
+                'WHERE s.dataset = ? ORDER BY s.taken_at, s.id', (id, dataset)):
+            if companionship is None:
+                history.append((snapshot, None))
+                continue
+            ministers = self._people('SELECT p.uuid, p.legacy_id, p.name, p.email '
+                    'FROM ministers m JOIN persons p ON p.uuid = m.person_uuid '
+                    'WHERE m.snapshot_id = ? AND m.companionship_uuid = ? '
+                    'ORDER BY m.position', (snapshot, companionship))
+            assignments = self._people('SELECT p.uuid, p.legacy_id, p.name, p.email '
+                    'FROM assignments a JOIN persons p ON p.uuid = a.person_uuid '
+                    'WHERE a.snapshot_id = ? AND a.companionship_uuid = ? '
+                    'ORDER BY a.position', (snapshot, companionship))
+            history.append((snapshot, Companionship(companionship,
+                    " and ".join([x.name for x in ministers]), ministers,
+                    assignments)))
+        return history
+
+    def district_loads(self, id=None, dataset='elders'):
+        """ Return list of (snapshot id, taken_at, district id, district name,
+        companionships, households) rows, oldest first, for every district or
+        the one with the given uuid, in the snapshots of dataset (default:
+        'elders') """
+        query = 'SELECT s.id, s.taken_at, d.uuid, d.name, COALESCE(c.n, 0), ' \
+                'COALESCE(a.n, 0) FROM snapshots s JOIN districts d ON d.snapshot_id = s.id ' \
+                'LEFT JOIN (SELECT snapshot_id, district_uuid, COUNT(*) AS n ' \
+                'FROM companionships GROUP BY snapshot_id, district_uuid) c ' \
+                'ON c.snapshot_id = s.id AND c.district_uuid = d.uuid ' \
+                'LEFT JOIN (SELECT c.snapshot_id, c.district_uuid, COUNT(*) AS n ' \
+                'FROM assignments a JOIN companionships c ON c.snapshot_id = ' \
+                'a.snapshot_id AND c.uuid = a.companionship_uuid ' \
+                'GROUP BY c.snapshot_id, c.district_uuid) a ' \
+                'ON a.snapshot_id = s.id AND a.district_uuid = d.uuid'
+        query += ' WHERE s.dataset = ?'
+        args = (dataset,)
+        if id:
+            query += ' AND d.uuid = ?'
+            args += (id,)
+        return self._db.execute(query + ' ORDER BY s.taken_at, s.id, d.rowid',
+                args).fetchall()
+
+
+class SessionMetrics:
+    """ Thread-safe counters and latency histograms for a MinisteringSession
+
+    Phases (e.g. 'login', 'download', 'transfer', 'extract', 'loads', 'put',
+    'delete') are timed into histograms; bytes transferred, HTTP status
+    codes and retries are counted. For the assignments page, 'download' (or
+    'refresh') is the time to the response headers, 'transfer' the time
+    spent waiting for the body, and 'extract' the time spent finding and
+    decoding the data in it. Hooks are called with (event, phase, value) for
+    every 'start' (value None), 'end' (value in seconds), 'bytes', 'status'
+    and 'retry' event, e.g. to feed an external metrics system.
+    """
+    # upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+            1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hooks = []
+        self.reset()
+
+    def reset(self):
+        """ Clear all recorded timings and counters """
+        with self._lock:
+            self._phases = {}
+            self._bytes = {}
+            self._status = {}
+            self._retries = {}
+
+    def add_hook(self, hook):
+        """ Register hook(event, phase, value) to be called for every event """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _emit(self, event, phase, value):
+        for hook in list(self._hooks):
+            hook(event, phase, value)
+
+    @contextlib.contextmanager
+    def time(self, phase):
+        """ Context manager timing one run of phase """
+        self._emit('start', phase, None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def record(self, phase, seconds):
+        """ Record one run of phase that took the given number of seconds """
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = {'count': 0, 'total': 0.0,
+                        'min': seconds, 'max': seconds,
+                        'buckets': [0] * len(self.BUCKETS)}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['min'] = min(stats['min'], seconds)
+            stats['max'] = max(stats['max'], seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+                    break
+        self._emit('end', phase, seconds)
+
+    def count_bytes(self, phase, count):
+        """ Add count bytes to the total transferred by phase """
+        with self._lock:
+            self._bytes[phase] = self._bytes.get(phase, 0) + count
+        self._emit('bytes', phase, count)
+
+    def count_status(self, phase, status_code):
+        """ Count one HTTP response with the given status for phase """
+        with self._lock:
+            self._status[status_code] = self._status.get(status_code, 0) + 1
+        self._emit('status', phase, status_code)
+
+    def count_retry(self, phase):
+        """ Count one retried request for phase """
+        with self._lock:
+            self._retries[phase] = self._retries.get(phase, 0) + 1
+        self._emit('retry', phase, 1)
+
+    def snapshot(self):
+        """ Return a dict copy of all timings and counters """
+        with self._lock:
+            phases = {}
+            for phase, stats in self._phases.items():
+                phases[phase] = dict(stats,
+                        mean=stats['total'] / stats['count'],
+                        buckets=dict(zip([str(x) for x in self.BUCKETS],
+                            stats['buckets'])))
+            return {
+                'phases': phases,
+                'bytes': dict(self._bytes),
+                'status': dict(self._status),
+                'retries': dict(self._retries)}
+
+
+class _Transfer:
+    """ Iterator over the chunks of a streamed response body, adding their
+    sizes to metrics under phase and the time spent waiting for them to
+    seconds """
+    def __init__(self, chunks, metrics, phase):
+        self._chunks = iter(chunks)
+        self._metrics = metrics
+        self._phase = phase
+        self.seconds = 0.0
+    def __iter__(self):
+        return self
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self._metrics.count_bytes(self._phase, len(chunk))
+        return chunk
+
+
+class Transport:
+    """ HTTP settings shared by the requests a MinisteringSession sends:
+    connection pooling, timeouts, compression and retries
+
+    Idempotent requests (GET, DELETE, and PUTs that update an existing
+    companionship) are retried on connection errors, timeouts and 429, 500,
+    502, 503 and 504 responses. Other requests, such as the PUT that creates
+    a companionship, are retried only on 429 and 503, which mean the server
+    did not act on them. Retries wait for the Retry-After header if given,
+    or otherwise back off exponentially with full jitter.
+    """
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    REJECTED_STATUS = (429, 503)
+    IDEMPOTENT_METHODS = ('get', 'head', 'options', 'delete')
+
+    def __init__(self, pool_size=10, connect_timeout=5.0, read_timeout=60.0,
+            retries=3, backoff=0.5, max_backoff=30.0):
+        """ Keyword arguments:
+        pool_size -- keep-alive connections per host; set this to at least
+                the number of concurrent workers (default: 10)
+        connect_timeout -- seconds to wait for a connection (default: 5)
+        read_timeout -- seconds to wait between bytes of a response
+                (default: 60)
+        retries -- maximum number of retries per request (default: 3)
+        backoff -- base delay in seconds between retries (default: 0.5)
+        max_backoff -- longest delay in seconds between retries (default: 30)
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def new_session(self):
+        """ Return a new requests session using these settings """
+        session = requests.session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept-Encoding'] = 'gzip, deflate'
+        return session
+
+    def delay(self, attempt, response=None):
+        """ Return the seconds to wait before retry number attempt (from 0) """
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    seconds = float(retry_after)
+                except ValueError:
+                    seconds = None
+                when = None
+                if seconds is None:
+                    try:
+                        when = email.utils.parsedate_to_datetime(retry_after)
+                    except (TypeError, ValueError):
+                        # unparseable date; fall back to jittered backoff
+                        pass
+                elif math.isfinite(seconds):
+                    return min(max(0.0, seconds), self.max_backoff)
+                # nan and inf also fall back to jittered backoff
+                if when is not None:
+                    if when.tzinfo is None:
+                        # a -0000 zone gives a naive datetime, meant as UTC
+                        when = when.replace(tzinfo=datetime.timezone.utc)
+                    return min(max(0.0, when.timestamp() - time.time()),
+                            self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, session, method, url, idempotent=None, on_retry=None,
+            **kwargs):
+        """ Send a request on session, retrying as described above
+
+        Keyword arguments:
+        session -- requests session from new_session
+        method -- HTTP method name, e.g. 'get'
+        url -- URL to request
+        idempotent -- whether the request may safely be repeated (default:
+                None, decided by the method)
+        on_retry -- function called with no arguments before each retry
+        kwargs -- passed on to the requests session
+        """
+        if idempotent is None:
+            idempotent = method in self.IDEMPOTENT_METHODS
+        kwargs.setdefault('timeout', self.timeout)
+        retry_status = self.RETRY_STATUS if idempotent else self.REJECTED_STATUS
+        attempt = 0
+        while True:
+            try:
+                r = getattr(session, method)(url, **kwargs)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout):
+                if not idempotent or attempt >= self.retries:
+                    raise
+                wait = self.delay(attempt)
+            else:
+                if r.status_code not in retry_status or attempt >= self.retries:
+                    return r
+                wait = self.delay(attempt, r)
+                r.close()
+            if on_retry:
+                on_retry()
+            time.sleep(wait)
+            attempt += 1
+
+
+class _RateLimiter:
+    """ Space out calls to wait() so no more than `rate` pass per second,
+    across all threads """
+    def __init__(self, rate):
+        self._interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def balance_assignments(companionships, households, seed=None, capacity=None,
+        weight=None, loads=None):
+    """ Distribute households among companionships, always giving the next
+    household to the least-loaded companionship that can take it; return a
+    tuple (new_assignments, unplaced) where new_assignments maps each
+    companionship id to its existing plus new households, and unplaced lists
+    households left over because every companionship was full; raise
+    ValueError if a household could only go to a companionship it ministers in
+
+    Keyword parameters:
+    companionships -- list of Companionship records
+    households -- list of households to distribute, each a Person record
+    seed -- random seed for a repeatable distribution (default: None)
+    capacity -- maximum number of households per companionship, either a
+            number for all companionships or a dict keyed by companionship id
+            (default: None, unlimited)
+    weight -- function returning the load of a household, e.g. household
+            size (default: None, each household counts as 1)
+    loads -- current load of each companionship, a dict keyed by
+            companionship id as returned by LoadTable.loads (default: None,
+            summed from weight)
+    """
+    rng = random.Random(seed)
+    if weight is None:
+        weight = lambda x: 1
+    if capacity is None or isinstance(capacity, dict):
+        caps = capacity or {}
+    else:
+        caps = dict.fromkeys([x.id for x in companionships], capacity)
+
+    new_assignments = {}
+    minister_ids = []
+    heap = []
+    for i, companionship in enumerate(companionships):
+        new_assignments[companionship.id] = companionship.assignments.copy()
+        minister_ids.append(set([x.id for x in companionship.ministers]))
+        if loads is None:
+            load = sum([weight(x) for x in companionship.assignments])
+        else:
+            load = loads[companionship.id]
+        heap.append((load, rng.random(), i))
+    heapq.heapify(heap)
+
+    # shuffle, then place the heaviest households first for a tighter balance
+    households = list(households)
+    rng.shuffle(households)
+    households.sort(key=weight, reverse=True)
+
+    unplaced = []
+    for household in households:
+        skipped = []
+        placed = False
+        while heap:
+            load, tiebreak, i = heapq.heappop(heap)
+            companionship = companionships[i]
+            val = new_assignments[companionship.id]
+            cap = caps.get(companionship.id)
+            if cap is not None and len(val) >= cap:
+                # full; drop it from the heap for good
+                continue
+            if household.id in minister_ids[i]:
+                # make sure member is not assigned to minister self
+                skipped.append((load, tiebreak, i))
+                continue
+            val.append(household)
+            heapq.heappush(heap, (load + weight(household), rng.random(), i))
+            placed = True
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        if not placed:
+            if skipped:
+                raise ValueError("%s can only be assigned to their own "
+                        "companionship" % household)
+            unplaced.append(household)
+    return new_assignments, unplaced
+
+
+def optimize_assignments(companionships, households, exclusions=(),
+        movable=False, capacity=None, seed=None):
+    """ Assign households to companionships, possibly across many districts,
+    so that the number of households per companionship is as even as
+    possible; return a tuple (new_assignments, unplaced) where new_assignments
+    maps each companionship id to its new list of households, and unplaced
+    lists households that no companionship could take
+
+    Households are placed one at a time along shortest augmenting paths: a
+    household may go to a companionship directly, or displace a previously
+    placed household to another companionship it may go to, whichever ends at
+    the least-loaded companionship. This minimizes the variance of the loads
+    (and every other convex measure of imbalance), and existing assignments
+    only move when that makes the loads more even.
+
+    Keyword parameters:
+    companionships -- list of Companionship records to assign households to
+    households -- list of households to place, each a Person record
+    exclusions -- iterable of (household id, id) pairs that may never be
+            matched, where the second id is a minister or companionship uuid
+            (default: none)
+    movable -- allow households already assigned to these companionships to
+            move to another one (default: False)
+    capacity -- maximum number of households per companionship, either a
+            number or a dict keyed by companionship id (default: None,
+            unlimited)
+    seed -- random seed used to break ties between equal loads
+            (default: None)
+    """
+    rng = random.Random(seed)
+    if capacity is None or isinstance(capacity, dict):
+        caps = capacity or {}
+    else:
+        caps = dict.fromkeys([x.id for x in companionships], capacity)
+    excluded = {}
+    for household_id, other_id in exclusions:
+        excluded.setdefault(household_id, set()).add(other_id)
+
+    k = len(companionships)
+    # map each minister and companionship uuid to companionship indexes
+    members = {}
+    for i, companionship in enumerate(companionships):
+        members.setdefault(companionship.id, set()).add(i)
+        for minister in companionship.ministers:
+            members.setdefault(minister.id, set()).add(i)
+    limit = [caps.get(c.id) for c in companionships]
+    tiebreak = [rng.random() for c in companionships]
+    blocked_cache = {}
+
+    def blocked(household):
+        """ Return the set of companionships household may not go to: its own
+        (no one ministers to themselves) and any excluded ones """
+        if household.id not in blocked_cache:
+            result = set()
+            for other_id in [household.id] + list(excluded.get(household.id, ())):
+                result |= members.get(other_id, set())
+            blocked_cache[household.id] = result
+        return blocked_cache[household.id]
+
+    def allowed(household):
+        banned = blocked(household)
+        return [i for i in range(k) if i not in banned]
+
+    def has_room(i):
+        return limit[i] is None or load[i] < limit[i]
+
+    # fixed households count towards the load but never move
+    fixed = [[] if movable else list(c.assignments) for c in companionships]
+    placed = [list(c.assignments) if movable else [] for c in companionships]
+    load = [len(c.assignments) for c in companionships]
+
+    def search(roots, target, start=None):
+        """ Breadth-first search along alternating paths from roots, a list of
+        (companionship, (previous companionship, household)) links, one level
+        at a time, stopping at the first level that reaches a load of target
+        or less; return (least-loaded reachable companionship, parent links) """
+        parent = {start: None}
+        level = []
+        for i, link in roots:
+            if i not in parent:
+                parent[i] = link
+                level.append(i)
+        best = None
+        while level:
+            for i in level:
+                if has_room(i) and (best is None or
+                        (load[i], tiebreak[i]) < (load[best], tiebreak[best])):
+                    best = i
+            if best is not None and load[best] <= target:
+                break
+            # most households may go almost anywhere, so expand through the
+            # set of unvisited companionships rather than each allowed list
+            unvisited = set(range(k)).difference(parent)
+            next_level = []
+            for i in level:
+                for household in placed[i]:
+                    if not unvisited:
+                        break
+                    banned = blocked(household)
+                    for j in unvisited.difference(banned):
+                        parent[j] = (i, household)
+                        next_level.append(j)
+                    unvisited &= banned
+            level = next_level
+        return best, parent
+
+    def shift(end, parent, stop):
+        """ Move households along the path ending at companionship end """
+        i = end
+        while i != stop:
+            prev, household = parent[i]
+            placed[i].append(household)
+            if prev is None:
+                break
+            placed[prev].remove(household)
+            i = prev
+
+    unplaced = []
+    households = list(households)
+    rng.shuffle(households)
+    for household in households:
+        roots = [(i, (None, household)) for i in allowed(household)]
+        floor = min([load[i] for i in range(k) if has_room(i)] or [0])
+        best, parent = search(roots, floor)
+        if best is None:
+            unplaced.append(household)
+            continue
+        shift(best, parent, None)
+        load[best] += 1
+
+    if movable:
+        # move households from the heaviest companionships towards lighter
+        # ones until no path improves the balance
+        improved = True
+        while improved:
+            improved = False
+            for hi in sorted(range(k), key=lambda i: -load[i]):
+                if load[hi] - min(load) < 2:
+                    break
+                roots = [(j, (hi, household)) for household in placed[hi]
+                        for j in allowed(household)]
+                best, parent = search(roots, load[hi] - 2, hi)
+                if best is not None and load[best] <= load[hi] - 2:
+                    shift(best, parent, hi)
+                    load[hi] -= 1
+                    load[best] += 1
+                    improved = True
+
+    new_assignments = {}
+    for i, companionship in enumerate(companionships):
+        current = fixed[i] + placed[i]
+        ids = set([x.id for x in current])
+        kept = [x for x in companionship.assignments if x.id in ids]
+        kept_ids = set([x.id for x in kept])
+        new_assignments[companionship.id] = kept + [x for x in current
+                if x.id not in kept_ids]
+    return new_assignments, unplaced
+
+
+def rebalance_assignments(companionships, spread=1, exclusions=(), seed=None):
+    """ Move already-assigned households between companionships until no two
+    companionships differ by more than spread households, using the fewest
+    possible moves; return new_assignments, a dict mapping each companionship
+    id to its new list of households; raise ValueError if the spread cannot
+    be reached without assigning a household to its own ministers or to an
+    excluded companionship
+
+    Of the bands [lo, lo + spread] that hold every companionship's load, the
+    one needing the fewest moves is chosen: each move takes one household
+    from above the band or puts one below it, so the cost of a band is the
+    larger of its excess and its shortfall. Moves prefer companionships that
+    are already changing, so that as few as possible need updating.
+
+    Keyword parameters:
+    companionships -- list of Companionship records, e.g. those of a district
+    spread -- largest allowed difference between the heaviest and lightest
+            loads (default: 1)
+    exclusions -- iterable of (household id, id) pairs that may never be
+            matched, where the second id is a minister or companionship uuid
+            (default: none)
+    seed -- random seed used to choose which households move (default: None)
+    """
+    rng = random.Random(seed)
+    k = len(companionships)
+    placed = [list(c.assignments) for c in companionships]
+    load = [len(x) for x in placed]
+    if k == 0 or max(load) - min(load) <= spread:
+        return dict([(c.id, list(c.assignments)) for c in companionships])
+
+    excluded = {}
+    for household_id, other_id in exclusions:
+        excluded.setdefault(household_id, set()).add(other_id)
+    members = [set([c.id] + [x.id for x in c.ministers]) for c in companionships]
+
+    def allowed(household, i):
+        return household.id not in members[i] and \
+                not members[i] & excluded.get(household.id, set())
+
+    # choose the cheapest band that can hold the total load
+    total = sum(load)
+    best = None
+    for lo in range(min(load), max(load) + 1):
+        hi = lo + spread
+        if not k * lo <= total <= k * hi:
+            continue
+        excess = sum([max(0, x - hi) for x in load])
+        shortfall = sum([max(0, lo - x) for x in load])
+        if best is None or max(excess, shortfall) < best[0]:
+            best = (max(excess, shortfall), lo, hi)
+    if best is None:
+        raise ValueError("No band of loads %d apart holds %d households" %
+                (spread, total))
+    _, lo, hi = best
+
+    touched = set()
+    order = list(range(k))
+    rng.shuffle(order)
+    while True:
+        over = [i for i in order if load[i] > hi]
+        under = [i for i in order if load[i] < lo]
+        if not over and not under:
+            break
+        # donors above the band must give; otherwise any above its floor may
+        if over:
+            donors = sorted(over, key=lambda i: -load[i])
+        else:
+            donors = sorted([i for i in order if load[i] > lo],
+                    key=lambda i: (i not in touched, -load[i]))
+        if under:
+            receivers = sorted(under, key=lambda i: load[i])
+        else:
+            receivers = sorted([i for i in order if load[i] < hi],
+                    key=lambda i: (i not in touched, load[i]))
+        move = None
+        for i in donors:
+            households = placed[i][:]
+            rng.shuffle(households)
+            for j in receivers:
+                for household in households:
+                    if allowed(household, j):
+                        move = (i, j, household)
+                        break
+                if move:
+                    break
+            if move:
+                break
+        if move is None:
+            raise ValueError("Cannot reach a spread of %d without assigning "
+                    "a household to its own companionship" % spread)
+        i, j, household = move
+        placed[i].remove(household)
+        placed[j].append(household)
+        load[i] -= 1
+        load[j] += 1
+        touched.update((i, j))
+
+    return dict([(c.id, placed[i]) for i, c in enumerate(companionships)])
+
+
+def _companionship_payload(district, companionship, ministers, assignments):
+    """ Return (uuid, request body) for a sandbox-companionship PUT """
+    minister_string = [{'personUuid': x.id, 'legacyCmisId': x.legacy_id, 'overrideWarnings': True} for x in ministers]
+    assignment_string = [{'personUuid': x.id, 'legacyCmisId': x.legacy_id, 'overrideWarnings': True} for x in assignments]
+    if companionship is None:
+        uuid = None
+    else:
+        uuid = companionship.id
+    data = {
+        'district': {'uuid': district.id},
+        'ministeringPeople': minister_string,
+        'assignments': assignment_string,
+        'uuid': uuid}
+    return uuid, data
+
+
+class _SessionPlanning:
+    """ Planning shared by MinisteringSession and AsyncMinisteringSession,
+    working only on their loaded assignments and eligibles """
+
+    def plan_delete_companionships(self, district):
+        """ Return a ChangePlan deleting all companionships in district """
+        plan = ChangePlan(self.assignments)
+        for companionship in district.companionships:
+            print("Deleting", companionship, "from", district)
+            plan.delete(companionship)
+        return plan
+
+    def plan_copy_companionships(self, from_districts, to_district):
+        """ Return a ChangePlan copying the companionships (but not their
+        assignments) of from_districts into to_district """
+        plan = ChangePlan(self.assignments)
+        for district in from_districts:
+            for companionship in district.companionships:
+                print('Copying %s from %s to %s' % (companionship, district, to_district))
+                plan.create(to_district, companionship.ministers)
+        return plan
+
+    def plan_distribute_assignments(self, to_district, eligible_assignments=None,
+            seed=None, capacity=None, weight=None):
+        """ Return a ChangePlan distributing eligible assignees among the
+        companionships in to_district; see distribute_assignments """
+        if eligible_assignments is None:
+            eligible_assignments = self.unassigned_households
+
+        # take the starting loads from a table of the district, weighing
+        # each household once
+        new_assignments, unplaced = balance_assignments(
+                to_district.companionships, eligible_assignments, seed=seed,
+                capacity=capacity, weight=weight,
+                loads=LoadTable([to_district], weight).loads())
+        for assignment in unplaced:
+            print('No room in %s for %s' % (to_district, assignment))
+
+        # plan only the companionships whose households actually change
+        plan = ChangePlan.from_assignments(self.assignments, new_assignments)
+        for line in plan.describe():
+            print(line)
+        return plan
+
+    def plan_optimize_assignments(self, districts, eligible_assignments=None,
+            exclusions=(), movable=False, capacity=None, seed=None):
+        """ Return a ChangePlan assigning eligible households across the
+        companionships of several districts; see optimize_assignments """
+        if eligible_assignments is None:
+            eligible_assignments = self.unassigned_households
+
+        companionships = [c for d in districts for c in d.companionships]
+        new_assignments, unplaced = optimize_assignments(companionships,
+                eligible_assignments, exclusions=exclusions, movable=movable,
+                capacity=capacity, seed=seed)
+        for assignment in unplaced:
+            print('No companionship can take', assignment)
+
+        # the plan sends companionships that lose households before those
+        # that gain them, so no household is ever in two companionships
+        plan = ChangePlan.from_assignments(self.assignments, new_assignments)
+        for line in plan.describe():
+            print(line)
+        return plan
+
+    def plan_rebalance_district(self, district, spread=1, exclusions=(),
+            seed=None):
+        """ Return a ChangePlan evening out the loads of the companionships
+        in district with the fewest moves; see rebalance_district """
+        new_assignments = rebalance_assignments(district.companionships,
+                spread=spread, exclusions=exclusions, seed=seed)
+        plan = ChangePlan.from_assignments(self.assignments, new_assignments)
+        for line in plan.describe():
+            print(line)
+        return plan
+
+    def validate_plan(self, plan):
+        """ Raise ValidationError listing every problem ChangePlan.validate
+        finds in plan, checking eligibility against the loaded eligibles """
+        problems = plan.validate(self._eligibles)
+        if problems:
+            raise ValidationError(problems)
+
+    def _check_write(self, district, companionship, ministers, assignments):
+        """ Validate a single create or update against the loaded data, if
+        validation is on and the data is current """
+        if not self._validate or self._stale or self._assignments is None:
+            return
+        plan = ChangePlan(self._assignments)
+        if companionship is None:
+            plan.create(district, ministers, assignments)
+        else:
+            plan.update(companionship, ministers, assignments, district)
+        self.validate_plan(plan)
+
+    @property
+    def unassigned_households(self):
+        assignments = self.assignments
+        return [x for x in self.eligibles.assignments
+                if not assignments.has_assignment(x.id)]
+
+    @property
+    def unassigned_ministers(self):
+        assignments = self.assignments
+        return [x for x in self.eligibles.ministers
+                if not assignments.has_minister(x.id)]
+
+
+class MinisteringSession(_SessionPlanning):
+    def __init__(self, write_through=False, max_age=None, max_writes=None,
+            login_ttl=300, auto_relogin=False, lcr_url='https://lcr.lds.org',
+            login_url='https://signin.lds.org/login.html', transport=None,
+            lazy=False, validate=True):
+        """ Create a new session
+
+        Keyword arguments:
+        write_through -- apply successful writes to the loaded data instead of
+                re-downloading it on next access (default: False)
+        max_age -- seconds after a download before the data is considered
+                stale and downloaded again (default: None, never)
+        max_writes -- number of write-through writes after which the data is
+                considered stale and downloaded again (default: None, never)
+        login_ttl -- seconds for which a successful login check or request is
+                trusted before check_login probes the server again (default: 300)
+        auto_relogin -- keep the login credentials in memory so an expired
+                session can be renewed without prompting (default: False)
+        lcr_url -- base URL of the LCR site, e.g. to use a local test server
+                (default: 'https://lcr.lds.org')
+        login_url -- URL of the login form
+                (default: 'https://signin.lds.org/login.html')
+        transport -- Transport with pooling, timeout and retry settings
+                (default: None, Transport defaults)
+        lazy -- load assignments lazily, creating records only when they
+                are first used; see MinisteringAssignments.loads
+                (default: False)
+        validate -- check writes against the loaded data before sending
+                them, and raise ValidationError instead of making a request
+                that would fail; see ChangePlan.validate (default: True)
+        """
+        self._session = None
+        self._data = None
+        self._assignments = None
+        self._eligibles = None
+        self._dataset = None
+        self._stale = True
+        self._write_through = write_through
+        self._max_age = max_age
+        self._max_writes = max_writes
+        self._loaded_at = None
+        self._writes = 0
+        self._write_generation = 0
+        self._lock = threading.Lock()
+        self._login_ttl = login_ttl
+        self._auto_relogin = auto_relogin
+        self._credentials = (None, None)
+        self._auth_checked_at = None
+        self._login_generation = 0
+        self._login_lock = threading.Lock()
+        self._lcr_url = lcr_url.rstrip('/')
+        self._login_url = login_url
+        self.metrics = SessionMetrics()
+        self._transport = transport or Transport()
+        self._lazy = lazy
+        self._validate = validate
+        self._digest = None
+        self._subscribers = []
+        self._refresher = None
+
+    def _loaded(self):
+        """ Reset the staleness policy after a full load of the data """
+        self._stale = False
+        self._loaded_at = time.monotonic()
+        self._writes = 0
+
+    def _written(self, apply):
+        """ Record a successful write, either by patching the loaded data
+        with apply(assignments) in write-through mode, or by marking the
+        data stale """
+        with self._lock:
+            self._write_generation += 1
+            if not self._write_through or self._assignments is None:
+                self._stale = True
+                return
+            try:
+                apply(self._assignments)
+            except ValueError:
+                self._stale = True
+            self._writes += 1
+
+    @property
+    def stale(self):
+        """ True if the data will be downloaded again on next access """
+        if self._stale:
+            return True
+        if self._max_age is not None and \
+                time.monotonic() - self._loaded_at > self._max_age:
+            return True
+        if self._max_writes is not None and self._writes >= self._max_writes:
+            return True
+        return False
+
+    def refresh(self):
+        """ Download the ministering assignments again, discarding any
+        locally applied changes """
+        self.download_assignments(self._dataset or 'elders')
+
+    def login(self, username=None, password=None):
+        """ Login to lds.org and raise PermissionError if failed
+
+        Keyword arguments:
+        username -- lds.org username (default: prompt)
+        password -- lds.org password (default: prompt)
+        """
+        if username==None:
+            username = input('Username: ')
+        if password==None:
+            password = getpass.getpass('Password: ')
+
+        payload = {'username': username, 'password': password}
+        self._session = self._transport.new_session()
+        with self.metrics.time('login'):
+            r = self._request('post', 'login', self._login_url, data=payload)
+        self.metrics.count_status('login', r.status_code)
+
+        if not '<meta http-equiv="refresh"' in r.text:
+            self._auth_checked_at = None
+            raise PermissionError("Login failed")
+        if self._auto_relogin:
+            self._credentials = (username, password)
+        self._auth_checked_at = time.monotonic()
+        self._login_generation += 1
+
+    def check_login(self):
+        """ Check if currently logged in with access to the ministering section
+
+        A successful check, login or request is trusted for login_ttl seconds.
+        Otherwise the sandbox data is probed with HEAD, whose content type
+        tells the JSON data from the HTML login page without a body to read,
+        so the connection stays open for the next request. Servers that do
+        not allow HEAD get a GET of which only the start is read.
+        """
+        if self._session is None:
+            return False
+        if self._auth_checked_at is not None and \
+                time.monotonic() - self._auth_checked_at < self._login_ttl:
+            return True
+        url = self._lcr_url + "/services/umlu/v1/ministering/sandbox-data-full?lang=eng&type=EQ"
+        with self.metrics.time('check_login'):
+            r = self._request('head', 'check_login', url)
+            if r.status_code in (405, 501):
+                r = self._request('get', 'check_login', url, stream=True)
+                try:
+                    head = next(r.iter_content(1024, decode_unicode=False), b'')
+                finally:
+                    r.close()
+                self.metrics.count_bytes('check_login', len(head))
+                logged_in = b"<!DOCTYPE" not in head
+            else:
+                logged_in = r.status_code == 200 and \
+                        'json' in r.headers.get('Content-Type', '')
+        self.metrics.count_status('check_login', r.status_code)
+        if not logged_in:
+            self._auth_checked_at = None
+            return False
+        else:
+            self._auth_checked_at = time.monotonic()
+            return True
+
+    @staticmethod
+    def _is_login_page(r):
+        """ Return True if a service response is the HTML login page, which
+        lds.org returns with status 200 once the session has expired """
+        return r.status_code == 200 and "<!DOCTYPE" in r.text
+
+    def _relogin(self, generation):
+        """ Log in again after an expired session was detected, unless another
+        thread has already done so since `generation` was read """
+        with self._login_lock:
+            if self._login_generation == generation:
+                self.login(*self._credentials)
+
+    def _api_request(self, method, url, **kwargs):
+        """ Send a request to a ministering service endpoint; if the response
+        shows the session has expired, log in again and retry once
+
+        Keyword arguments:
+        method -- HTTP method name, e.g. 'put' or 'delete'
+        url -- service URL
+        kwargs -- passed on to the underlying requests session
+        """
+        generation = self._login_generation
+        r = self._timed_request(method, url, **kwargs)
+        if self._is_login_page(r):
+            self._auth_checked_at = None
+            self._relogin(generation)
+            self.metrics.count_retry(method)
+            r = self._timed_request(method, url, **kwargs)
+        if not self._is_login_page(r):
+            self._auth_checked_at = time.monotonic()
+        return r
+
+    def _request(self, method, phase, url, **kwargs):
+        """ Send a request through the transport, counting retries under phase """
+        return self._transport.request(self._session, method, url,
+                on_retry=lambda: self.metrics.count_retry(phase), **kwargs)
+
+    def _timed_request(self, method, url, **kwargs):
+        """ Send one request, recording its latency, status and size """
+        with self.metrics.time(method):
+            r = self._request(method, method, url, **kwargs)
+        self.metrics.count_status(method, r.status_code)
+        self.metrics.count_bytes(method, len(r.content))
+        return r
+
+    def download_assignments(self, dataset='elders'):
+        """ Download ministering assignments from lds.org and populate
+        the structure from the selected dataset; raise ValueError if failed
+
+        Keyword arguments:
+        dataset -- dataset to populate (default: 'elders')
+        """
+        if not self.check_login():
+            self.login()
+
+        print("Downloading ministering assignments from",
+                _assignments_url(self._lcr_url, dataset))
+        self._fetch(dataset, 'download')
+
+    def _fetch(self, dataset, phase, skip_unchanged=False):
+        """ Download and parse the assignments, swap them in under the data
+        lock, and notify subscribers of any changes; return the list of
+        Change records, or None if the page was unchanged and skipped
+
+        A write made while the page is downloaded and parsed may be missing
+        from it, and is lost from the loaded data by the swap, so the data
+        is left stale to be downloaded again.
+        """
+        url = _assignments_url(self._lcr_url, dataset)
+        with self._lock:
+            generation = self._write_generation
+        with self.metrics.time(phase):
+            r = self._request('get', phase, url, stream=True)
+        self.metrics.count_status(phase, r.status_code)
+
+        # parse response to get json encoded sandbox assignments
+        previous = self._digest if skip_unchanged and dataset == self._dataset else None
+        body = _Transfer(r.iter_content(65536), self.metrics, phase)
+        start = time.perf_counter()
+        try:
+            digest, data = _scan_page(body, previous)
+        finally:
+            r.close()
+        self.metrics.record('transfer', body.seconds)
+        self.metrics.record('extract', time.perf_counter() - start - body.seconds)
+        if data is None and previous is not None and digest == previous:
+            with self._lock:
+                self._loaded()
+                self._stale = self._write_generation != generation
+            return None
+        if data is None:
+            raise ValueError("Could not parse response from lds.org")
+        with self.metrics.time('loads'):
+            assignments, eligibles = _load_records(data, dataset, self._lazy)
+
+        old = self._assignments
+        changes = []
+        if self._subscribers and old is not None and dataset == self._dataset:
+            changes = list(diff_assignments(old, assignments))
+        with self._lock:
+            self._data = data
+            self._assignments, self._eligibles = assignments, eligibles
+            self._dataset = dataset
+            self._digest = digest
+            self._loaded()
+            self._stale = self._write_generation != generation
+        if changes:
+            self._notify(changes)
+        return changes
+
+    def add_subscriber(self, subscriber):
+        """ Call subscriber(companionships, changes) whenever a download,
+        in the background or not, replaces the data with different data:
+        companionships is the set of uuids of the companionships added,
+        removed or changed, and changes is the list of Change records from
+        diff_assignments """
+        self._subscribers.append(subscriber)
+
+    def remove_subscriber(self, subscriber):
+        self._subscribers.remove(subscriber)
+
+    def _notify(self, changes):
+        companionships = set()
+        for change in changes:
+            if isinstance(change.record, Companionship):
+                companionships.add(change.record.id)
+            elif isinstance(change.record, Person):
+                # household changes list the companionships it left and joined
+                companionships.update([x.id for x in (change.before or []) +
+                        (change.after or [])])
+        for subscriber in list(self._subscribers):
+            subscriber(companionships, changes)
+
+    def start_refresher(self, interval=300, on_error=None):
+        """ Download the assignments every interval seconds on a background
+        thread, so that changes made on the web site are picked up and
+        reading stale data never waits on the network; raise ValueError if
+        a refresher is already running
+
+        Each refresh hashes the ministering data in the page and skips
+        parsing it when nothing has changed. Otherwise the new assignments
+        and eligibles are swapped in together and subscribers are notified
+        (see add_subscriber). While the refresher runs, reading assignments
+        or eligibles that are stale, e.g. after a write, returns the current
+        data at once and asks the refresher to download now. An expired
+        login is renewed only if the session was created with auto_relogin.
+
+        Keyword arguments:
+        interval -- seconds between downloads (default: 300)
+        on_error -- function called with any exception raised by a refresh;
+                the refresher keeps running (default: None, ignore errors)
+        """
+        if self._refresher is not None:
+            raise ValueError("Refresher already running")
+        stop = threading.Event()
+        wake = threading.Event()
+        if self._assignments is None:
+            wake.set()
+
+        def run():
+            while not stop.is_set():
+                wake.wait(interval)
+                wake.clear()
+                if stop.is_set():
+                    break
+                try:
+                    self._refresh_once()
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+
+        thread = threading.Thread(target=run, name='ministering-refresher',
+                daemon=True)
+        self._refresher = (thread, stop, wake)
+        thread.start()
+
+    def stop_refresher(self, timeout=None):
+        """ Stop the background refresher, waiting up to timeout seconds
+        for a refresh in progress to finish (default: None, no limit) """
+        if self._refresher is None:
+            return
+        thread, stop, wake = self._refresher
+        self._refresher = None
+        stop.set()
+        wake.set()
+        thread.join(timeout)
+
+    def _refresh_once(self):
+        """ One background refresh, which never prompts for credentials """
+        if not self.check_login():
+            if not self._auto_relogin or self._credentials[0] is None:
+                raise PermissionError("Session expired; log in again")
+            self._relogin(self._login_generation)
+        self._fetch(self._dataset or 'elders', 'refresh', skip_unchanged=True)
+
+    def _download_page(self, unit, dataset):
+        """ Return the proposed-assignments page for a unit, read up to the
+        end of its __NEXT_DATA__ line """
+        url = _assignments_url(self._lcr_url, dataset, unit)
+        print("Downloading ministering assignments from", url)
+        with self.metrics.time('download'):
+            r = self._request('get', 'download', url, stream=True)
+        self.metrics.count_status('download', r.status_code)
+        body = _Transfer(r.iter_content(65536), self.metrics, 'download')
+        try:
+            scanner = _NextDataScanner()
+            chunks = []
+            for chunk in body:
+                chunks.append(chunk)
+                if scanner.feed(chunk):
+                    break
+        finally:
+            r.close()
+        self.metrics.record('transfer', body.seconds)
+        return b''.join(chunks)
+
+    def download_units(self, units=(None,), datasets=('elders',), workers=4,
+            processes=0):
+        """ Download ministering assignments for several units and datasets
+        at once and return a MinisteringCollection; raise ValueError if any
+        page cannot be parsed or lacks a dataset. The session's own
+        assignments are unchanged.
+
+        Pages are downloaded and parsed on a pool of threads. Pass processes
+        to parse on a pool of processes instead, so decoding a large unit
+        does not hold up the others; the processes are started with spawn
+        and import ministering, so this needs ministering to be importable
+        as a module and the calling script to guard its top level with
+        `if __name__ == '__main__':`.
+
+        Keyword arguments:
+        units -- unit numbers to download; None is the unit of the logged in
+                user (default: (None,))
+        datasets -- datasets to download for each unit, e.g. 'elders' or
+                'reliefSociety' (default: ('elders',))
+        workers -- number of concurrent downloads (default: 4)
+        processes -- number of parsing processes, or None for one per CPU;
+                0, or 1 CPU, parses in the downloading threads (default: 0)
+        """
+        keys = [(unit, dataset) for unit in units for dataset in datasets]
+        for unit, dataset in keys:
+            _assignments_url(self._lcr_url, dataset, unit)
+        if not self.check_login():
+            self.login()
+
+        collection = MinisteringCollection()
+        with contextlib.ExitStack() as stack:
+            downloads = stack.enter_context(concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers))
+            if processes is None:
+                processes = os.cpu_count() or 1
+                if processes == 1:
+                    processes = 0
+            # workers find _parse_page by its module, which __main__ is not
+            pickled = processes != 0 and _parse_page.__module__ != '__main__' \
+                    and importlib.util.find_spec(_parse_page.__module__) is not None
+            if pickled:
+                # spawn, since forking while downloads run is unsafe
+                parser = stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+                        max_workers=processes,
+                        mp_context=multiprocessing.get_context('spawn')))
+            else:
+                parser = downloads
+            pages = [(key, downloads.submit(self._download_page, *key)) for key in keys]
+            parsed = [((unit, dataset), parser.submit(_parse_page, page.result(),
+                    dataset, pickled)) for (unit, dataset), page in pages]
+            with self.metrics.time('loads'):
+                for (unit, dataset), future in parsed:
+                    records = future.result()
+                    if records is None:
+                        raise ValueError("No ministering data from lds.org "
+                                "for unit %s, dataset %s" % (unit, dataset))
+                    if pickled:
+                        records = _unpickle(records)
+                    collection.add(unit, dataset, *records)
+        return collection
+
+    def create_companionship(self, district, ministers, assignments=[]):
+        """ Create a new companionship in the given district, with the given
+        list of ministers and optional list of households; raise
+        ValidationError if the loaded data shows it would fail, or ValueError
+        if failed; attempt to log in if not currently logged in
+
+        Keyword arguments:
+        district -- District object of the district in which to place the
+                new companionship
+        ministers -- list of ministers for the companionship, each given by
+                a Person record
+        assignments -- optional list of households for the companionship, each 
+                given by a Person record
+        """
+        return self.update_companionship(district, None, ministers, assignments)
+
+    def update_companionship(self, district, companionship, ministers, assignments=[]):
+        """ Update an existing companionship in the given district, with the
+        given list of ministers and optional list of households, and return
+        its uuid (None if a new companionship's was not reported); raise
+        ValidationError if the loaded data shows it would fail, or ValueError
+        if failed
+
+        Keyword arguments:
+        district -- District object of the district holding the companionship
+        companionship -- Companionship record of the existing companionship
+        ministers -- list of ministers for the companionship, each given by
+                a Person record
+        assignments -- optional list of households for the companionship, each 
+                given by a Person record
+        """
+        self._check_write(district, companionship, ministers, assignments)
+        return self._put_companionship(district, companionship, ministers,
+                assignments)
+
+    def _put_companionship(self, district, companionship, ministers, assignments):
+        """ Send a companionship create (companionship None) or update without
+        validating it; see update_companionship """
+        uuid, data = _companionship_payload(district, companionship, ministers,
+                assignments)
+        url = self._lcr_url + '/services/umlu/v1/ministering/sandbox-companionship?lang=eng'
+        headers = {'content-type': 'application/json;charset=UTF-8'}
+        r = self._api_request('put', url, json=data, idempotent=uuid is not None)
+        
+        if uuid == None:
+            good_code = 201
+        else:
+            good_code = 200
+        if r.status_code != good_code or 'assignmentErrors' in json.loads(r.text):
+            self._stale = True
+            raise ValueError((r.status_code, r.text))
+
+        if uuid is None:
+            response = json.loads(r.text)
+            if isinstance(response, dict):
+                uuid = response.get('uuid') or response.get('id')
+        if uuid is None:
+            self._stale = True
+        else:
+            self._written(lambda x: x.patch_companionship(
+                district.id, uuid, ministers, assignments))
+        return uuid
+
+    def delete_companionship(self, companionship):
+        """ Delete an existing companionship; raise PermissionError or
+        ValueError if failed
+
+        Keyword arguments:
+        companionship -- Companionship record of the companionship to be deleted
+        """
+        url = self._lcr_url + "/services/umlu/v1/ministering/sandbox-companionship/%s?lang=eng" % (
+                companionship.id)
+        r = self._api_request('delete', url)
+        good_code = 204
+        notfound_code = 400
+        notloggedin_code = 200
+        if r.status_code == notloggedin_code:
+            raise PermissionError("Access denied (may need to log in again)")
+        elif r.status_code == notfound_code:
+            raise ValueError("Companionship not found")
+        elif r.status_code != good_code:
+            raise ValueError((r.status_code, r.text))
+        self._written(lambda x: x.remove_companionship(companionship.id))
+
+    def _run_bulk(self, tasks, workers=None, rate_limit=None):
+        """ Run a list of (item, function) write tasks and return a BulkResult
+
+        If workers is None, tasks run one at a time and the first error is
+        raised. Otherwise tasks run on a pool of that many threads and errors
+        are collected per item in the result instead of aborting the batch.
+
+        Keyword arguments:
+        tasks -- list of (item, function) pairs; function takes no arguments
+        workers -- number of concurrent writers (default: None, serial)
+        rate_limit -- maximum requests per second across all writers
+                (default: None, unlimited)
+        """
+        result = BulkResult()
+        limiter = _RateLimiter(rate_limit) if rate_limit else None
+
+        def run(fn):
+            if limiter:
+                limiter.wait()
+            fn()
+
+        if workers is None:
+            for item, fn in tasks:
+                run(fn)
+                result.succeeded.append(item)
+            return result
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(item, executor.submit(run, fn)) for item, fn in tasks]
+            for item, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    result.failed.append((item, e))
+                else:
+                    result.succeeded.append(item)
+        return result
+
+    def _run_phases(self, phases, workers=None, rate_limit=None, journal=None):
+        """ Send lists of (action, arguments, journal step) changes, one list
+        at a time, and return a BulkResult """
+        actions = {
+            'create': lambda *a: self._put_companionship(a[0], None, *a[1:]),
+            'update': self._put_companionship,
+            'delete': self.delete_companionship}
+        # report updates and deletes by companionship, creates by arguments
+        items = {'create': lambda a: a, 'update': lambda a: a[1],
+                'delete': lambda a: a[0]}
+        result = BulkResult()
+        for phase in phases:
+            tasks = []
+            for action, args, step in phase:
+                fn = lambda f=actions[action], a=args: f(*a)
+                if journal is not None:
+                    fn = journal.track(step, fn)
+                tasks.append((items[action](args), fn))
+            done = self._run_bulk(tasks, workers, rate_limit)
+            result.succeeded.extend(done.succeeded)
+            result.failed.extend(done.failed)
+        return result
+
+    def apply_plan(self, plan, workers=None, rate_limit=None, journal=None):
+        """ Send the changes in a ChangePlan, one phase at a time, and return
+        a BulkResult; raise ValidationError before sending anything if the
+        plan fails validate_plan (unless the session was created with
+        validate=False), or PermissionError or ValueError if failed (serial
+        mode only)
+
+        Keyword arguments:
+        plan -- ChangePlan to send
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, so
+                that resume_plan can finish the plan after a failure
+                (default: None, no journal)
+        """
+        if self._validate:
+            self.validate_plan(plan)
+        if journal is not None:
+            journal = BulkJournal.create(journal, plan)
+        steps = iter(range(len(plan)))
+        phases = [[(action, args, next(steps)) for action, args in phase]
+                for phase in plan.phases()]
+        return self._run_phases(phases, workers, rate_limit, journal)
+
+    def resume_plan(self, journal, workers=None, rate_limit=None):
+        """ Send the steps of a journaled bulk operation that are not yet
+        done, recording them in the same journal, and return a BulkResult
+        for those steps; raise PermissionError or ValueError if failed
+        (serial mode only)
+
+        Each remaining step is first checked against the current data:
+        deletes of companionships that are already gone and updates that
+        are already in place are marked done without a request. A create
+        that was sent is marked done if its district now holds a new
+        companionship with the same ministers, as when a timed-out request
+        was carried out after all; each such companionship stands in for one
+        create only, and never for one already recorded for another step or
+        present when the plan was written. Steps whose district or
+        companionship no longer exists fail, and the rest are validated
+        together as in apply_plan before any is sent.
+
+        Keyword arguments:
+        journal -- name of the journal file given to apply_plan or a bulk
+                operation
+        workers -- number of concurrent writers (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        """
+        journal = BulkJournal(journal)
+        current = self.assignments
+
+        def people(records):
+            return [_person_from_dict(x) for x in records]
+
+        phases = {}
+        plan = ChangePlan(current)
+        result = BulkResult()
+        # companionships recorded for a step, done with or changed by it
+        used = set([journal.uuid(x['step']) for x in journal.steps])
+        for step in journal.remaining:
+            n, action = step['step'], step['action']
+            found = current.get_companionships(id=step['id']) if 'id' in step else []
+            districts = current.get_districts(id=step['district']) if 'district' in step else []
+            if action == 'delete':
+                if not found:
+                    journal.mark_done(n, step['id'])
+                    continue
+                args = (found[0],)
+                plan.delete(found[0])
+            elif not districts or (action == 'update' and not found):
+                error = ValueError("District not found" if not districts
+                        else "Companionship not found")
+                journal.mark_failed(n, error)
+                result.failed.append((step, error))
+                continue
+            elif action == 'update':
+                args = (districts[0], found[0], people(step['ministers']),
+                        people(step['assignments']))
+                if _same_companionship((args[0], args[2], args[3]),
+                        current.get_district_of(found[0].id), found[0]):
+                    journal.mark_done(n, step['id'])
+                    continue
+                plan.update(found[0], args[2], args[3], args[0])
+            else:
+                args = (districts[0], people(step['ministers']),
+                        people(step['assignments']))
+                ministers = set([x['personUuid'] for x in step['ministers']])
+                created = [c for c in districts[0].companionships
+                        if c.id not in used and _ids(c.ministers) == ministers
+                        and c.id not in step.get('existing', ())]
+                if journal.sent(n) and created:
+                    journal.mark_done(n, created[0].id)
+                    used.add(created[0].id)
+                    continue
+                plan.create(*args)
+            phases.setdefault(step['phase'], []).append((action, args, n))
+
+        if self._validate:
+            self.validate_plan(plan)
+        done = self._run_phases([phases[x] for x in sorted(phases)], workers,
+                rate_limit, journal)
+        result.succeeded.extend(done.succeeded)
+        result.failed.extend(done.failed)
+        return result
+
+    def delete_companionships(self, district, preview=False, workers=None,
+            rate_limit=None, journal=None):
+        """ Delete all companionships in district and return a BulkResult, or
+        the ChangePlan if previewing; raise PermissionError or ValueError if
+        failed (serial mode only); attempt to log in if not currently logged in
+
+        Keyword arguments:
+        district -- District record of the district to be purged
+        preview -- preview output before committing chanages (default: False)
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, for
+                resume_plan (default: None, no journal)
+        """
+        plan = self.plan_delete_companionships(district)
+        if preview:
+            return plan
+        return self.apply_plan(plan, workers, rate_limit, journal)
+
+    def copy_companionships(self, from_districts, to_district, preview=False,
+            workers=None, rate_limit=None, journal=None):
+        """Copy companionships from from_districts to to_district, optionally
+        previewing the result before committing; return a BulkResult, or the
+        ChangePlan if previewing
+
+        Keyword arguments:
+        from_districts -- districts to copy companionships from
+        to_district -- district to copy companionships to
+        preview -- preview output before committing changes (default: False)
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, for
+                resume_plan (default: None, no journal)
+
+        Example:
+        Copy companionships from first three districts to the sixth
+        >>> ms.copy_companionships(ms.assignments.districts[0:3], 
+        >>>         ms.assignments.districts[5], preview=False)
+        """
+        plan = self.plan_copy_companionships(from_districts, to_district)
+        if preview:
+            return plan
+        return self.apply_plan(plan, workers, rate_limit, journal)
+        
+    def distribute_assignments(self, to_district, eligible_assignments=None, 
+            preview=False, workers=None, rate_limit=None, seed=None,
+            capacity=None, weight=None, journal=None):
+        """Distribute eligible assignees among companionships in to_district,
+        giving each to the companionship with the lightest load; return a
+        BulkResult, or the ChangePlan if previewing; raise ValueError if an
+        assignee could only be assigned to their own companionship
+
+        Keyword arguments:
+        to_district -- district with companionships to distribute assignments 
+                       among
+        eligibles -- list of eligible assignments to distribute 
+                     (default: None, loads list of eligible assignments
+                     from database)
+        preview -- preview output before committing changes (default: False)
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, for
+                resume_plan (default: None, no journal)
+        seed -- random seed for a repeatable distribution (default: None)
+        capacity -- maximum number of households per companionship, either a
+                number or a dict keyed by companionship id (default: None,
+                unlimited)
+        weight -- function returning the load of a household, e.g. household
+                size (default: None, each household counts as 1)
+
+        Example:
+        Distribute unassigned households to the companionships in district 6
+        >>> ms.distribute_assignments(ms.assignments.districts[5])
+        """
+        plan = self.plan_distribute_assignments(to_district,
+                eligible_assignments, seed=seed, capacity=capacity,
+                weight=weight)
+        if preview:
+            return plan
+        return self.apply_plan(plan, workers, rate_limit, journal)
+
+    def optimize_assignments(self, districts, eligible_assignments=None,
+            exclusions=(), movable=False, capacity=None, seed=None,
+            preview=False, workers=None, rate_limit=None, journal=None):
+        """Assign eligible households across all companionships of several
+        districts at once, keeping the loads as even as possible; print the
+        resulting plan, then send it unless previewing; return a BulkResult,
+        or the ChangePlan if previewing
+
+        Keyword arguments:
+        districts -- districts whose companionships take the households
+        eligible_assignments -- households to assign (default: None, all
+                unassigned households)
+        exclusions -- iterable of (household id, id) pairs that may never be
+                matched, where the second id is a minister or companionship
+                uuid (default: none)
+        movable -- allow households already assigned in these districts to
+                move to another companionship (default: False)
+        capacity -- maximum number of households per companionship, either a
+                number or a dict keyed by companionship id (default: None,
+                unlimited)
+        seed -- random seed used to break ties (default: None)
+        preview -- preview output before committing changes (default: False)
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, for
+                resume_plan (default: None, no journal)
+
+        Example:
+        Spread unassigned households over the first three districts
+        >>> ms.optimize_assignments(ms.assignments.districts[0:3])
+        """
+        plan = self.plan_optimize_assignments(districts, eligible_assignments,
+                exclusions=exclusions, movable=movable, capacity=capacity,
+                seed=seed)
+        if preview:
+            return plan
+        return self.apply_plan(plan, workers, rate_limit, journal)
+
+    def rebalance_district(self, district, spread=1, exclusions=(), seed=None,
+            preview=False, workers=None, rate_limit=None, journal=None):
+        """Move households between the companionships of district until their
+        loads differ by at most spread, moving as few households (and so
+        updating as few companionships) as possible; return a BulkResult, or
+        the ChangePlan if previewing; raise ValueError if a household would
+        have to go to its own companionship
+
+        Keyword arguments:
+        district -- District record of the district to rebalance
+        spread -- largest allowed difference between the heaviest and lightest
+                companionship (default: 1)
+        exclusions -- iterable of (household id, id) pairs that may never be
+                matched, where the second id is a minister or companionship
+                uuid (default: none)
+        seed -- random seed used to choose which households move
+                (default: None)
+        preview -- preview output before committing changes (default: False)
+        workers -- number of concurrent writers; errors are collected in the
+                result instead of raised (default: None, serial)
+        rate_limit -- maximum requests per second (default: None, unlimited)
+        journal -- name of a new BulkJournal file recording each write, for
+                resume_plan (default: None, no journal)
+
+        Example:
+        Even out the loads in district 6 to within one household
+        >>> ms.rebalance_district(ms.assignments.districts[5], preview=True)
+        """
+        plan = self.plan_rebalance_district(district, spread=spread,
+                exclusions=exclusions, seed=seed)
+        if preview:
+            return plan
+        return self.apply_plan(plan, workers, rate_limit, journal)
+
+    def save_data(self, filename='ministering_data.json'):
+        """Save downloaded ministering data to file
+
+        NOTE: this feature is for debug purposes only. It is not intended to
+        be used for long-term storage of membership records, exporting data to
+        third-party applications, or for any purpose other than to perform the
+        official duties of Elders Quorum or Relief Society Presidencies.
+        See https://www.lds.org/legal/privacy-notice?lang=eng&country=go.
+
+        Keyword arguments:
+        filename -- name of file to save (default: 'ministering_data.json')
+        """
+        if self._data is None or self.stale:
+            self.download_assignments()
+        with open(filename, 'w') as fp:
+            json.dump(self._data, fp)
+
+    def load_data(self, filename='ministering_data.json', dataset='elders'):
+        """Load ministering data from a file
+
+        NOTE: this feature is for debug purposes only. It is not intended to
+        be used for long-term storage of membership records, exporting data to
+        third-party applications, or for any purpose other than to perform the
+        official duties of Elders Quorum or Relief Society Presidencies.
+        See https://www.lds.org/legal/privacy-notice?lang=eng&country=go.
+
+        Keyword arguments:
+        filename -- name of file to load (default: 'ministering_data.json')
+        """
         with open(filename, 'r') as fp:
             self._data = json.load(fp)
-        self._assignments = MinisteringAssignments(self._data, dataset)
-        self._eligibles = MinisteringEligible(self._data)
+        self._assignments, self._eligibles = _load_records(self._data,
+                dataset, self._lazy)
         self._dataset = dataset
-        self._stale = False
+        self._digest = None
+        self._loaded()
+
+    def store_snapshot(self, store, label=None):
+        """ Add the downloaded ministering data to a MinisteringStore and
+        return its snapshot id
+
+        Keyword arguments:
+        store -- MinisteringStore to add to
+        label -- optional description of the snapshot
+        """
+        if self._data is None:
+            raise ValueError("No ministering data loaded")
+        return store.ingest(self._data, None, label, self._dataset or 'elders')
+
+    def save_snapshot(self, filename='ministering_data.snapshot', compression=0):
+        """Save downloaded ministering data, with its parsed records and
+        indexes, to a binary snapshot that loads faster than save_data's JSON
+
+        NOTE: the same restrictions as save_data apply.
+
+        Keyword arguments:
+        filename -- name of file to save (default: 'ministering_data.snapshot')
+        compression -- zlib compression level, 0 (none) to 9 (default: 0)
+        """
+        if self._data is None or self.stale:
+            self.download_assignments()
+        dump_snapshot((self._data, self._dataset, self._assignments,
+                self._eligibles), filename, compression)
+
+    def load_snapshot(self, filename='ministering_data.snapshot'):
+        """Load ministering data from a snapshot written by save_snapshot;
+        raise ValueError if the snapshot is invalid
+
+        Keyword arguments:
+        filename -- name of file to load (default: 'ministering_data.snapshot')
+        """
+        self._data, self._dataset, self._assignments, self._eligibles = \
+                load_snapshot(filename)
+        self._digest = None
+        self._loaded()
 
     def save_session(self, filename='ministering_session.json'):
         """Save the current login session, allowing it to be reloaded by future
@@ -604,44 +4050,695 @@ class MinisteringSession:
         filename -- name of file to load (default: 'ministering_session.json')
         """
         with open(filename, 'r') as fp:
-            self._session = requests.session()
+            self._session = self._transport.new_session()
             self._session.cookies = requests.utils.cookiejar_from_dict(json.load(fp))
+        self._auth_checked_at = None
+
+    def _refresh_stale(self):
+        """ Bring stale data up to date: through the background refresher if
+        it is running and there is data to serve meanwhile, else at once """
+        if self._refresher is not None and self._assignments is not None:
+            self._refresher[2].set()
+        else:
+            self.download_assignments(self._dataset or 'elders')
 
     @property
     def assignments(self):
-        if self._stale:
-            self.download_assignments(self._dataset)
+        if self.stale:
+            self._refresh_stale()
         return self._assignments
 
     @property
     def eligibles(self):
-        if self._stale:
-            self.download_assignments(self._dataset)
+        if self.stale:
+            self._refresh_stale()
         return self._eligibles
 
+class AsyncMinisteringSession(_SessionPlanning):
+    """ asyncio counterpart of MinisteringSession, built on aiohttp
+
+    Network calls are coroutines and never block the event loop; the data
+    is parsed by the same MinisteringAssignments and MinisteringEligible
+    classes, and the bulk helpers plan their changes the same way. Unlike
+    MinisteringSession, reading assignments or eligibles never downloads;
+    the bulk helpers download first if the data is stale, and refresh()
+    downloads on demand. Bulk requests run concurrently, bounded by a
+    semaphore, and errors are collected in the returned BulkResult.
+
+    Example:
+    >>> async with AsyncMinisteringSession() as ms:
+    >>>     await ms.login(username, password)
+    >>>     await ms.download_assignments()
+    >>>     await ms.distribute_assignments(ms.assignments.districts[5])
+    """
+    def __init__(self, concurrency=8, write_through=False, login_ttl=300,
+            auto_relogin=False, lcr_url='https://lcr.lds.org',
+            login_url='https://signin.lds.org/login.html', transport=None,
+            lazy=False, validate=True):
+        """ Create a new session; raise ImportError if aiohttp is missing
+
+        Keyword arguments:
+        concurrency -- maximum number of requests in flight at once during
+                bulk operations (default: 8)
+        other arguments -- as for MinisteringSession; only the timeout,
+                pool_size and retry settings of transport are used
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncMinisteringSession requires aiohttp")
+        self._session = None
+        self._data = None
+        self._assignments = None
+        self._eligibles = None
+        self._dataset = None
+        self._stale = True
+        self._write_through = write_through
+        self._login_ttl = login_ttl
+        self._auto_relogin = auto_relogin
+        self._credentials = (None, None)
+        self._auth_checked_at = None
+        self._login_generation = 0
+        self._login_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lcr_url = lcr_url.rstrip('/')
+        self._login_url = login_url
+        self._transport = transport or Transport(pool_size=concurrency)
+        self._lazy = lazy
+        self._validate = validate
+        self.metrics = SessionMetrics()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """ Close the underlying HTTP session """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _new_session(self):
+        connect_timeout, read_timeout = self._transport.timeout
+        # unsafe keeps cookies set by IP hosts, such as a local test server
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._transport.pool_size),
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                sock_read=read_timeout),
+            headers={'Accept-Encoding': 'gzip, deflate'})
+
+    async def _request(self, method, phase, url, idempotent=None, stream=False,
+            **kwargs):
+        """ Send a request with the transport's retry policy; unless stream is
+        set, the body is read before returning. The caller must release a
+        streamed response. """
+        transport = self._transport
+        if idempotent is None:
+            idempotent = method in transport.IDEMPOTENT_METHODS
+        retry_status = transport.RETRY_STATUS if idempotent else transport.REJECTED_STATUS
+        attempt = 0
+        while True:
+            try:
+                r = await self._session.request(method.upper(), url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not idempotent or attempt >= transport.retries:
+                    raise
+                wait = transport.delay(attempt)
+            else:
+                if r.status not in retry_status or attempt >= transport.retries:
+                    if not stream:
+                        self.metrics.count_bytes(phase, len(await r.read()))
+                    self.metrics.count_status(phase, r.status)
+                    return r
+                wait = transport.delay(attempt, r)
+                r.release()
+            self.metrics.count_retry(phase)
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def login(self, username=None, password=None):
+        """ Login to lds.org and raise PermissionError if failed
+
+        Keyword arguments:
+        username -- lds.org username (default: prompt)
+        password -- lds.org password (default: prompt)
+        """
+        if username==None:
+            username = await asyncio.to_thread(input, 'Username: ')
+        if password==None:
+            password = await asyncio.to_thread(getpass.getpass, 'Password: ')
+
+        payload = {'username': username, 'password': password}
+        # log in on the open session, which replaces its cookies, so that
+        # requests already in flight keep their connections
+        if self._session is None:
+            self._session = self._new_session()
+        with self.metrics.time('login'):
+            r = await self._request('post', 'login', self._login_url, data=payload)
+        if not '<meta http-equiv="refresh"' in await r.text():
+            self._auth_checked_at = None
+            raise PermissionError("Login failed")
+        if self._auto_relogin:
+            self._credentials = (username, password)
+        self._auth_checked_at = time.monotonic()
+        self._login_generation += 1
+
+    async def check_login(self):
+        """ Check if currently logged in with access to the ministering
+        section, trusting a recent success as MinisteringSession does """
+        if self._session is None:
+            return False
+        if self._auth_checked_at is not None and \
+                time.monotonic() - self._auth_checked_at < self._login_ttl:
+            return True
+        url = self._lcr_url + "/services/umlu/v1/ministering/sandbox-data-full?lang=eng&type=EQ"
+        with self.metrics.time('check_login'):
+            r = await self._request('head', 'check_login', url)
+            if r.status in (405, 501):
+                r = await self._request('get', 'check_login', url, stream=True)
+                try:
+                    head = await r.content.read(1024)
+                finally:
+                    r.release()
+                logged_in = b"<!DOCTYPE" not in head
+            else:
+                logged_in = r.status == 200 and 'json' in r.content_type
+        if not logged_in:
+            self._auth_checked_at = None
+            return False
+        self._auth_checked_at = time.monotonic()
+        return True
+
+    async def _api_request(self, method, url, **kwargs):
+        """ Send a request to a ministering service endpoint, logging in again
+        and retrying once if the session has expired; return (status, text) """
+        generation = self._login_generation
+        for attempt in range(2):
+            with self.metrics.time(method):
+                r = await self._request(method, method, url, **kwargs)
+            text = await r.text()
+            if not (r.status == 200 and "<!DOCTYPE" in text):
+                self._auth_checked_at = time.monotonic()
+                break
+            self._auth_checked_at = None
+            if attempt == 0:
+                async with self._login_lock:
+                    if self._login_generation == generation:
+                        await self.login(*self._credentials)
+                self.metrics.count_retry(method)
+        return r.status, text
+
+    async def download_assignments(self, dataset='elders'):
+        """ Download ministering assignments from lds.org and populate
+        the structure from the selected dataset; raise ValueError if failed
+
+        Keyword arguments:
+        dataset -- dataset to populate (default: 'elders')
+        """
+        if not await self.check_login():
+            await self.login()
+
+        url = _assignments_url(self._lcr_url, dataset)
+
+        print("Downloading ministering assignments from", url)
+        with self.metrics.time('download'):
+            r = await self._request('get', 'download', url, stream=True)
+        # time waiting for the body apart from scanning and decoding it
+        transfer = 0.0
+        start = mark = time.perf_counter()
+        try:
+            scanner = _NextDataScanner()
+            done = False
+            async for chunk in r.content.iter_chunked(65536):
+                transfer += time.perf_counter() - mark
+                self.metrics.count_bytes('download', len(chunk))
+                if scanner.feed(chunk) and not done:
+                    done = True
+                    data = scanner.decode()
+                    if data is not None:
+                        break
+                mark = time.perf_counter()
+            else:
+                # page layout changed; fall back to searching the whole page
+                data = scanner.decode() if not done else None
+                if data is None:
+                    data = scanner.fallback()
+        finally:
+            r.release()
+        self.metrics.record('transfer', transfer)
+        self.metrics.record('extract', time.perf_counter() - start - transfer)
+        if data is None:
+            raise ValueError("Could not parse response from lds.org")
+
+        # parsing a large unit takes a while; keep the event loop responsive
+        with self.metrics.time('loads'):
+            assignments, eligibles = await asyncio.to_thread(_load_records,
+                    data, dataset, self._lazy)
+        self._data = data
+        self._assignments = assignments
+        self._eligibles = eligibles
+        self._dataset = dataset
+        self._stale = False
+
+    async def refresh(self):
+        """ Download the ministering assignments again """
+        await self.download_assignments(self._dataset or 'elders')
+
+    async def _ensure_loaded(self):
+        if self._stale or self._assignments is None:
+            await self.refresh()
+
     @property
-    def unassigned_households(self):
-        records = []
-        for record in self.eligibles.assignments:
-            assignments = self.assignments.get_assignments(id=record.id)
-            if len(assignments) == 0:
-                records.append(record)
-        return records
+    def assignments(self):
+        return self._assignments
 
     @property
-    def unassigned_ministers(self):
-        records = []
-        for record in self.eligibles.ministers:
-            ministers = self.assignments.get_ministers(id=record.id)
-            if len(ministers) == 0:
-                records.append(record)
-        return records
+    def eligibles(self):
+        return self._eligibles
+
+    def _written(self, apply):
+        if not self._write_through or self._assignments is None:
+            self._stale = True
+            return
+        try:
+            apply(self._assignments)
+        except ValueError:
+            self._stale = True
+
+    async def create_companionship(self, district, ministers, assignments=[]):
+        """ Create a new companionship; see MinisteringSession """
+        return await self.update_companionship(district, None, ministers,
+                assignments)
+
+    async def update_companionship(self, district, companionship, ministers,
+            assignments=[]):
+        """ Update an existing companionship; see MinisteringSession """
+        self._check_write(district, companionship, ministers, assignments)
+        return await self._put_companionship(district, companionship,
+                ministers, assignments)
+
+    async def _put_companionship(self, district, companionship, ministers,
+            assignments):
+        """ Send a companionship create or update without validating it """
+        uuid, data = _companionship_payload(district, companionship, ministers,
+                assignments)
+        url = self._lcr_url + '/services/umlu/v1/ministering/sandbox-companionship?lang=eng'
+        status, text = await self._api_request('put', url, json=data,
+                idempotent=uuid is not None)
+
+        good_code = 201 if uuid is None else 200
+        if status != good_code or 'assignmentErrors' in json.loads(text):
+            self._stale = True
+            raise ValueError((status, text))
+
+        if uuid is None:
+            response = json.loads(text)
+            if isinstance(response, dict):
+                uuid = response.get('uuid') or response.get('id')
+        if uuid is None:
+            self._stale = True
+        else:
+            self._written(lambda x: x.patch_companionship(
+                district.id, uuid, ministers, assignments))
+        return uuid
+
+    async def delete_companionship(self, companionship):
+        """ Delete an existing companionship; see MinisteringSession """
+        url = self._lcr_url + "/services/umlu/v1/ministering/sandbox-companionship/%s?lang=eng" % (
+                companionship.id)
+        status, text = await self._api_request('delete', url)
+        if status == 200:
+            raise PermissionError("Access denied (may need to log in again)")
+        elif status == 400:
+            raise ValueError("Companionship not found")
+        elif status != 204:
+            raise ValueError((status, text))
+        self._written(lambda x: x.remove_companionship(companionship.id))
+
+    async def apply_plan(self, plan):
+        """ Send the changes in a ChangePlan, one phase at a time with the
+        requests of each phase in flight together, and return a BulkResult;
+        raise ValidationError before sending anything if the plan fails
+        validate_plan (unless the session was created with validate=False) """
+        if self._validate:
+            self.validate_plan(plan)
+        actions = {
+            'create': lambda *a: self._put_companionship(a[0], None, *a[1:]),
+            'update': self._put_companionship,
+            'delete': self.delete_companionship}
+        items = {'create': lambda a: a, 'update': lambda a: a[1],
+                'delete': lambda a: a[0]}
+
+        async def run(action, args):
+            async with self._semaphore:
+                await actions[action](*args)
+
+        result = BulkResult()
+        for phase in plan.phases():
+            outcomes = await asyncio.gather(*[run(action, args)
+                    for action, args in phase], return_exceptions=True)
+            for (action, args), outcome in zip(phase, outcomes):
+                if isinstance(outcome, Exception):
+                    result.failed.append((items[action](args), outcome))
+                else:
+                    result.succeeded.append(items[action](args))
+        return result
+
+    async def delete_companionships(self, district, preview=False):
+        """ Delete all companionships in district; return a BulkResult, or the
+        ChangePlan if previewing """
+        await self._ensure_loaded()
+        plan = self.plan_delete_companionships(district)
+        return plan if preview else await self.apply_plan(plan)
+
+    async def copy_companionships(self, from_districts, to_district,
+            preview=False):
+        """ Copy companionships from from_districts to to_district; return a
+        BulkResult, or the ChangePlan if previewing """
+        await self._ensure_loaded()
+        plan = self.plan_copy_companionships(from_districts, to_district)
+        return plan if preview else await self.apply_plan(plan)
+
+    async def distribute_assignments(self, to_district,
+            eligible_assignments=None, preview=False, seed=None,
+            capacity=None, weight=None):
+        """ Distribute eligible assignees among companionships in to_district;
+        return a BulkResult, or the ChangePlan if previewing; see
+        MinisteringSession.distribute_assignments """
+        await self._ensure_loaded()
+        plan = self.plan_distribute_assignments(to_district,
+                eligible_assignments, seed=seed, capacity=capacity,
+                weight=weight)
+        return plan if preview else await self.apply_plan(plan)
+
+    async def optimize_assignments(self, districts, eligible_assignments=None,
+            exclusions=(), movable=False, capacity=None, seed=None,
+            preview=False):
+        """ Assign eligible households across several districts; return a
+        BulkResult, or the ChangePlan if previewing; see
+        MinisteringSession.optimize_assignments """
+        await self._ensure_loaded()
+        plan = self.plan_optimize_assignments(districts, eligible_assignments,
+                exclusions=exclusions, movable=movable, capacity=capacity,
+                seed=seed)
+        return plan if preview else await self.apply_plan(plan)
+
+    async def rebalance_district(self, district, spread=1, exclusions=(),
+            seed=None, preview=False):
+        """ Even out the loads of the companionships in district with the
+        fewest moves; return a BulkResult, or the ChangePlan if previewing;
+        see MinisteringSession.rebalance_district """
+        await self._ensure_loaded()
+        plan = self.plan_rebalance_district(district, spread=spread,
+                exclusions=exclusions, seed=seed)
+        return plan if preview else await self.apply_plan(plan)
+
+    def save_session(self, filename='ministering_session.json'):
+        """ Save the login cookies, in the same format as MinisteringSession """
+        with open(filename, 'w') as fp:
+            json.dump(dict([(x.key, x.value) for x in self._session.cookie_jar]), fp)
+
+    def load_session(self, filename='ministering_session.json'):
+        """ Load login cookies saved by either kind of session """
+        with open(filename, 'r') as fp:
+            cookies = json.load(fp)
+        self._session = self._new_session()
+        self._session.cookie_jar.update_cookies(cookies)
+        self._auth_checked_at = None
+
+
+def _find_district(assignments, name):
+    """ Return the district matching name: the one whose name equals it,
+    ignoring case, else the only one whose name contains it, else the best
+    fuzzy match; raise ValueError if there is none or the name is ambiguous """
+    wanted = name.lower()
+    for found in ([x for x in assignments.districts if x.name.lower() == wanted],
+            [x for x in assignments.districts if wanted in x.name.lower()]):
+        if len(found) == 1:
+            return found[0]
+        if len(found) > 1:
+            raise ValueError("District name %r is ambiguous: %s" % (name,
+                    ', '.join([x.name for x in found])))
+    matches = assignments.search_names(name, 'districts', limit=1)
+    if not matches:
+        raise ValueError("No district named %r" % name)
+    return matches[0][0]
+
+
+def _cli_login(ms, args):
+    """ Log in unless the session saved in --session is still valid, taking
+    credentials from LCR_USERNAME and LCR_PASSWORD if set, else prompting
+    when attached to a terminal; raise PermissionError otherwise """
+    if ms._session is None:
+        # loading cookies needs requests, which commands served from the
+        # cache never import
+        try:
+            ms.load_session(args.session)
+        except (OSError, ValueError):
+            pass
+    username = os.environ.get('LCR_USERNAME')
+    password = os.environ.get('LCR_PASSWORD')
+    if username is not None and password is not None:
+        # lets a session that expires part way through renew itself
+        ms._credentials = (username, password)
+    if ms.check_login():
+        return
+    if (username is None or password is None) and not sys.stdin.isatty():
+        raise PermissionError("Not logged in; run a command from a terminal "
+                "to log in, or set LCR_USERNAME and LCR_PASSWORD")
+    ms.login(username, password)
+
+
+def _cli_session(args, download=False):
+    """ Return a MinisteringSession for a command, loading the cached
+    snapshot if it is younger than --max-age, else downloading the data
+    and caching it """
+    ms = MinisteringSession(write_through=True, auto_relogin=True,
+            lcr_url=args.lcr_url, login_url=args.login_url)
+    if not download and not args.refresh:
+        try:
+            if time.time() - os.path.getmtime(args.snapshot) < args.max_age:
+                ms.load_snapshot(args.snapshot)
+                if ms._dataset == args.dataset:
+                    return ms
+        except (OSError, ValueError):
+            # missing, or written by another version; download it again
+            pass
+    _cli_login(ms, args)
+    ms.download_assignments(args.dataset)
+    ms.save_session(args.session)
+    ms.save_snapshot(args.snapshot)
+    return ms
+
+
+def _cli_people(records):
+    return [{'id': x.id, 'name': x.name} for x in records]
+
+
+def _cli_report(ms, district=None):
+    """ Return a JSON-serializable report of the loaded assignments """
+    assignments = ms.assignments
+    districts = [district] if district is not None else assignments.districts
+    report = {'dataset': ms._dataset, 'districts': []}
+    for d in districts:
+        loads = [len(c.assignments) for c in d.companionships]
+        entry = {
+            'id': d.id,
+            'name': d.name,
+            'supervisor': d.supervisor.name,
+            'companionships': len(loads),
+            'households': sum(loads),
+            'min_load': min(loads) if loads else 0,
+            'max_load': max(loads) if loads else 0}
+        if district is not None:
+            entry['companionships'] = [{'id': c.id,
+                    'ministers': _cli_people(c.ministers),
+                    'assignments': _cli_people(c.assignments)}
+                    for c in d.companionships]
+        report['districts'].append(entry)
+    report['unassigned_households'] = _cli_people(ms.unassigned_households)
+    report['unassigned_ministers'] = _cli_people(ms.unassigned_ministers)
+    return report
+
+
+def _print_report(report):
+    for d in report['districts']:
+        count = d['companionships'] if isinstance(d['companionships'], int) \
+                else len(d['companionships'])
+        print('%-30s %3d companionships %4d households (%d-%d each)' % (
+                d['name'], count, d['households'], d['min_load'], d['max_load']))
+        if not isinstance(d['companionships'], int):
+            for c in d['companionships']:
+                print('    %s: %s' % (' and '.join([x['name'] for x in c['ministers']]),
+                        '; '.join([x['name'] for x in c['assignments']])))
+    print('%d unassigned households, %d unassigned ministers' % (
+            len(report['unassigned_households']), len(report['unassigned_ministers'])))
+
+
+def _cli_write(ms, args, plan):
+    """ Send or preview plan for a write command; return (exit status,
+    JSON-serializable outcome) """
+    if args.dry_run:
+        return 0, {'plan': plan.to_dict()}
+    # the data may have come from the cache without logging in
+    _cli_login(ms, args)
+    ms.save_session(args.session)
+    result = ms.apply_plan(plan, args.workers, args.rate_limit, args.journal)
+    # keep the cache in step with the writes, or drop it if it may not be
+    if ms.stale:
+        with contextlib.suppress(OSError):
+            os.remove(args.snapshot)
+    else:
+        ms.save_snapshot(args.snapshot)
+    return 0 if result.ok else 1, {
+            'succeeded': len(result.succeeded),
+            'failed': [{'item': str(item), 'error': str(error)}
+                    for item, error in result.failed]}
+
+
+def main(argv=None):
+    """ Run the command line interface and return the exit status: 0 on
+    success, 1 if some writes failed, 2 for bad arguments or data, 3 if not
+    logged in, 4 for network or file errors
+
+    Commands work on a snapshot cached by the last download while it is
+    younger than --max-age, and download (and cache) the data otherwise.
+    With --json, the result is printed to standard output as JSON and
+    progress messages go to standard error.
+
+    Keyword arguments:
+    argv -- list of arguments (default: None, sys.argv[1:])
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='ministering_cli.py',
+            description="Automate the proposed ministering assignments on lds.org")
+    parser.add_argument('--json', action='store_true',
+            help='print machine-readable JSON output')
+    parser.add_argument('--dataset', default='elders', choices=sorted(DATASET_TYPES))
+    parser.add_argument('--session', default='ministering_session.json',
+            help='file holding the login cookies (default: %(default)s)')
+    parser.add_argument('--snapshot', default='ministering_data.snapshot',
+            help='cached data file (default: %(default)s)')
+    parser.add_argument('--max-age', type=float, default=3600,
+            help='seconds for which the cached data is used (default: %(default)s)')
+    parser.add_argument('--refresh', action='store_true',
+            help='download the data even if the cache is fresh')
+    parser.add_argument('--lcr-url', default='https://lcr.lds.org')
+    parser.add_argument('--login-url', default='https://signin.lds.org/login.html')
+
+    writes = argparse.ArgumentParser(add_help=False)
+    writes.add_argument('--dry-run', action='store_true',
+            help='print the planned changes without sending them')
+    writes.add_argument('--workers', type=int, default=None,
+            help='number of concurrent writers (default: serial)')
+    writes.add_argument('--rate-limit', type=float, default=None,
+            help='maximum requests per second')
+    writes.add_argument('--journal', default=None,
+            help='new journal file, for resuming after a failure')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('download', help='download and cache the data')
+    command = commands.add_parser('report', help='summarize the districts')
+    command.add_argument('district', nargs='?', help='list one district in full')
+    command = commands.add_parser('distribute', parents=[writes],
+            help='distribute unassigned households in a district')
+    command.add_argument('district')
+    command.add_argument('--seed', type=int, default=None)
+    command.add_argument('--capacity', type=int, default=None,
+            help='maximum households per companionship')
+    command = commands.add_parser('copy', parents=[writes],
+            help='copy the companionships of districts into another')
+    command.add_argument('districts', nargs='+')
+    command.add_argument('--to', required=True, help='district to copy into')
+    command = commands.add_parser('purge', parents=[writes],
+            help='delete every companionship in a district')
+    command.add_argument('district')
+    command.add_argument('--yes', action='store_true',
+            help='confirm the deletion')
+    args = parser.parse_args(argv)
+
+    # keep standard output for the result when it is JSON
+    output = sys.stderr if args.json else sys.stdout
+    status = 0
+    try:
+        with contextlib.redirect_stdout(output):
+            if args.command == 'purge' and not (args.yes or args.dry_run):
+                raise ValueError("purge deletes every companionship in the "
+                        "district; pass --yes or --dry-run")
+            ms = _cli_session(args, download=args.command == 'download')
+            assignments = ms.assignments
+            if args.command in ('download', 'report'):
+                district = None
+                if getattr(args, 'district', None):
+                    district = _find_district(assignments, args.district)
+                result = _cli_report(ms, district)
+            elif args.command == 'distribute':
+                plan = ms.plan_distribute_assignments(
+                        _find_district(assignments, args.district),
+                        seed=args.seed, capacity=args.capacity)
+                status, result = _cli_write(ms, args, plan)
+            elif args.command == 'copy':
+                plan = ms.plan_copy_companionships(
+                        [_find_district(assignments, x) for x in args.districts],
+                        _find_district(assignments, args.to))
+                status, result = _cli_write(ms, args, plan)
+            else:
+                plan = ms.plan_delete_companionships(
+                        _find_district(assignments, args.district))
+                status, result = _cli_write(ms, args, plan)
+    except PermissionError as e:
+        status, result = 3, {'error': str(e)}
+    except EOFError:
+        # an expired session asked for credentials with no terminal attached
+        status, result = 3, {'error': "Session expired; run a command from a "
+                "terminal to log in, or set LCR_USERNAME and LCR_PASSWORD"}
+    except ValueError as e:
+        status, result = 2, {'error': str(e)}
+    except (OSError, requests.exceptions.RequestException) as e:
+        # FileExistsError from --journal, unreadable files, network failures
+        status, result = 4, {'error': str(e)}
+
+    if args.json:
+        print(json.dumps(result))
+    elif 'error' in result:
+        print('Error:', result['error'], file=sys.stderr)
+    elif 'districts' in result:
+        _print_report(result)
+    elif 'failed' in result:
+        print('%d succeeded, %d failed' % (result['succeeded'], len(result['failed'])))
+        for x in result['failed']:
+            print('Failed: %s: %s' % (x['item'], x['error']))
+    return status
+
 
 if __name__ == '__main__':
+    # work with the classes of the importable module, so that snapshots
+    # written here name ministering's classes rather than __main__'s, and
+    # records loaded from them are instances of the names used in the session
+    import ministering
+    globals().update((k, v) for k, v in vars(ministering).items()
+            if not k.startswith('__'))
+
+    if len(sys.argv) > 1:
+        # kept for compatibility; ministering_cli.py starts faster, as this
+        # file is compiled from source whenever it is run as a script
+        sys.exit(main())
+
     # initialize session
     ms = MinisteringSession()
 
-    # load previous session and data from disk
+    # load previous session and data from disk, preferring a snapshot that
+    # is at least as new as the JSON data
     ms.load_session()
-    ms.load_data()
+    snapshot, data = 'ministering_data.snapshot', 'ministering_data.json'
+    try:
+        if os.path.exists(data) and \
+                os.path.getmtime(snapshot) < os.path.getmtime(data):
+            raise ValueError("Snapshot is out of date")
+        ms.load_snapshot(snapshot)
+    except (OSError, ValueError):
+        ms.load_data(data)
+        ms.save_snapshot(snapshot)
 
@@ -0,0 +1,12 @@
+""" Command line interface to the ministering module
+
+Runs `ministering.main` from the imported module, whose compiled bytecode is
+cached, instead of compiling ministering.py on every run as `python -m
+ministering` does. See `python ministering_cli.py --help`.
+"""
+import sys
+
+from ministering import main
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+""" Fixtures serving synthetic ward data from the mock LCR server in
+benchmarks/, so that the tests run without lds.org """
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+from ministering import MinisteringSession, Transport
+from mock_lcr import MockLCRServer
+from synthetic import SCALES, synthetic_data
+
+
+@pytest.fixture
+def data():
+    return synthetic_data(*SCALES['ward'])
+
+
+@pytest.fixture
+def server(data):
+    pytest.importorskip('requests')
+    with MockLCRServer(data) as server:
+        yield server
+
+
+def new_session(server, **kwargs):
+    """ Return a MinisteringSession logged in to server """
+    kwargs.setdefault('transport', Transport(backoff=0.01))
+    ms = MinisteringSession(lcr_url=server.url, login_url=server.login_url,
+            **kwargs)
+    ms.login('user', 'password')
+    return ms
+
+
+@pytest.fixture
+def session(server):
+    ms = new_session(server, write_through=True)
+    ms.download_assignments()
+    return ms
+
+
+def state(assignments):
+    """ Return the companionships of assignments as a dict mapping uuid to
+    (district uuid, minister uuids, household uuids) """
+    return dict((c.id, (assignments.get_district_of(c.id).id,
+            frozenset([x.id for x in c.ministers]),
+            frozenset([x.id for x in c.assignments])))
+            for c in assignments.companionships)
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from ministering import AsyncMinisteringSession, ChangePlan
+from conftest import new_session, state
+
+aiohttp = pytest.importorskip('aiohttp')
+
+
+def run(server, steps, **kwargs):
+    """ Run the coroutine function steps with an AsyncMinisteringSession
+    logged in to server, and return its result """
+    async def main():
+        async with AsyncMinisteringSession(lcr_url=server.url,
+                login_url=server.login_url, **kwargs) as ms:
+            await ms.login('user', 'password')
+            return await steps(ms)
+    return asyncio.run(main())
+
+
+def test_async_download_matches_session(server):
+    async def steps(ms):
+        await ms.download_assignments()
+        return state(ms.assignments), len(ms.unassigned_households)
+    ms = new_session(server)
+    assert run(server, steps) == (state(ms.assignments),
+            len(ms.unassigned_households))
+
+
+def test_async_bulk_writes(server):
+    async def steps(ms):
+        await ms.download_assignments()
+        districts = ms.assignments.districts
+        copied = await ms.copy_companionships(districts[:1], districts[1])
+        distributed = await ms.distribute_assignments(districts[2], seed=1)
+        deleted = await ms.delete_companionships(districts[3])
+        written = state(ms.assignments)
+        await ms.refresh()
+        return copied, distributed, deleted, written, state(ms.assignments)
+    server.latency = 0.005
+    copied, distributed, deleted, written, downloaded = run(server, steps,
+            write_through=True)
+    assert copied.ok and distributed.ok and deleted.ok
+    assert len(copied.succeeded) == 12 and len(deleted.succeeded) == 12
+    assert written == downloaded
+    # only the households of the deleted district are unassigned again
+    assert len(new_session(server).unassigned_households) == \
+            len(set([x.id for c in deleted.succeeded for x in c.assignments]))
+
+
+def test_async_relogin_after_expiry(server):
+    """ Requests made after the login cookie is lost log in again once and
+    are retried, instead of failing """
+    async def steps(ms):
+        await ms.download_assignments()
+        plan = ChangePlan(ms.assignments)
+        for district in ms.assignments.districts[:2]:
+            for companionship in district.companionships:
+                plan.update(companionship, assignments=[])
+        ms._session.cookie_jar.clear()
+        generation = ms._login_generation
+        result = await ms.apply_plan(plan)
+        return result, len(plan), ms._login_generation - generation
+    result, count, logins = run(server, steps, auto_relogin=True)
+    assert result.ok and len(result.succeeded) == count > 0
+    assert logins == 1
+    ms = new_session(server)
+    for district in ms.assignments.districts[:2]:
+        assert [c.assignments for c in district.companionships] == \
+                [[]] * len(district.companionships)
+
+
+def test_async_check_login(server, tmp_path):
+    filename = str(tmp_path / 'session.json')
+    async def steps(ms):
+        ms.save_session(filename)
+        return await ms.check_login()
+    assert run(server, steps)
+
+    async def check(cookies):
+        async with AsyncMinisteringSession(lcr_url=server.url,
+                login_url=server.login_url) as ms:
+            if cookies:
+                ms.load_session(filename)
+            else:
+                ms._session = ms._new_session()
+            return await ms.check_login()
+    assert asyncio.run(check(True))
+    assert not asyncio.run(check(False))
@@ -0,0 +1,74 @@
+import pytest
+
+from ministering import Companionship, Person, balance_assignments
+from conftest import state
+
+
+def people(prefix, count):
+    return [Person('%s-%d' % (prefix, n), n, '%s %d' % (prefix, n))
+            for n in range(count)]
+
+
+def companionship(n, households=(), ministers=None):
+    if ministers is None:
+        ministers = people('minister-%d' % n, 2)
+    return Companionship('companionship-%d' % n, 'Companionship %d' % n,
+            ministers, list(households))
+
+
+def test_balance_fills_lightest_first():
+    companionships = [companionship(0, people('old', 4)), companionship(1),
+            companionship(2, people('older', 1))]
+    households = people('household', 5)
+    new, unplaced = balance_assignments(companionships, households, seed=1)
+    assert unplaced == []
+    assert sorted([len(x) for x in new.values()]) == [3, 3, 4]
+    # existing households stay where they are
+    assert new['companionship-0'][:4] == companionships[0].assignments
+    placed = [x.id for c in new.values() for x in c]
+    assert sorted(placed) == sorted([x.id for c in companionships
+            for x in c.assignments] + [x.id for x in households])
+
+
+def test_balance_uses_weights_and_capacity():
+    companionships = [companionship(n) for n in range(3)]
+    households = people('household', 6)
+    size = dict([(x.id, 4 if x is households[0] else 1) for x in households])
+    new, unplaced = balance_assignments(companionships, households, seed=2,
+            weight=lambda x: size[x.id])
+    loads = sorted([sum([size[x.id] for x in c]) for c in new.values()])
+    assert loads == [2, 3, 4]
+
+    new, unplaced = balance_assignments(companionships, households, seed=2,
+            capacity={'companionship-0': 1, 'companionship-1': 1,
+                'companionship-2': 2})
+    assert [len(x) for x in new.values()] == [1, 1, 2]
+    assert len(unplaced) == 2
+
+
+def test_balance_never_assigns_ministers_to_themselves():
+    ministers = people('minister', 2)
+    companionships = [companionship(0, ministers=ministers), companionship(1)]
+    new, unplaced = balance_assignments(companionships, ministers, seed=3)
+    assert new['companionship-0'] == [] and len(new['companionship-1']) == 2
+
+    with pytest.raises(ValueError):
+        balance_assignments(companionships[:1], ministers[:1])
+
+
+def test_distribute_assignments(session):
+    district = session.assignments.districts[2]
+    households = session.unassigned_households
+    before = state(session.assignments)
+    result = session.distribute_assignments(district, seed=4)
+    assert result.ok
+
+    session.refresh()
+    after = state(session.assignments)
+    loads = [len(after[c.id][2]) for c in district.companionships]
+    assert max(loads) - min(loads) <= 1
+    assert session.unassigned_households == []
+    for c in district.companionships:
+        assert before[c.id][2] <= after[c.id][2]
+    assert sum(loads) == sum([len(before[c.id][2])
+            for c in district.companionships]) + len(households)
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from ministering import main
+from conftest import ROOT
+
+
+@pytest.fixture
+def cli(server, tmp_path, monkeypatch, capsys):
+    """ Return a function running a command in tmp_path against server and
+    returning (exit status, JSON result) """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LCR_USERNAME', 'user')
+    monkeypatch.setenv('LCR_PASSWORD', 'password')
+    def run(*argv):
+        capsys.readouterr()
+        status = main(['--json', '--lcr-url', server.url, '--login-url',
+                server.login_url] + list(argv))
+        return status, json.loads(capsys.readouterr().out)
+    return run
+
+
+def test_report_from_cache(cli, server):
+    status, downloaded = cli('download')
+    assert status == 0 and len(downloaded['districts']) == 6
+    sent = server.requests
+    assert cli('report') == (0, downloaded)
+    assert server.requests == sent
+
+
+def test_write_from_cached_snapshot(cli, server):
+    """ A write served from the cache logs in first, and the cache it
+    leaves behind matches the server """
+    assert cli('download')[0] == 0
+    os.remove('ministering_session.json')
+    status, result = cli('distribute', 'district 1', '--seed', '1')
+    assert status == 0 and result['succeeded'] > 0 and result['failed'] == []
+    assert os.path.exists('ministering_session.json')
+
+    cached = cli('report', 'District 1')[1]
+    assert cli('--refresh', 'report', 'District 1')[1] == cached
+
+
+def test_errors_give_exit_status(cli, monkeypatch):
+    assert cli('download')[0] == 0
+    assert cli('purge', 'District 2')[0] == 2
+    assert cli('report', 'no such district')[0] == 2
+    open('existing.journal', 'w').close()
+    assert cli('purge', 'District 2', '--yes', '--journal', 'existing.journal')[0] == 4
+
+    os.remove('ministering_session.json')
+    monkeypatch.delenv('LCR_USERNAME')
+    monkeypatch.setattr('sys.stdin.isatty', lambda: False)
+    assert cli('--refresh', 'report')[0] == 3
+
+
+def test_report_from_cache_skips_network_libraries(cli, tmp_path):
+    assert cli('download')[0] == 0
+    assert os.path.exists('ministering_session.json')
+    check = ('import json, sys, ministering\n'
+            'ministering.main(["--json", "report"])\n'
+            'print(json.dumps("requests" in sys.modules))')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + sys.path))
+    out = subprocess.run([sys.executable, '-c', check], cwd=str(tmp_path),
+            env=env, check=True, capture_output=True, text=True).stdout
+    assert json.loads(out.splitlines()[-1]) is False
+
+
+def test_unreadable_snapshot_is_downloaded_again(cli, server, monkeypatch):
+    with open('ministering_data.snapshot', 'wb') as fp:
+        fp.write(b'not a snapshot')
+    status, result = cli('report')
+    assert status == 0 and len(result['districts']) == 6
+
+    with open('ministering_data.snapshot', 'wb') as fp:
+        fp.write(b'not a snapshot')
+    os.remove('ministering_session.json')
+    monkeypatch.delenv('LCR_USERNAME')
+    monkeypatch.setattr('sys.stdin.isatty', lambda: False)
+    assert cli('report')[0] == 3
@@ -0,0 +1,79 @@
+import copy
+import json
+
+from ministering import (CHANGE_KINDS, MinisteringAssignments, dump_snapshot,
+        diff_assignments, diff_snapshots, summarize_changes)
+
+
+def changed(data):
+    """ Return a copy of data with one change of each kind, and the ids of
+    the records each kind should report """
+    data = copy.deepcopy(data)
+    districts = data['elders']
+    expected = dict([(x, set()) for x in CHANGE_KINDS])
+
+    added = copy.deepcopy(districts[5])
+    added.update(districtUuid='new-district', companionships=[])
+    districts.append(added)
+    expected['district_added'].add('new-district')
+    removed = districts.pop(4)
+    expected['district_removed'].add(removed['districtUuid'])
+    for c in removed['companionships']:
+        expected['companionship_removed'].add(c['id'])
+        expected['household_unassigned'].update([x['personUuid']
+                for x in c['assignments']])
+
+    districts[0]['supervisorPersonUuid'] = 'new-supervisor'
+    expected['supervisor_changed'].add(districts[0]['districtUuid'])
+
+    first, second, third = [c for c in districts[1]['companionships']
+            if len(c['assignments']) > 1][:3]
+    moved = first['assignments'].pop()
+    second['assignments'].append(moved)
+    expected['household_moved'].add(moved['personUuid'])
+    dropped = first['assignments'].pop()
+    expected['household_unassigned'].add(dropped['personUuid'])
+    third['ministers'][1] = second['ministers'][0]
+    expected['ministers_changed'].add(third['id'])
+
+    districts[1]['companionships'].remove(second)
+    districts[2]['companionships'].append(second)
+    expected['companionship_moved'].add(second['id'])
+    # eligible households with no companionship come last
+    unassigned = data['eligibleMinistersAndAssignments']['eligibleAssignments'][-1]
+    new = copy.deepcopy(third)
+    new.update(id='new-companionship', assignments=[unassigned])
+    districts[3]['companionships'].append(new)
+    expected['companionship_added'].add('new-companionship')
+    expected['household_assigned'].update([x['personUuid']
+            for x in new['assignments']])
+    return data, expected
+
+
+def test_diff_reports_each_kind(data):
+    new_data, expected = changed(data)
+    old = MinisteringAssignments(data)
+    new = MinisteringAssignments(new_data)
+    assert all(expected.values())
+    changes = list(diff_assignments(old, new))
+    found = dict([(x, set()) for x in CHANGE_KINDS])
+    for change in changes:
+        found[change.kind].add(change.record.id)
+    assert found == expected
+    assert summarize_changes(changes) == dict([(x, len(expected[x]))
+            for x in CHANGE_KINDS])
+    json.dumps([x.to_dict() for x in changes])
+
+    assert list(diff_assignments(old, MinisteringAssignments(data))) == []
+
+
+def test_diff_snapshots_reads_json_and_snapshots(data, tmp_path):
+    new_data, expected = changed(data)
+    old_filename = str(tmp_path / 'old.json')
+    new_filename = str(tmp_path / 'new.snapshot')
+    with open(old_filename, 'w') as fp:
+        json.dump(data, fp)
+    dump_snapshot((new_data, 'elders', MinisteringAssignments(new_data), None),
+            new_filename)
+    counts = summarize_changes(diff_snapshots(old_filename, new_filename))
+    assert counts == dict([(x, len(expected[x])) for x in CHANGE_KINDS])
@@ -0,0 +1,73 @@
+import pytest
+
+import ministering
+from ministering import District, LoadTable, MinisteringAssignments, Person
+from test_balance import companionship, people
+
+
+@pytest.fixture(params=['lists', 'numpy'])
+def backend(request, monkeypatch):
+    """ Run a test with the pure Python columns and, if installed, numpy """
+    if request.param == 'numpy':
+        monkeypatch.setattr(ministering, 'numpy', pytest.importorskip('numpy'))
+    else:
+        monkeypatch.setattr(ministering, 'numpy', None)
+    return request.param
+
+
+def districts():
+    """ Two districts under one supervisor and one under another, with
+    companionship loads 0, 2, 4 | 3 | 1, 1; the last household of the first
+    district is shared with the second """
+    boss, other = Person('boss', 1, 'Boss'), Person('other', 2, 'Other')
+    shared = people('shared', 1)
+    return [District('d0', 'District 0', boss, [companionship(0),
+                companionship(1, people('a', 2)),
+                companionship(2, people('b', 3) + shared)]),
+            District('d1', 'District 1', boss, [companionship(3,
+                people('c', 2) + shared)]),
+            District('d2', 'District 2', other, [companionship(4, people('d', 1)),
+                companionship(5, people('e', 1))])]
+
+
+def test_load_groups(backend):
+    table = LoadTable(districts())
+    assert len(table.households) == 10
+    assert table.loads() == dict([('companionship-%d' % n, x)
+            for n, x in enumerate([0, 2, 4, 3, 1, 1])])
+    assert table.loads('district') == {'d0': 6, 'd1': 3, 'd2': 2}
+    assert table.loads('supervisor') == {'boss': 9, 'other': 2}
+    assert table.distribution() == {0: 1, 1: 2, 2: 1, 3: 1, 4: 1}
+    with pytest.raises(ValueError):
+        table.loads('ward')
+
+
+def test_load_summary(backend):
+    table = LoadTable(districts())
+    first, second, third = table.summary()
+    assert (first.companionships, first.households, first.total) == (3, 6, 6)
+    assert (first.min, first.max, first.spread, first.mean) == (0, 4, 4, 2)
+    assert first.std == pytest.approx((8 / 3) ** 0.5)
+    assert first.gini == pytest.approx(4 / 9)
+    assert (third.std, third.gini, third.cv) == (0, 0, 0)
+    boss = table.summary('supervisor')[0]
+    assert (boss.record.id, boss.companionships, boss.total) == ('boss', 4, 9)
+
+    overall = table.overall()
+    assert (overall.companionships, overall.households, overall.total) == (6, 11, 11)
+    assert overall.to_dict()['max'] == 4
+    assert table.summary('companionship')[2].to_dict()['total'] == 4
+
+
+def test_load_weights_and_uncovered(backend, data):
+    table = LoadTable(districts(), weight=lambda x: 2 if x.id == 'shared-0' else 1)
+    assert table.loads('district') == {'d0': 7, 'd1': 4, 'd2': 2}
+    assert table.summary()[0].households == 6
+
+    assignments = MinisteringAssignments(data)
+    table = LoadTable(assignments.districts)
+    assert table.loads() == dict([(c.id, len(c.assignments))
+            for c in assignments.companionships])
+    eligible = data['eligibleMinistersAndAssignments']['eligibleAssignments']
+    assert len(table.uncovered([Person(x['personUuid'], x['legacyCmisId'])
+            for x in eligible])) == 40
@@ -0,0 +1,29 @@
+import time
+
+from ministering import SessionMetrics, _Transfer
+
+
+def slow_chunks(count, delay):
+    for _ in range(count):
+        time.sleep(delay)
+        yield b'x' * 100
+
+
+def test_transfer_times_waiting_only():
+    metrics = SessionMetrics()
+    body = _Transfer(slow_chunks(5, 0.02), metrics, 'download')
+    for chunk in body:
+        # time spent by the consumer is not transfer time
+        time.sleep(0.02)
+    assert 0.1 <= body.seconds < 0.18
+    assert metrics.snapshot()['bytes'] == {'download': 500}
+
+
+def test_download_phases(session):
+    session.metrics.reset()
+    session.refresh()
+    phases = session.metrics.snapshot()['phases']
+    for phase in ('download', 'transfer', 'extract', 'loads'):
+        assert phases[phase]['count'] == 1
+    assert session.metrics.snapshot()['bytes']['download'] > 0
+
@@ -0,0 +1,71 @@
+from ministering import optimize_assignments
+from conftest import state
+from test_balance import companionship, people
+
+
+def loads(new_assignments):
+    return sorted([len(x) for x in new_assignments.values()])
+
+
+def test_optimize_evens_loads():
+    companionships = [companionship(0, people('old', 3)), companionship(1),
+            companionship(2)]
+    new, unplaced = optimize_assignments(companionships, people('household', 6),
+            seed=1)
+    assert unplaced == [] and loads(new) == [3, 3, 3]
+    assert new['companionship-0'] == companionships[0].assignments
+
+
+def test_optimize_displaces_to_honor_exclusions():
+    """ A household that may only go to one companionship displaces one
+    placed there earlier, rather than making the loads uneven """
+    companionships = [companionship(0), companionship(1)]
+    households = people('household', 4)
+    exclusions = [(households[0].id, 'companionship-1'),
+            (households[1].id, 'companionship-1')]
+    for seed in range(5):
+        new, unplaced = optimize_assignments(companionships, households,
+                exclusions=exclusions, seed=seed)
+        assert unplaced == [] and loads(new) == [2, 2]
+        assert set([x.id for x in new['companionship-0']]) == \
+                set([households[0].id, households[1].id])
+
+
+def test_optimize_moves_existing_only_when_movable():
+    companionships = [companionship(0, people('old', 6)), companionship(1)]
+    new, unplaced = optimize_assignments(companionships, [], seed=2)
+    assert loads(new) == [0, 6]
+    new, unplaced = optimize_assignments(companionships, [], movable=True,
+            seed=2)
+    assert loads(new) == [3, 3]
+
+
+def test_optimize_capacity_and_own_companionship():
+    ministers = people('minister', 2)
+    companionships = [companionship(0, ministers=ministers), companionship(1)]
+    households = people('household', 2)
+    new, unplaced = optimize_assignments(companionships, ministers + households,
+            seed=3)
+    assert unplaced == []
+    assert set(new['companionship-1']) == set(ministers)
+    assert set(new['companionship-0']) == set(households)
+
+    new, unplaced = optimize_assignments(companionships, ministers + households,
+            capacity=1, seed=3)
+    assert loads(new) == [1, 1] and len(unplaced) == 2
+    assert new['companionship-1'][0] in ministers
+
+
+def test_optimize_across_districts(session):
+    districts = session.assignments.districts[:3]
+    ids = [c.id for d in districts for c in d.companionships]
+    before = state(session.assignments)
+    assert session.optimize_assignments(districts, seed=4).ok
+
+    session.refresh()
+    after = state(session.assignments)
+    assert session.unassigned_households == []
+    assert dict([(x, before[x]) for x in before if x not in ids]) == \
+            dict([(x, after[x]) for x in after if x not in ids])
+    placed = sum([len(after[x][2]) - len(before[x][2]) for x in ids])
+    assert placed == 40
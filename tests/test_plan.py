@@ -0,0 +1,140 @@
+import json
+import time
+
+import pytest
+
+from ministering import BulkJournal, ChangePlan, MinisteringAssignments, Transport
+from conftest import new_session, state
+
+
+def test_plan_collapses_changes(data):
+    current = MinisteringAssignments(data)
+    first, second, third = current.districts[0].companionships[:3]
+    plan = ChangePlan(current)
+    plan.update(first, assignments=[])
+    plan.delete(first)
+    plan.update(second, assignments=[])
+    plan.update(second, assignments=second.assignments)
+    plan.update(third, assignments=[])
+    plan.update(third, ministers=third.ministers[:1])
+
+    assert plan.deletes == [first]
+    assert [(c, m, a) for d, c, m, a in plan.updates] == \
+            [(third, third.ministers[:1], [])]
+    assert len(plan) == 2
+
+
+def test_plan_dict_round_trip(data):
+    current = MinisteringAssignments(data)
+    district = current.districts[1]
+    first, second = district.companionships[:2]
+    plan = ChangePlan(current)
+    plan.delete(first)
+    plan.update(second, assignments=first.assignments, district=current.districts[2])
+    plan.create(district, first.ministers, second.assignments)
+
+    restored = ChangePlan.from_dict(current, json.loads(json.dumps(plan.to_dict())))
+    assert restored.to_dict() == plan.to_dict()
+    assert [[x[0] for x in phase] for phase in restored.phases()] == \
+            [['delete'], ['update'], ['create']]
+
+
+def test_plan_from_dict_needs_current_companionships(data):
+    current = MinisteringAssignments(data)
+    plan = ChangePlan(current).delete(current.companionships[0])
+    current.remove_companionship(current.companionships[0].id)
+    with pytest.raises(ValueError):
+        ChangePlan.from_dict(current, plan.to_dict())
+
+
+def test_resume_finishes_journal(session, server, tmp_path):
+    """ A copy stopped by a rejected write is finished by resume_plan """
+    journal = str(tmp_path / 'copy.journal')
+    source, target = session.assignments.districts[:2]
+    before = state(session.assignments)
+    put = server.put_companionship
+    calls = []
+    def flaky(body):
+        calls.append(body)
+        if len(calls) == 5:
+            raise KeyError('rejected')
+        return put(body)
+    server.put_companionship = flaky
+    with pytest.raises(ValueError):
+        session.copy_companionships([source], target, journal=journal)
+    server.put_companionship = put
+
+    session.refresh()
+    result = session.resume_plan(journal)
+    assert result.ok and BulkJournal(journal).complete
+    session.refresh()
+    assert len(state(session.assignments)) == len(before) + len(source.companionships)
+
+    sent = server.requests
+    assert session.resume_plan(journal).succeeded == []
+    assert server.requests == sent
+
+
+def test_resume_after_timeout_creates_once(session, server, tmp_path):
+    """ A create that timed out on the client but reached the server is
+    matched by its ministers instead of being sent again """
+    requests = pytest.importorskip('requests')
+    journal = str(tmp_path / 'copy.journal')
+    source, target = session.assignments.districts[:2]
+    count = len(session.assignments.companionships)
+    put = server.put_companionship
+    calls = []
+    def slow(body):
+        calls.append(body)
+        if len(calls) == 3:
+            time.sleep(0.6)
+        return put(body)
+    server.put_companionship = slow
+    session._transport = Transport(read_timeout=0.3)
+    with pytest.raises(requests.exceptions.Timeout):
+        session.copy_companionships([source], target, journal=journal)
+    session._transport = Transport()
+    # let the server finish the create the client gave up on
+    time.sleep(0.5)
+
+    session.refresh()
+    assert session.resume_plan(journal).ok
+    session.refresh()
+    assert len(session.assignments.companionships) == count + len(source.companionships)
+
+
+def reject_put(server, calls):
+    """ Make the server reject the PUT requests numbered in calls (from 1) """
+    put = server.put_companionship
+    sent = []
+    def flaky(body):
+        sent.append(body)
+        if len(sent) in calls:
+            raise KeyError('rejected')
+        return put(body)
+    server.put_companionship = flaky
+
+
+@pytest.mark.parametrize('copies', [1, 2])
+def test_resume_creates_duplicates_once_each(server, tmp_path, copies):
+    """ Without validation, a plan may create companionships whose ministers
+    match an existing one, or each other; each rejected create is sent again
+    rather than matched to one of those """
+    ms = new_session(server, write_through=True, validate=False)
+    district = ms.assignments.districts[0]
+    ministers = district.companionships[0].ministers if copies == 1 else \
+            ms.assignments.districts[1].companionships[0].ministers
+    plan = ChangePlan(ms.assignments)
+    for _ in range(copies):
+        plan.create(district, ministers)
+    journal = str(tmp_path / 'create.journal')
+    reject_put(server, [copies])
+    with pytest.raises(ValueError):
+        ms.apply_plan(plan, journal=journal)
+
+    ms.refresh()
+    assert ms.resume_plan(journal).ok and BulkJournal(journal).complete
+    ms.refresh()
+    matching = [c for c in ms.assignments.districts[0].companionships
+            if set([x.id for x in c.ministers]) == set([x.id for x in ministers])]
+    assert len(matching) == 2
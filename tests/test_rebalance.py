@@ -0,0 +1,61 @@
+import pytest
+
+from ministering import rebalance_assignments
+from conftest import state
+from test_balance import companionship, people
+
+
+def moves(companionships, new_assignments):
+    return sum([len(set(new_assignments[c.id]) - set(c.assignments))
+            for c in companionships])
+
+
+def test_rebalance_uses_fewest_moves():
+    companionships = [companionship(0, people('a', 7)),
+            companionship(1, people('b', 3)), companionship(2, people('c', 2))]
+    new = rebalance_assignments(companionships, seed=1)
+    assert sorted([len(x) for x in new.values()]) == [4, 4, 4]
+    assert moves(companionships, new) == 3
+
+    new = rebalance_assignments(companionships, spread=3, seed=1)
+    assert sorted([len(x) for x in new.values()]) == [3, 3, 6]
+    assert moves(companionships, new) == 1
+
+    balanced = rebalance_assignments(companionships, spread=5)
+    assert balanced == dict([(c.id, c.assignments) for c in companionships])
+
+
+def test_rebalance_honors_exclusions():
+    households = people('a', 4)
+    companionships = [companionship(0, households), companionship(1),
+            companionship(2, ministers=households[:2])]
+    exclusions = [(households[2].id, 'companionship-1')]
+    for seed in range(5):
+        new = rebalance_assignments(companionships, exclusions=exclusions,
+                seed=seed)
+        assert sorted([len(x) for x in new.values()]) == [1, 1, 2]
+        assert households[2] not in new['companionship-1']
+        assert not set(households[:2]) & set(new['companionship-2'])
+
+    with pytest.raises(ValueError):
+        rebalance_assignments([companionship(0, households[:2]),
+                companionships[2]])
+
+
+def test_rebalance_district(session):
+    district = session.assignments.districts[1]
+    before = state(session.assignments)
+    plan = session.rebalance_district(district, seed=2, preview=True)
+    assert len(plan) > 0
+    assert session.rebalance_district(district, seed=2).ok
+
+    session.refresh()
+    after = state(session.assignments)
+    loads = [len(after[c.id][2]) for c in district.companionships]
+    assert max(loads) - min(loads) <= 1
+    assert set([x for c in district.companionships for x in after[c.id][2]]) == \
+            set([x for c in district.companionships for x in before[c.id][2]])
+    # only the companionships in the plan change
+    changed = [x for x in after if after[x] != before[x]]
+    assert len(changed) == len(plan)
+    assert set(changed) <= set([c.id for c in district.companionships])
@@ -0,0 +1,53 @@
+import copy
+
+import pytest
+
+from ministering import (MinisteringAssignments, MinisteringEligible,
+        PersonRegistry)
+
+
+@pytest.fixture
+def supervising(data):
+    """ data in which a minister with an email, from the second district,
+    also supervises the first """
+    data = copy.deepcopy(data)
+    districts = data['elders']
+    minister = [x for c in districts[1]['companionships'] for x in c['ministers']
+            if x.get('email')][0]
+    districts[0].update(supervisorPersonUuid=minister['personUuid'],
+            supervisorLegacyCmisId=minister['legacyCmisId'],
+            supervisorName=minister['name'])
+    return data, minister
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_supervisor_keeps_minister_email(supervising, lazy):
+    data, minister = supervising
+    assignments = MinisteringAssignments(data, lazy=lazy)
+    # the supervisor record, which has no email, is created first
+    supervisor = assignments.districts[0].supervisor
+    person = assignments.get_ministers(id=minister['personUuid'])[0]
+    assert person is supervisor
+    assert person.email == minister['email']
+
+
+def test_registry_shares_people(data):
+    registry = PersonRegistry()
+    eligibles = MinisteringEligible(data, registry=registry)
+    assignments = MinisteringAssignments(data, registry=registry)
+    for person in assignments.ministers[:10] + assignments.assignments[:10]:
+        found = eligibles.get_ministers(id=person.id) or \
+                eligibles.get_assignments(id=person.id)
+        assert found[0] is person
+    assert len(registry) == len(set([x.id for x in eligibles.ministers +
+            eligibles.assignments + [d.supervisor for d in assignments.districts]]))
+
+
+def test_registry_fills_missing_fields():
+    registry = PersonRegistry()
+    first = registry.person('uuid', 1, 'Smith, John')
+    assert registry.record({'personUuid': 'uuid', 'legacyCmisId': 1,
+            'name': 'Smith, John', 'email': 'john@example.org'}) is first
+    assert first.email == 'john@example.org'
+    registry.person('uuid', 1, 'Smith, J.', 'other@example.org')
+    assert (first.name, first.email) == ('Smith, John', 'john@example.org')
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+import ministering
+from ministering import MinisteringAssignments
+from conftest import new_session, state
+
+
+def test_write_through_matches_refresh(session):
+    """ Writes patched into the loaded data agree with a fresh download """
+    districts = session.assignments.districts
+    full = [c for c in districts[0].companionships if len(c.assignments) > 1]
+    moved = full[0].assignments[-1]
+    session.update_companionship(districts[0], full[0], full[0].ministers,
+            full[0].assignments[:-1])
+    session.delete_companionship(districts[1].companionships[0])
+    session.create_companionship(districts[1], full[1].ministers, [moved])
+    assert not session.stale
+
+    patched = state(session.assignments)
+    session.refresh()
+    assert state(session.assignments) == patched
+
+
+def test_write_during_download_leaves_data_stale(session, monkeypatch):
+    """ A write made while a refresh is parsing is not lost by its swap """
+    district = session.assignments.districts[0]
+    companionship = [c for c in district.companionships if c.assignments][0]
+    load_records = ministering._load_records
+    def slow(*args):
+        time.sleep(0.3)
+        return load_records(*args)
+    monkeypatch.setattr(ministering, '_load_records', slow)
+
+    refresh = threading.Thread(target=session.refresh)
+    refresh.start()
+    time.sleep(0.1)
+    session.update_companionship(district, companionship,
+            companionship.ministers, [])
+    refresh.join()
+    monkeypatch.setattr(ministering, '_load_records', load_records)
+
+    assert session.stale
+    found = session.assignments.get_companionships(id=companionship.id)[0]
+    assert found.assignments == []
+
+
+def test_lazy_matches_eager(data):
+    eager = MinisteringAssignments(data)
+    lazy = MinisteringAssignments(data, lazy=True)
+    companionship = [c for c in eager.districts[2].companionships if c.assignments][-1]
+    minister = companionship.ministers[0]
+    household = companionship.assignments[0]
+
+    # answered from the raw data before any records are created
+    assert lazy.has_minister(minister.id) and lazy.has_assignment(household.id)
+    assert lazy.get_district_of(companionship.id).id == eager.districts[2].id
+
+    assert state(lazy) == state(eager)
+    assert [x.id for x in lazy.districts] == [x.id for x in eager.districts]
+    for kwargs in ({'id': minister.id}, {'legacy_id': minister.legacy_id},
+            {'name': minister.name}, {'ministering_to': household.id}):
+        assert [x.id for x in lazy.get_ministers(**kwargs)] == \
+                [x.id for x in eager.get_ministers(**kwargs)]
+    for kwargs in ({'id': household.id}, {'legacy_id': household.legacy_id},
+            {'ministered_by': minister.id}):
+        assert [x.id for x in lazy.get_assignments(**kwargs)] == \
+                [x.id for x in eager.get_assignments(**kwargs)]
+    for kwargs in ({'id': companionship.id}, {'minister': minister.id},
+            {'assignment': household.id}):
+        assert [x.id for x in lazy.get_companionships(**kwargs)] == \
+                [x.id for x in eager.get_companionships(**kwargs)]
+
+
+@pytest.mark.parametrize('allow_head', [True, False])
+def test_check_login_probe(server, allow_head):
+    """ check_login reads no data when the server allows HEAD, and tells a
+    login page from the data either way """
+    server.allow_head = allow_head
+    ms = new_session(server, login_ttl=0)
+    assert ms.check_login()
+    read = ms.metrics.snapshot()['bytes'].get('check_login', 0)
+    assert read == 0 if allow_head else 0 < read <= 1024
+
+    ms._session.cookies.clear()
+    assert not ms.check_login()
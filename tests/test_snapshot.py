@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import zlib
+
+import pytest
+
+import ministering
+from ministering import (Companionship, MinisteringAssignments,
+        MinisteringSession, dump_snapshot, load_snapshot)
+from conftest import ROOT, state
+
+
+def write_payload(filename, payload):
+    """ Write a snapshot file holding payload, a raw pickle """
+    with open(filename, 'wb') as fp:
+        fp.write(ministering._SNAPSHOT_HEADER.pack(ministering.SNAPSHOT_MAGIC,
+                ministering.SNAPSHOT_VERSION, 0, zlib.crc32(payload),
+                len(payload)))
+        fp.write(payload)
+
+
+def test_session_snapshot_round_trip(data, tmp_path):
+    filename = str(tmp_path / 'data.snapshot')
+    with open(str(tmp_path / 'data.json'), 'w') as fp:
+        json.dump(data, fp)
+    ms = MinisteringSession()
+    ms.load_data(str(tmp_path / 'data.json'))
+    ms.save_snapshot(filename, compression=1)
+
+    loaded = MinisteringSession()
+    loaded.load_snapshot(filename)
+    assert state(loaded.assignments) == state(ms.assignments)
+    assert isinstance(loaded.assignments, MinisteringAssignments)
+
+
+def test_snapshot_errors_are_value_errors(tmp_path):
+    filename = str(tmp_path / 'data.snapshot')
+    # a class the module does not have, as when written by a script
+    write_payload(filename, b'\x80\x02cministering\nNoSuchRecord\n)\x81.')
+    with pytest.raises(ValueError):
+        load_snapshot(filename)
+    write_payload(filename, b'\x80\x02(')
+    with pytest.raises(ValueError):
+        load_snapshot(filename)
+    with open(filename, 'wb') as fp:
+        fp.write(b'not a snapshot')
+    with pytest.raises(ValueError):
+        load_snapshot(filename)
+
+
+def test_interactive_snapshot_uses_module_classes(data, tmp_path):
+    """ The snapshot written by running ministering.py as a script holds
+    ministering's classes, and the script's names are those classes """
+    pytest.importorskip('requests')
+    with open(str(tmp_path / 'ministering_data.json'), 'w') as fp:
+        json.dump(data, fp)
+    with open(str(tmp_path / 'ministering_session.json'), 'w') as fp:
+        json.dump({}, fp)
+    check = ('import runpy, ministering\n'
+            'names = runpy.run_path(%r, run_name="__main__")\n'
+            'assert names["MinisteringAssignments"] is ministering.MinisteringAssignments\n'
+            'assert isinstance(names["ms"].assignments, names["MinisteringAssignments"])\n'
+            % os.path.join(ROOT, 'ministering.py'))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + sys.path))
+    subprocess.run([sys.executable, '-c', check], cwd=str(tmp_path), env=env,
+            check=True, stdout=subprocess.DEVNULL)
+
+    ms = MinisteringSession()
+    ms.load_snapshot(str(tmp_path / 'ministering_data.snapshot'))
+    assert isinstance(ms.assignments.companionships[0], Companionship)
+
+
+def test_snapshot_from_other_version_is_rejected(data, tmp_path):
+    """ Records gain slots between versions, as _name_indexes did, so an
+    older snapshot must be downloaded again rather than loaded """
+    filename = str(tmp_path / 'data.snapshot')
+    dump_snapshot((data, 'elders', MinisteringAssignments(data), None), filename)
+    with open(filename, 'r+b') as fp:
+        fp.seek(len(ministering.SNAPSHOT_MAGIC))
+        fp.write(bytes([ministering.SNAPSHOT_VERSION - 1]))
+    with pytest.raises(ValueError):
+        MinisteringSession().load_snapshot(filename)
+
+
+def test_name_search_after_snapshot(data, tmp_path):
+    filename = str(tmp_path / 'data.snapshot')
+    assignments = MinisteringAssignments(data)
+    assignments.search_names('minister 1')
+    dump_snapshot(assignments, filename)
+    loaded = load_snapshot(filename)
+    person = assignments.ministers[5]
+    assert loaded.search_names(person.name)[0][0].id == person.id
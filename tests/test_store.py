@@ -0,0 +1,97 @@
+import copy
+import json
+
+import pytest
+
+from ministering import (MinisteringAssignments, MinisteringStore,
+        diff_assignments, summarize_changes)
+from conftest import state
+from test_diff import changed
+
+sqlite3 = pytest.importorskip('sqlite3')
+
+
+@pytest.fixture
+def store():
+    with MinisteringStore(':memory:') as store:
+        yield store
+
+
+def test_store_round_trip(store, data):
+    new_data, expected = changed(data)
+    first = store.ingest(data, 100, 'first')
+    second = store.ingest(new_data, 200, 'second')
+    assert store.snapshots() == [(first, 100, 'first'), (second, 200, 'second')]
+
+    assert state(store.load(first)) == state(MinisteringAssignments(data))
+    assert state(store.load()) == state(MinisteringAssignments(new_data))
+    counts = summarize_changes(diff_assignments(store.load(first), store.load()))
+    assert counts == dict([(x, len(y)) for x, y in expected.items()])
+
+    district = store.get_districts(first, id=data['elders'][0]['districtUuid'])
+    assert [x.name for x in district] == [data['elders'][0]['districtName']]
+
+
+def test_store_unassigned_and_history(store, data):
+    new_data, expected = changed(data)
+    store.ingest(data, 100)
+    store.ingest(new_data, 200)
+    eligible = new_data['eligibleMinistersAndAssignments']['eligibleAssignments']
+    assigned = MinisteringAssignments(new_data)
+    unassigned = set([x['personUuid'] for x in eligible
+            if not assigned.has_assignment(x['personUuid'])])
+    assert set([x.id for x in store.unassigned_households()]) == unassigned
+    both = set([x.id for x in store.unassigned_for(2)])
+    assert both and both < unassigned
+    assert both.isdisjoint(expected['household_unassigned'])
+    assert store.unassigned_for(3) == []
+
+    moved = list(expected['household_moved'])[0]
+    history = store.assignment_history(moved)
+    assert [x[0] for x in history] == [1, 2]
+    assert history[0][1].id != history[1][1].id
+    assert moved in [x.id for x in history[1][1].assignments]
+
+    rows = store.district_loads(new_data['elders'][0]['districtUuid'])
+    assert [(x[1], x[4]) for x in rows] == [(100, 12), (200, 12)]
+    assert rows[0][5] == sum([len(c['assignments'])
+            for c in data['elders'][0]['companionships']])
+
+
+def test_store_keeps_datasets_apart(store, data):
+    store.ingest(data, 100)
+    relief = copy.deepcopy(data)
+    relief['reliefSociety'] = relief.pop('elders')[:2]
+    store.ingest(relief, 200, dataset='reliefSociety')
+    assert len(store.snapshots()) == 1
+    assert len(store.load().districts) == 6
+    assert len(store.load(dataset='reliefSociety').districts) == 2
+    assert [x[1] for x in store.district_loads()] == [100] * 6
+    with pytest.raises(ValueError):
+        store.load(dataset='other')
+
+
+def test_store_keeps_minister_email(store, data, tmp_path):
+    """ A minister who also supervises keeps their email, even in a later
+    snapshot that lists them only as a supervisor """
+    data = copy.deepcopy(data)
+    districts = data['elders']
+    minister = districts[1]['companionships'][0]['ministers'][0]
+    minister['email'] = 'minister@example.org'
+    districts[0].update(supervisorPersonUuid=minister['personUuid'],
+            supervisorLegacyCmisId=minister['legacyCmisId'],
+            supervisorName=minister['name'])
+    filename = str(tmp_path / 'data.json')
+    with open(filename, 'w') as fp:
+        json.dump(data, fp)
+    store.ingest_file(filename)
+    assert store.get_person(minister['personUuid']).email == 'minister@example.org'
+    assert store.load().districts[0].supervisor.email == 'minister@example.org'
+
+    districts[1]['companionships'].pop(0)
+    eligible = data['eligibleMinistersAndAssignments']
+    for role in eligible:
+        eligible[role] = [x for x in eligible[role]
+                if x['personUuid'] != minister['personUuid']]
+    store.ingest(data)
+    assert store.get_person(minister['personUuid']).email == 'minister@example.org'
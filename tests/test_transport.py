@@ -0,0 +1,56 @@
+import email.utils
+import random
+import time
+from types import SimpleNamespace
+
+from ministering import Transport
+from conftest import new_session, state
+
+
+def retry_after(value):
+    return SimpleNamespace(headers={'Retry-After': value})
+
+
+def test_delay_follows_retry_after():
+    transport = Transport(backoff=0.5, max_backoff=30.0)
+    assert transport.delay(0, retry_after('2')) == 2.0
+    assert transport.delay(0, retry_after('3600')) == 30.0
+    assert transport.delay(0, retry_after('-5')) == 0.0
+
+    when = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 < transport.delay(0, retry_after(when)) <= 10
+    # a -0000 zone parses to a naive datetime
+    when = email.utils.formatdate(time.time() + 10).replace('+0000', '-0000')
+    assert 8 < transport.delay(0, retry_after(when)) <= 10
+    past = email.utils.formatdate(time.time() - 10, usegmt=True)
+    assert transport.delay(0, retry_after(past)) == 0.0
+
+
+def test_delay_backs_off_without_retry_after():
+    transport = Transport(backoff=0.5, max_backoff=4.0)
+    for value in (None, '', 'soon', 'Mon, 99 Foo 2024 99:99:99 GMT', 'nan',
+            'inf', '-inf'):
+        response = retry_after(value) if value is not None else None
+        for attempt in range(6):
+            assert 0 <= transport.delay(attempt, response) <= \
+                    min(4.0, 0.5 * 2 ** attempt)
+
+
+def test_requests_retry_unavailable_server(server):
+    """ 503 answers with Retry-After: 0 are retried until one succeeds """
+    random.seed(1)
+    ms = new_session(server, write_through=True,
+            transport=Transport(retries=20, backoff=0.001))
+    server.error_rate = 0.5
+    ms.download_assignments()
+    district = ms.assignments.districts[0]
+    for companionship in district.companionships[:4]:
+        ms.update_companionship(district, companionship, companionship.ministers,
+                companionship.assignments[1:])
+    assert sum(ms.metrics.snapshot()['retries'].values()) > 0
+    assert 503 not in ms.metrics.snapshot()['status']
+
+    server.error_rate = 0
+    patched = state(ms.assignments)
+    ms.refresh()
+    assert state(ms.assignments) == patched
@@ -0,0 +1,51 @@
+import pytest
+
+import ministering
+from mock_lcr import MockLCRServer
+from synthetic import SCALES, synthetic_data
+from conftest import new_session, state
+
+
+@pytest.fixture
+def units():
+    pytest.importorskip('requests')
+    data = dict((1000 + n, synthetic_data(*SCALES['ward'], seed=n))
+            for n in range(3))
+    with MockLCRServer(units=data) as server:
+        yield data, new_session(server)
+
+
+def test_download_units(units):
+    data, ms = units
+    collection = ms.download_units(list(data))
+    assert len(collection) == len(data)
+    for unit, unit_data in data.items():
+        expected = ministering.MinisteringAssignments(unit_data)
+        assert state(collection[unit, 'elders']) == state(expected)
+    # synthetic units reuse the same uuids, so each is found in every unit
+    person = expected.ministers[0]
+    assert sorted([key for key, x in collection.get_ministers(id=person.id)]) == \
+            [(x, 'elders') for x in sorted(data)]
+
+
+def test_download_units_missing_dataset(units):
+    data, ms = units
+    with pytest.raises(ValueError):
+        ms.download_units(list(data), ['elders', 'reliefSociety'])
+
+
+def test_process_pool_needs_importable_module(units, monkeypatch):
+    """ Parsing falls back to threads when run from a script, whose
+    functions spawned workers cannot import """
+    data, ms = units
+    monkeypatch.setattr(ministering._parse_page, '__module__', '__main__')
+    collection = ms.download_units(list(data), processes=2)
+    assert len(collection) == len(data)
+
+
+def test_process_pool(units):
+    data, ms = units
+    threads = ms.download_units(list(data))
+    processes = ms.download_units(list(data), processes=2)
+    for key in threads.keys():
+        assert state(processes[key]) == state(threads[key])